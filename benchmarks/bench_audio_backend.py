@@ -0,0 +1,126 @@
+"""Time set-volume calls through the audio backends
+
+Sweeps the master volume through VolumeControl on the in-memory backend, on
+the pulse backend talking to comps.fakes.FakePulseServer (a stand-in for a
+local PulseAudio server with a configurable round trip), and optionally on
+the real system backend. Every backend reports how long its writes took,
+whether our own writes were mistaken for outside changes, and whether an
+outside change reached the cache. For comparison the cost of starting one
+process per change (what calling pactl for every fader step would cost) is
+measured too. Results are printed as JSON.
+
+    python benchmarks/bench_audio_backend.py [--writes 500] [--round-trip 0.0002]
+    python benchmarks/bench_audio_backend.py --system pulse
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import percentiles, wait_until
+
+from comps.audio_backends import AUTO, BACKENDS, create_endpoint
+from comps.audio_backends.memory import MemoryEndpoint
+from comps.audio_backends.pulse import PulseEndpoint
+from comps.fakes import FakePulseServer
+from comps.volume_control import VolumeControl
+
+def sweep(volume_control, writes):
+    """Write writes distinct levels up and down as fast as possible"""
+    for index in range(writes):
+        step = index % 200
+        volume_control.set_volume((step if step < 100 else 200 - step) / 100.0 + 0.001)
+
+def run_backend(label, endpoint, writes, external_change=None):
+    """Sweep one backend and return its result record"""
+    volume_control = VolumeControl(endpoint)
+    started = time.perf_counter()
+    sweep(volume_control, writes)
+    duration = time.perf_counter() - started
+    # Let the echoes of our own writes arrive before checking them
+    time.sleep(0.2)
+    mistaken_echoes = volume_control.external_changes
+
+    outside_change_seen = None
+    if external_change and volume_control.notifications:
+        external_change(0.123)
+        outside_change_seen = wait_until(lambda: abs(volume_control.get_volume() - 0.123) < 1e-3, timeout=2.0)
+
+    stats = volume_control.get_stats()
+    volume_control.close()
+    return {
+        'backend': label,
+        'writes': stats['writes'],
+        'writes_per_second': writes / duration,
+        'set_volume_time': stats['set_volume_time'],
+        'notifications': stats['notifications'],
+        'own_writes_seen_as_outside': mistaken_echoes,
+        'outside_change_seen': outside_change_seen,
+    }
+
+def process_per_change(count):
+    """Time starting one short process per change, the cost a pactl call per step would add"""
+    command = shutil.which('true')
+    command = [command] if command else [sys.executable, '-c', '']
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        subprocess.run(command, check=False)
+        samples.append(time.perf_counter() - started)
+    return {'command': command[0], 'calls': count, 'time': percentiles(samples)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time set-volume calls through the audio backends")
+    parser.add_argument('--writes', type=int, default=500, help="Volume writes per backend")
+    parser.add_argument('--round-trip', type=float, default=0.0002,
+                        help="Seconds per request on the stand-in PulseAudio server")
+    parser.add_argument('--system', choices=[AUTO] + list(BACKENDS), default=None,
+                        help="Also sweep this real backend (changes the system volume!)")
+    parser.add_argument('--process-calls', type=int, default=50,
+                        help="Processes started for the process per change comparison (0 to skip)")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    memory = MemoryEndpoint()
+    results.append(run_backend('memory', memory, args.writes, lambda level: memory.external_change(level=level)))
+
+    server = FakePulseServer(round_trip=args.round_trip)
+    result = run_backend('pulse (stand-in server)', PulseEndpoint(client=server), args.writes,
+                         lambda level: server.external_change(level=level))
+    result['connections_opened'] = server.connections_opened
+    results.append(result)
+
+    if args.system:
+        endpoint = create_endpoint(args.system)
+        original = endpoint.get_level()
+        try:
+            results.append(run_backend(f'{endpoint.name} (system)', endpoint, args.writes))
+        finally:
+            restore = create_endpoint(args.system)
+            restore.set_level(original)
+            restore.close()
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+        'process_per_change': process_per_change(args.process_calls) if args.process_calls else None,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    ok = all(r['own_writes_seen_as_outside'] == 0 and r['outside_change_seen'] is not False for r in results)
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
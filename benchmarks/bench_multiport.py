@@ -0,0 +1,131 @@
+"""Headless benchmark of several controllers feeding one processing thread
+
+Attaches 1, 2, 4 and 8 scripted in-memory ports to their own
+comps.midi_control.MidiDevice and plays back to back fader sweeps on all of
+them at once. One process_xtouch_messages thread reads every device; each
+device routes through its own mapping engine. Per port count it reports
+the total message rate, the delivery to dispatch latency and whether every
+device's messages arrived complete, in order and tagged with the right
+device. Results are printed as JSON.
+
+    python benchmarks/bench_multiport.py [--ports 1 2 4 8] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import full_speed_bursts, percentiles, wait_until, reset_midi_state, start_processing
+
+from comps import midi_control
+from comps.fakes import ScriptedInputPort, RecordingVolumeControl
+from comps.mapping import MappingEngine
+
+class RecordingEngine:
+    """Mapping engine of one device that remembers when each message was dispatched"""
+
+    def __init__(self):
+        self.engine = MappingEngine()
+        self.dispatched = []  # (perf_counter timestamp, message)
+
+    def dispatch(self, msg, volume_control, volume_osd, received_at=None):
+        self.dispatched.append((time.perf_counter(), msg))
+        return self.engine.dispatch(msg, volume_control, volume_osd, received_at)
+
+def run_ports(count, mode, sweeps):
+    """Play full speed sweeps on count ports at once and return the result record"""
+    engines = [RecordingEngine() for _ in range(count)]
+    devices = [
+        midi_control.MidiDevice(f'Controller {index}', f'Bench Port {index}', engine=engine)
+        for index, engine in enumerate(engines)
+    ]
+    midi_control.set_devices(devices)
+    reset_midi_state(mode)
+    ports = []
+    for device in devices:
+        port = ScriptedInputPort(name=device.port_name)
+        midi_control.attach_port(port, device=device)
+        ports.append(port)
+
+    # The default engine must never see a message: every device has its own
+    fallback = RecordingEngine()
+    backend = RecordingVolumeControl(initial_volume=-1.0)
+    threads_before = threading.active_count()
+    thread, stop = start_processing(mode, backend, None, engine=fallback)
+    processing_threads = threading.active_count() - threads_before
+
+    script = full_speed_bursts(sweeps)
+    expected = len(script) * count
+    started = time.perf_counter()
+    for port in ports:
+        port.play(script, wait=False)
+    completed = wait_until(lambda: sum(len(engine.dispatched) for engine in engines) >= expected, timeout=60.0)
+    finished = time.perf_counter()
+    shutdown_seconds = stop()
+    for port in ports:
+        port.close()
+
+    latencies = []
+    in_order = True
+    for port, engine in zip(ports, engines):
+        delivered = port.delivered_at
+        if [msg for _, msg in delivered] != [msg for _, msg in engine.dispatched]:
+            in_order = False
+        latencies.extend(
+            dispatched_at - delivered_at
+            for (delivered_at, _), (dispatched_at, _) in zip(delivered, engine.dispatched)
+        )
+
+    return {
+        'ports': count,
+        'input_mode': mode,
+        'completed': completed,
+        'messages': expected,
+        'dispatched': sum(len(engine.dispatched) for engine in engines),
+        'in_order_per_device': in_order,
+        'misrouted': len(fallback.dispatched),
+        'processing_threads': processing_threads,
+        'duration_s': finished - started,
+        'messages_per_second': expected / (finished - started),
+        'dispatch_latency': percentiles(latencies),
+        'shutdown_ms': shutdown_seconds * 1000,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark several fake controllers on one processing thread")
+    parser.add_argument('--ports', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Numbers of simultaneous ports to measure")
+    parser.add_argument('--mode', choices=[midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL],
+                        action='append', help="Input mode(s) to run (default: both)")
+    parser.add_argument('--sweeps', type=int, default=10, help="128-step sweeps played on every port")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    try:
+        for mode in args.mode or [midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL]:
+            for count in args.ports:
+                results.append(run_ports(count, mode, args.sweeps))
+    finally:
+        midi_control.set_devices([midi_control.MidiDevice('X-Touch Mini')])
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0 if all(r['completed'] and r['in_order_per_device'] and not r['misrouted'] for r in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Headless benchmark of the MIDI message path
+
+Drives comps.midi_control.process_xtouch_messages with a scripted in-memory
+port, a recording fake VolumeControl and a no-op OSD, so it runs on Linux
+without an X-Touch Mini or Windows audio. Results are printed as JSON.
+
+    python benchmarks/bench_pipeline.py [--output results.json]
+"""
+import argparse
+import bisect
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mido
+
+from comps import midi_control
+from comps.fakes import ScriptedInputPort, RecordingVolumeControl, NullVolumeOSD
+from comps.volume_writer import VolumeWriter
+
+FADER_CHANNEL = 10
+FADER_CONTROL = 9
+
+def fader(value):
+    return mido.Message('control_change', channel=FADER_CHANNEL, control=FADER_CONTROL, value=value)
+
+def slow_sweep(step_delay=0.01):
+    """One 0-127 sweep with a pause between steps, like a slow hand movement"""
+    return [(step_delay, fader(value)) for value in range(128)]
+
+def full_speed_bursts(sweeps=10):
+    """Back to back 127-step sweeps up and down with no gaps"""
+    script = []
+    for sweep in range(sweeps):
+        values = range(128) if sweep % 2 == 0 else range(127, -1, -1)
+        script.extend((0, fader(value)) for value in values)
+    return script
+
+def mixed_traffic(sweeps=4):
+    """Fader sweeps interleaved with encoder and button traffic"""
+    script = []
+    for sweep in range(sweeps):
+        for value in range(128):
+            script.append((0, fader(value)))
+            encoder = (value + sweep) % 8 + 1
+            script.append((0, mido.Message('control_change', channel=FADER_CHANNEL, control=encoder, value=value)))
+            if value % 16 == 0:
+                script.append((0, mido.Message('note_on', channel=FADER_CHANNEL, note=value % 24, velocity=127)))
+                script.append((0, mido.Message('note_off', channel=FADER_CHANNEL, note=value % 24, velocity=0)))
+    return script
+
+SCENARIOS = {
+    'slow_sweep': slow_sweep,
+    'full_speed_bursts': full_speed_bursts,
+    'mixed_traffic': mixed_traffic,
+}
+
+def percentiles(samples):
+    """Return p50/p95/p99/max of samples (seconds) in milliseconds"""
+    if not samples:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    ordered = sorted(samples)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))] * 1000
+    return {'p50_ms': pick(50), 'p95_ms': pick(95), 'p99_ms': pick(99), 'max_ms': ordered[-1] * 1000}
+
+def wait_until(predicate, timeout=10.0):
+    """Spin until predicate() is true (benchmark side only)"""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.0005)
+    return True
+
+def reset_midi_state(mode):
+    """Put comps.midi_control back into a clean disconnected state"""
+    midi_control.set_input_mode(mode)
+    midi_control.disconnect_xtouch()
+    while not midi_control._message_queue.empty():
+        midi_control._message_queue.get_nowait()
+
+def start_processing(mode, sink, osd, engine=None):
+    """Start process_xtouch_messages on a thread, return (thread, stop function)"""
+    stop_flag = threading.Event()
+    thread = threading.Thread(
+        target=midi_control.process_xtouch_messages,
+        args=(stop_flag.is_set, sink, osd, mode),
+        kwargs={'engine': engine},
+        name='midi-input', daemon=True
+    )
+    thread.start()
+
+    def stop():
+        stop_flag.set()
+        midi_control.wake_xtouch_thread()
+        started = time.perf_counter()
+        thread.join(timeout=5.0)
+        return time.perf_counter() - started
+
+    return thread, stop
+
+def write_latencies(port, backend):
+    """Latency of each backend write from the delivery of the value it wrote"""
+    deliveries = {}
+    for delivered_at, msg in port.delivered_at:
+        if msg.type == 'control_change' and msg.channel == FADER_CHANNEL and msg.control == FADER_CONTROL:
+            deliveries.setdefault(msg.value / 127.0, []).append(delivered_at)
+
+    samples = []
+    for written_at, level in backend.writes:
+        times = deliveries.get(level)
+        if not times:
+            continue
+        index = bisect.bisect_right(times, written_at) - 1
+        if index >= 0:
+            samples.append(written_at - times[index])
+    return samples
+
+def run_scenario(name, mode, pipeline, write_delay):
+    """Run one scenario and return its result record"""
+    reset_midi_state(mode)
+    script = SCENARIOS[name]()
+    fader_messages = sum(
+        1 for _, msg in script
+        if msg.type == 'control_change' and msg.control == FADER_CONTROL
+    )
+
+    backend = RecordingVolumeControl(initial_volume=-1.0, write_delay=write_delay)
+    osd = NullVolumeOSD()
+    writer = None
+    if pipeline == 'writer':
+        writer = VolumeWriter(backend, osd)
+        writer.start()
+        sink, midi_osd = writer, None
+        received = lambda: writer.get_stats()['messages_received']
+    else:
+        sink, midi_osd = backend, osd
+        received = lambda: len(backend.writes)
+
+    port = ScriptedInputPort()
+    midi_control.attach_port(port)
+    thread, stop = start_processing(mode, sink, midi_osd)
+
+    started = time.perf_counter()
+    port.play(script)
+    completed = wait_until(lambda: received() >= fader_messages)
+    finished = time.perf_counter()
+    if writer:
+        writer.stop()
+    shutdown_seconds = stop()
+    port.close()
+
+    return {
+        'scenario': name,
+        'input_mode': mode,
+        'pipeline': pipeline,
+        'completed': completed,
+        'messages': len(script),
+        'fader_messages': fader_messages,
+        'duration_s': finished - started,
+        'messages_per_second': len(script) / (finished - started),
+        'backend_writes': len(backend.writes),
+        'osd_shows': osd.shows,
+        'write_latency': percentiles(write_latencies(port, backend)),
+        'writer_stats': writer.get_stats() if writer else None,
+        'shutdown_ms': shutdown_seconds * 1000,
+    }
+
+def measure_idle_cpu(mode, seconds):
+    """CPU used by the processing thread while connected but idle"""
+    reset_midi_state(mode)
+    port = ScriptedInputPort()
+    midi_control.attach_port(port)
+    thread, stop = start_processing(mode, RecordingVolumeControl(), NullVolumeOSD())
+    time.sleep(0.05)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    time.sleep(seconds)
+    cpu_used = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    stop()
+    port.close()
+    return {'input_mode': mode, 'seconds': wall, 'cpu_seconds': cpu_used, 'cpu_percent': cpu_used / wall * 100}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the X-Touch message path with fake devices")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help="Scenario to run (repeatable, default all)")
+    parser.add_argument('--mode', choices=[midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL],
+                        action='append', help="Input mode to run (repeatable, default both)")
+    parser.add_argument('--write-delay', type=float, default=0.0005,
+                        help="Simulated duration of one backend volume write in seconds")
+    parser.add_argument('--idle-seconds', type=float, default=1.0,
+                        help="How long to measure idle CPU usage per input mode")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    scenarios = args.scenario or sorted(SCENARIOS)
+    modes = args.mode or [midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL]
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'write_delay_s': args.write_delay,
+        'runs': [],
+        'idle_cpu': [],
+    }
+    for mode in modes:
+        for name in scenarios:
+            for pipeline in ('direct', 'writer'):
+                results['runs'].append(run_scenario(name, mode, pipeline, args.write_delay))
+        if args.idle_seconds > 0:
+            results['idle_cpu'].append(measure_idle_cpu(mode, args.idle_seconds))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
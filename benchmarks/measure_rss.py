@@ -0,0 +1,83 @@
+"""Compare the resident memory of headless mode with the full GUI mode
+
+Starts midi.py once with --headless and once with the tray, OSD and
+hotkeys (plus --control), waits for each to settle and reads its resident
+memory through the control socket, then shuts it down. Needs the full
+Windows environment the application runs in. Results are printed as JSON.
+
+    python benchmarks/measure_rss.py [--settle 5] [--runs 3]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from comps.control_server import default_address, send_command
+
+MODES = {
+    'headless': ['--headless'],
+    'gui': ['--control'],
+}
+
+def wait_for_instance(address, process, timeout):
+    """Wait until the instance answers on its control socket"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"midi.py exited with code {process.returncode} during startup")
+        try:
+            return send_command('status', address=address, timeout=1.0)
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("midi.py did not open its control socket in time")
+
+def measure(mode, args):
+    """Start one instance in mode and return its resident memory in bytes"""
+    address = f"{default_address()}-rss-{mode}"
+    command = [sys.executable, os.path.join(ROOT, 'midi.py'), '--control-address', address] + MODES[mode]
+    if args.config:
+        command += ['--config', args.config]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_instance(address, process, args.startup_timeout)
+        # Let the OSD pre-warm, the tray icon and the hotkey hook finish
+        time.sleep(args.settle)
+        return send_command('metrics', address=address)['rss_bytes']
+    finally:
+        try:
+            send_command('shutdown', address=address)
+            process.wait(timeout=5.0)
+        except Exception:
+            process.kill()
+            process.wait()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare resident memory of headless and GUI mode")
+    parser.add_argument('--runs', type=int, default=3, help="Instances started per mode")
+    parser.add_argument('--settle', type=float, default=5.0, help="Seconds to wait after startup before measuring")
+    parser.add_argument('--startup-timeout', type=float, default=30.0)
+    parser.add_argument('--config', default=None, help="Config file passed to midi.py")
+    args = parser.parse_args(argv)
+
+    results = {'python': platform.python_version(), 'platform': platform.platform(), 'modes': {}}
+    for mode in MODES:
+        samples = [measure(mode, args) for _ in range(args.runs)]
+        results['modes'][mode] = {
+            'rss_mb': [round(sample / (1024 * 1024), 1) for sample in samples],
+            'median_rss_mb': round(statistics.median(samples) / (1024 * 1024), 1),
+        }
+    headless = results['modes']['headless']['median_rss_mb']
+    gui = results['modes']['gui']['median_rss_mb']
+    results['saved_mb'] = round(gui - headless, 1)
+    results['saved_percent'] = round((gui - headless) / gui * 100, 1) if gui else None
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Replay a MIDI capture through the message path
+
+Feeds the messages of a capture written with `midi.py --capture PATH` into
+comps.midi_control.process_xtouch_messages from an in-memory port, at the
+recorded speed, a multiple of it, or as fast as possible. The bindings come
+from the config file, so a capture from the field can be replayed against
+the user's mappings. By default the volume backend is a recording fake;
+--backend real uses the system audio backend selected in the config file (see
+comps/audio_backends). Results are printed as JSON.
+
+    python benchmarks/replay_capture.py capture.bin [--speed 2 | --fast] [--repeat 10]
+    python benchmarks/replay_capture.py capture.bin --dump
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import reset_midi_state, start_processing, wait_until
+
+from comps import latency
+from comps import midi_control
+from comps.config import load_config
+from comps.fakes import ScriptedInputPort, RecordingVolumeControl, NullVolumeOSD
+from comps.mapping import MappingEngine
+from comps.midi_capture import read_capture
+from comps.volume_writer import VolumeWriter
+
+def build_script(records, speed, repeat):
+    """Turn capture records into a ScriptedInputPort script
+
+    speed scales the recorded gaps (2 plays twice as fast); None plays
+    every message back to back.
+    """
+    script = []
+    for _ in range(repeat):
+        for delta, msg in records:
+            delay = 0 if speed is None else delta / speed
+            script.append((delay, msg))
+    return script
+
+def dump(path):
+    """Print a capture as text, one message per line with its time offset"""
+    started_at, records = read_capture(path)
+    print(f"# Captured {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at))}, "
+          f"{len(records)} messages")
+    offset = 0.0
+    for delta, msg in records:
+        offset += delta
+        print(f"{offset:10.6f}  {msg}")
+
+def create_backend(kind, engine, write_delay, audio_backend):
+    """Return (volume control, session volume) for the chosen backend"""
+    if kind == 'fake':
+        return RecordingVolumeControl(initial_volume=-1.0, write_delay=write_delay), None
+
+    from comps.volume_control import VolumeControl
+    from comps.session_volume import SessionVolumeController
+
+    session_volume = None
+    if engine.uses_action('app_volume'):
+        session_volume = SessionVolumeController()
+        session_volume.start()
+    return VolumeControl(backend=audio_backend), session_volume
+
+def replay(args):
+    """Replay the capture once and return the result record"""
+    started_at, records = read_capture(args.capture)
+    speed = None if args.fast else args.speed
+    script = build_script(records, speed, args.repeat)
+
+    config = load_config(args.config)
+    engine = MappingEngine.from_config(config, config_path=args.config)
+    # Count every message the processing thread has routed
+    processed = [0]
+    dispatch = engine.dispatch
+    def counting_dispatch(*dispatch_args):
+        processed[0] += 1
+        return dispatch(*dispatch_args)
+    engine.dispatch = counting_dispatch
+
+    tracker = latency.enable()
+    reset_midi_state(args.mode)
+    backend, session_volume = create_backend(args.backend, engine, args.write_delay, config['audio']['backend'])
+    osd = NullVolumeOSD()
+    writer = None
+    if args.pipeline == 'writer':
+        writer = VolumeWriter(backend, osd, max_writes_per_second=args.max_writes_per_second,
+                              session_volume=session_volume)
+        writer.start()
+        sink, midi_osd = writer, None
+    else:
+        sink, midi_osd = backend, osd
+
+    port = ScriptedInputPort()
+    midi_control.attach_port(port)
+    thread, stop = start_processing(args.mode, sink, midi_osd, engine=engine)
+
+    replay_started = time.perf_counter()
+    port.play(script)
+    completed = wait_until(lambda: processed[0] >= len(script), timeout=30.0)
+    finished = time.perf_counter()
+    if writer:
+        writer.stop()
+    stop()
+    port.close()
+    if session_volume:
+        session_volume.stop()
+
+    recorded_duration = sum(delta for delta, _ in records) * args.repeat
+    result = {
+        'python': platform.python_version(),
+        'capture': args.capture,
+        'captured_at': started_at,
+        'messages': len(script),
+        'speed': 'fast' if speed is None else speed,
+        'repeat': args.repeat,
+        'input_mode': args.mode,
+        'pipeline': args.pipeline,
+        'backend': args.backend,
+        'completed': completed,
+        'recorded_duration_s': recorded_duration,
+        'replay_duration_s': finished - replay_started,
+        'messages_per_second': len(script) / (finished - replay_started),
+        'latency': tracker.summary()['receive_to_volume'],
+        'writer_stats': writer.get_stats() if writer else None,
+    }
+    if args.backend == 'fake':
+        result['backend_writes'] = len(backend.writes)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a MIDI capture through the X-Touch message path")
+    parser.add_argument('capture', help="Capture file written by midi.py --capture")
+    parser.add_argument('--dump', action='store_true', help="Print the capture as text instead of replaying it")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Playback speed relative to the recording (default 1, real time)")
+    parser.add_argument('--fast', action='store_true', help="Replay every message back to back")
+    parser.add_argument('--repeat', type=int, default=1, help="Play the capture this many times in a row")
+    parser.add_argument('--config', default=None, help="Config file with the mappings to replay against")
+    parser.add_argument('--mode', choices=[midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL],
+                        default=midi_control.INPUT_MODE_CALLBACK)
+    parser.add_argument('--pipeline', choices=['direct', 'writer'], default='writer',
+                        help="Route through the volume writer (default, as in the app) or write directly")
+    parser.add_argument('--max-writes-per-second', type=int, default=60)
+    parser.add_argument('--backend', choices=['fake', 'real'], default='fake',
+                        help="Recording fake volume backend (default) or the system audio backend")
+    parser.add_argument('--write-delay', type=float, default=0.0005,
+                        help="Simulated duration of one fake backend volume write in seconds")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.dump:
+        dump(args.capture)
+        return
+    if args.speed <= 0:
+        parser.error("--speed must be greater than 0")
+
+    output = json.dumps(replay(args), indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Stress test of the MIDI connection state machine
+
+Several threads connect and disconnect fake ports as fast as they can while
+the processing loop reads from whichever port is current and waiter threads
+block on the connection's condition variable. Afterwards it checks that no
+thread raised, no port was read after it was closed, no error was logged by
+the processing loop and no waiter woke later than WAKE_LIMIT after a state
+change. Results are printed as JSON; the exit status is 1 if any check failed.
+
+    python benchmarks/stress_connection.py [--threads 8] [--seconds 3]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mido
+
+from comps import midi_control
+from comps.fakes import ScriptedInputPort
+from comps.midi_connection import CONNECTED, DISCONNECTED
+
+WAKE_LIMIT = 0.25  # A waiter must notice a state change within this (seconds)
+
+class CountingEngine:
+    """Stands in for MappingEngine and counts dispatched messages"""
+
+    def __init__(self):
+        self.dispatched = 0
+
+    def dispatch(self, msg, volume_control, volume_osd, received_at=None):
+        self.dispatched += 1
+
+class ErrorCounter(logging.Handler):
+    """Counts ERROR and worse records, e.g. a read from a closed port"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+        self.first = None
+
+    def emit(self, record):
+        self.count += 1
+        if self.first is None:
+            self.first = record.getMessage()
+
+def run(mode, thread_count, seconds, seed):
+    """Run one stress round in the given input mode and return its results"""
+    random.seed(seed)
+    midi_control.disconnect_xtouch()
+    midi_control.set_input_mode(mode)
+    connection = midi_control.connection
+
+    errors = ErrorCounter()
+    logging.getLogger('comps.midi_control').addHandler(errors)
+    thread_errors = []
+    previous_hook = threading.excepthook
+    threading.excepthook = lambda args: thread_errors.append(f"{args.thread.name}: {args.exc_value!r}")
+
+    ports = []
+    ports_lock = threading.Lock()
+    counts = {'connects': 0, 'disconnects': 0, 'delivered': 0}
+    counts_lock = threading.Lock()
+    waiter_stats = {'wakeups': 0, 'missed': 0}
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            if random.random() < 0.5:
+                port = ScriptedInputPort()
+                with ports_lock:
+                    ports.append(port)
+                if midi_control.attach_port(port):
+                    with counts_lock:
+                        counts['connects'] += 1
+            elif midi_control.disconnect_xtouch():
+                with counts_lock:
+                    counts['disconnects'] += 1
+
+    def feed():
+        msg = mido.Message('control_change', channel=10, control=9, value=64)
+        while not stop.is_set():
+            port = connection.inport
+            if port is not None and not port.closed:
+                port.deliver(msg)
+                with counts_lock:
+                    counts['delivered'] += 1
+            time.sleep(0)
+
+    # Remember when each generation was reached, to time the waiters against it
+    changed_at = {}
+    set_state = connection._set_state
+
+    def timed_set_state(state):
+        set_state(state)
+        changed_at[connection.generation] = time.monotonic()
+
+    connection._set_state = timed_set_state
+
+    def wait_changes():
+        with connection.condition:
+            generation = connection.generation
+        while not stop.is_set():
+            # Far longer than WAKE_LIMIT: only a notification ends this wait in time
+            new = connection.wait_for_change(generation, timeout=1.0)
+            woke_at = time.monotonic()
+            if new == generation:
+                continue
+            waiter_stats['wakeups'] += 1
+            reached = changed_at.get(generation + 1)
+            if reached is not None and woke_at - reached > WAKE_LIMIT:
+                waiter_stats['missed'] += 1  # A change happened but nobody woke us
+            generation = new
+
+    engine = CountingEngine()
+    processing = threading.Thread(
+        target=midi_control.process_xtouch_messages,
+        args=(stop.is_set, None, None, mode),
+        kwargs={'engine': engine},
+        name='midi-input', daemon=True
+    )
+    processing.start()
+
+    workers = [threading.Thread(target=churn, name=f'churn-{i}', daemon=True) for i in range(thread_count)]
+    workers.append(threading.Thread(target=feed, name='feeder', daemon=True))
+    workers += [threading.Thread(target=wait_changes, name=f'waiter-{i}', daemon=True) for i in range(2)]
+    for worker in workers:
+        worker.start()
+
+    time.sleep(seconds)
+    stop.set()
+    midi_control.wake_xtouch_thread()
+    for worker in workers:
+        worker.join(timeout=5.0)
+    processing.join(timeout=5.0)
+    hung = [t.name for t in workers + [processing] if t.is_alive()]
+
+    # A waiter blocked on a state must be woken by the final transition
+    midi_control.disconnect_xtouch()
+    woke = []
+    waiter = threading.Thread(target=lambda: woke.append(connection.wait_for_state(CONNECTED, timeout=2.0)))
+    waiter.start()
+    time.sleep(0.05)
+    midi_control.attach_port(ScriptedInputPort())
+    waiter.join(timeout=3.0)
+    midi_control.disconnect_xtouch()
+
+    del connection._set_state
+    threading.excepthook = previous_hook
+    logging.getLogger('comps.midi_control').removeHandler(errors)
+
+    reads_after_close = sum(port.reads_after_close for port in ports)
+    passed = (
+        not thread_errors and not hung and errors.count == 0 and reads_after_close == 0
+        and waiter_stats['missed'] == 0 and woke == [True] and connection.state == DISCONNECTED
+    )
+    return {
+        'mode': mode,
+        'threads': thread_count,
+        'seconds': seconds,
+        'connects': counts['connects'],
+        'disconnects': counts['disconnects'],
+        'messages_delivered': counts['delivered'],
+        'messages_dispatched': engine.dispatched,
+        'waiter_wakeups': waiter_stats['wakeups'],
+        'missed_wakeups': waiter_stats['missed'],
+        'final_waiter_woken': woke == [True],
+        'reads_after_close': reads_after_close,
+        'logged_errors': errors.count,
+        'first_logged_error': errors.first,
+        'thread_errors': thread_errors,
+        'hung_threads': hung,
+        'passed': passed,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress the MIDI connection with concurrent connects and disconnects")
+    parser.add_argument('--threads', type=int, default=8, help="Threads connecting and disconnecting")
+    parser.add_argument('--seconds', type=float, default=3.0, help="Duration of each round")
+    parser.add_argument('--mode', choices=[midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL],
+                        action='append', help="Input mode to run (repeatable, default both)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # Each connect and disconnect logs at INFO; keep the console readable
+    logging.basicConfig(level=logging.WARNING)
+
+    modes = args.mode or [midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL]
+    results = [run(mode, args.threads, args.seconds, args.seed) for mode in modes]
+    print(json.dumps(results, indent=2))
+    return 0 if all(result['passed'] for result in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+from comps import latency
+from comps import midi_control
+from comps.volume_writer import VolumeWriter, MASTER, MUTE
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Ends the MIDI input task once queued messages are handled
+
+def _com_thread_init():
+    """Prepare COM on the volume executor thread (not needed without comtypes)"""
+    try:
+        import comtypes
+    except ImportError:
+        return
+    comtypes.CoInitialize()
+
+class AsyncVolumeWriter(VolumeWriter):
+    """VolumeWriter whose coalescing loop is a task on the event loop
+
+    Slots, rate limiting and smoothing ramps are the same as in the thread
+    version; the loop waits on an asyncio.Event instead of a condition
+    variable, and each batch of COM writes runs on the volume executor so
+    the event loop never blocks on the audio API.
+    """
+
+    def __init__(self, volume_control, executor, **kwargs):
+        super().__init__(volume_control, **kwargs)
+        self.executor = executor
+        self._loop = None
+        self._loop_thread = None
+        self._wakeup = None
+        self._task = None
+        self._muted = False  # Mute state after the toggles handed to the executor
+
+    def start(self):
+        """Start the writer task (call from the event loop)"""
+        if self._running:
+            return
+        try:
+            self._last_written[MASTER] = self.volume_control.get_volume()
+        except Exception:
+            self._last_written.pop(MASTER, None)
+        try:
+            self._muted = self.volume_control.get_mute()
+        except Exception:
+            pass
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._wakeup = asyncio.Event()
+        self._running = True
+        self._task = self._loop.create_task(self._run_async(), name='volume-writer')
+
+    async def aclose(self):
+        """Stop the writer task, writing any pending values first"""
+        self._running = False
+        if self._task:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def submit(self, level, received_at=None, target=MASTER, ramp_time=None):
+        """Store the newest level for a slot and wake the writer task
+
+        May be called from any thread; calls from other threads are handed
+        to the event loop.
+        """
+        super().submit(level, received_at, target=target, ramp_time=ramp_time)
+        if self._loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    set_volume = submit
+
+    def external_change(self, level, muted):
+        """VolumeControl listener, also keeps the mute state toggles start from"""
+        super().external_change(level, muted)
+        self._muted = muted
+
+    def toggle_mute(self):
+        """Toggle the master mute on the volume executor and return the new state
+
+        The new state follows from the last known one, so the caller (often
+        the event loop) does not wait for the audio API.
+        """
+        muted = self._muted = not self._muted
+        self.executor.submit(self._set_mute, muted)
+        return muted
+
+    def _set_mute(self, muted):
+        """Write the mute state (runs on the volume executor)"""
+        self.volume_control.set_mute(muted)
+        if self.feedback:
+            self.feedback.report(MUTE, muted)
+
+    async def _wait_pending(self, timeout=None):
+        """Take all pending slots, waiting up to timeout seconds for one"""
+        if not self._pending and self._running:
+            self._wakeup.clear()
+            # A submit between clear() and this check has already stored its value
+            if not self._pending and self._running:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return self._take_pending(block=False)
+
+    async def _run_async(self):
+        """Writer task main loop"""
+        loop = asyncio.get_running_loop()
+        next_write = 0.0
+        while True:
+            if self._ramps:
+                # Wake for the next smoothing tick even without new values
+                pending = await self._wait_pending(max(0.0, next_write - time.monotonic()))
+            else:
+                pending = await self._wait_pending()
+                if not pending and not self._running:
+                    return
+                if not pending:
+                    continue
+
+            # Respect the write rate limit; newer values may arrive meanwhile
+            delay = next_write - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                self._merge_newer(pending)
+
+            writes = self.writes
+            await loop.run_in_executor(self.executor, self._apply, pending)
+            next_write = time.monotonic() + self._next_interval(self.writes - writes)
+
+class AsyncRuntime:
+    """Runs MIDI input, volume writes, the port watcher and shutdown on one event loop
+
+    The port callback hands messages to the loop with call_soon_threadsafe,
+    a task dispatches them through the mapping engine and the writer task
+    coalesces the results. Blocking calls are bridged explicitly: COM
+    volume writes run on a single 'volume-com' executor thread, opening and
+    listing MIDI ports on a single 'midi-io' thread. Tk and pystray keep
+    their own threads and are only reached through their thread-safe calls.
+
+    request_stop() may be called from any thread (tray, hotkey); run() then
+    shuts down in a fixed order and returns, so no forced exit is needed.
+    """
+
+    def __init__(self, volume_control, volume_osd, engine, max_writes_per_second=60,
+                 session_volume=None, feedback=None, port_watcher=None, headless=False):
+        self.volume_osd = volume_osd
+        self.headless = headless
+        self.engine = engine
+        self.port_watcher = port_watcher
+        self.com_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='volume-com', initializer=_com_thread_init
+        )
+        self.midi_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='midi-io'
+        )
+        self.writer = AsyncVolumeWriter(
+            volume_control, self.com_executor,
+            volume_osd=volume_osd,
+            max_writes_per_second=max_writes_per_second,
+            session_volume=session_volume,
+            feedback=feedback
+        )
+        self.loop = None
+        self._stopping = None
+        self._stop_requested = False
+        self._messages = None
+        self._watcher_wakeup = None
+
+    def run(self, on_started=None):
+        """Run until request_stop() or Ctrl+C
+
+        on_started is called on a worker thread once MIDI input is live,
+        for startup work that must not hold up the loop (tray, hotkeys).
+        """
+        asyncio.run(self._main(on_started))
+
+    def request_stop(self):
+        """Ask the runtime to shut down (thread-safe)"""
+        self._stop_requested = True
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    def _deliver(self, item):
+        """Port callback: stamp the (device, message) pair and hand it to the event loop"""
+        received_at = time.perf_counter() if latency.tracker is not None else None
+        try:
+            self.loop.call_soon_threadsafe(self._messages.put_nowait, (item, received_at))
+        except RuntimeError:
+            pass  # Loop closed while the port was still open
+
+    async def _main(self, on_started):
+        """Start the tasks, wait for a stop request, then shut down"""
+        self._stopping = asyncio.Event()
+        self._messages = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        if self._stop_requested:
+            self._stopping.set()
+
+        midi_control.set_message_sink(self._deliver)
+        if midi_control.input_mode != midi_control.INPUT_MODE_CALLBACK:
+            logger.warning("The asyncio runtime always reads MIDI input through the port callback")
+            midi_control.set_input_mode(midi_control.INPUT_MODE_CALLBACK)
+
+        self.writer.start()
+        midi_task = self.loop.create_task(self._midi_input(), name='midi-input')
+        watcher_task = None
+        try:
+            if not await self.loop.run_in_executor(self.midi_executor, midi_control.connect_xtouch):
+                logger.warning("Failed to connect to X-Touch Mini on startup")
+                if self.headless:
+                    logger.warning("You can try reconnecting with: xtouchctl.py connect")
+                else:
+                    logger.warning("You can try reconnecting with Ctrl+Page Up or from the tray menu")
+            if self.port_watcher:
+                watcher_task = self.loop.create_task(self._watch_ports(), name='port-watcher')
+            if on_started:
+                await self.loop.run_in_executor(None, on_started)
+            await self._stopping.wait()
+        finally:
+            await self._shutdown(midi_task, watcher_task)
+
+    async def _shutdown(self, midi_task, watcher_task):
+        """Stop everything in order: ports, input, pending writes, executors"""
+        logger.info("Shutting down the event loop runtime...")
+        # 1. No more reconnects
+        if watcher_task:
+            watcher_task.cancel()
+            await asyncio.gather(watcher_task, return_exceptions=True)
+        # 2. No more input: close the ports, then let queued messages drain
+        await self.loop.run_in_executor(self.midi_executor, midi_control.disconnect_xtouch)
+        self._messages.put_nowait(((None, _STOP), None))
+        await midi_task
+        # 3. Write what is still pending
+        await self.writer.aclose()
+        # 4. Finish queued executor work (e.g. a mute toggle) and join the threads
+        self.com_executor.shutdown(wait=True)
+        self.midi_executor.shutdown(wait=True)
+        midi_control.set_message_sink(None)
+        logger.info("Event loop runtime stopped")
+
+    async def _midi_input(self):
+        """Dispatch MIDI messages delivered by the port callbacks of every device"""
+        while True:
+            (device, msg), received_at = await self._messages.get()
+            if msg is _STOP:
+                return
+            if midi_control.capture is not None:
+                midi_control.capture.record(msg, received_at)
+            try:
+                # The writer shows the OSD after writing, as in the thread runtime;
+                # showing it here too would block the loop on Tk
+                (device.engine or self.engine).dispatch(msg, self.writer, None, received_at)
+            except Exception as e:
+                logger.exception("Error processing %s messages: %s", device.name, e)
+
+    async def _watch_ports(self):
+        """Port watcher checks, run on the MIDI executor between waits"""
+        watcher = self.port_watcher
+        self._watcher_wakeup = asyncio.Event()
+        # resume() from the tray or hotkey threads must wake this task
+        watcher.wake = lambda: self.loop.call_soon_threadsafe(self._watcher_wakeup.set)
+        while True:
+            # Cleared before checking, so a wake() during the check is not lost
+            self._watcher_wakeup.clear()
+            try:
+                await self.loop.run_in_executor(self.midi_executor, watcher.check)
+            except Exception as e:
+                logger.error("Error watching MIDI ports: %s", e)
+            try:
+                await asyncio.wait_for(self._watcher_wakeup.wait(), watcher.next_check_delay())
+            except asyncio.TimeoutError:
+                pass
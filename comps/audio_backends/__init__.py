@@ -0,0 +1,68 @@
+"""Audio backends: the system master volume behind one small interface
+
+An endpoint has get_level() and set_level(level) (0.0 to 1.0), get_mute()
+and set_mute(muted), subscribe(callback, on_status=None), which calls
+callback(level, muted, own_change) on every change and returns False when
+the system cannot notify, unsubscribe() and close(). An endpoint whose
+notifications can stop, e.g. when the sound server restarts, calls
+on_status(False) then and on_status(True) once they resume. VolumeControl
+caches and counts on top of it.
+
+    pycaw   Windows Core Audio through pycaw (comps/audio_backends/windows.py)
+    pulse   PulseAudio or PipeWire through pulsectl (comps/audio_backends/pulse.py)
+    memory  In memory, for benchmarks and running without audio; only
+            used when named, never picked by 'auto'
+"""
+import importlib
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+AUTO = 'auto'
+
+# Backend name -> (module, endpoint class); modules are imported on first use
+BACKENDS = {
+    'pycaw': ('comps.audio_backends.windows', 'PycawEndpoint'),
+    'pulse': ('comps.audio_backends.pulse', 'PulseEndpoint'),
+    'memory': ('comps.audio_backends.memory', 'MemoryEndpoint'),
+}
+
+def backend_class(name):
+    """Return the endpoint class of a backend name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown audio backend: {name!r} (choose from {', '.join(BACKENDS)})")
+    module_name, class_name = BACKENDS[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+def auto_order(platform=None):
+    """Backends tried by 'auto' on a platform, best first"""
+    platform = platform or sys.platform
+    if platform == 'win32':
+        return ('pycaw',)
+    if platform.startswith('linux'):
+        return ('pulse',)
+    return ()
+
+def create_endpoint(name=AUTO):
+    """Open the named backend, or the first that works on this platform for 'auto'
+
+    A named backend that fails to open raises, and so does 'auto' when no
+    system backend works: quietly running on the in-memory backend would
+    leave the faders doing nothing. Name 'memory' to run without audio.
+    """
+    if name and name != AUTO:
+        return backend_class(name)()
+
+    for candidate in auto_order():
+        try:
+            endpoint = backend_class(candidate)()
+        except Exception as e:
+            logger.warning("The %s audio backend is not available: %s", candidate, e)
+            continue
+        logger.info("Using the %s audio backend", candidate)
+        return endpoint
+
+    raise RuntimeError(
+        "No system audio backend available (use the 'memory' backend to run without audio)"
+    )
@@ -0,0 +1,86 @@
+import queue
+import threading
+
+class MemoryEndpoint:
+    """In-memory audio endpoint, with change notifications
+
+    Used by benchmarks and to run without any audio system. Like Windows,
+    every change is announced to the subscriber on another thread,
+    including the echo of our own writes. external_change() stands in for
+    the volume being changed by the system, media keys or another
+    application.
+    """
+
+    name = 'memory'
+
+    def __init__(self, level=0.5, muted=False, notifications=True):
+        self.level = level
+        self.muted = muted
+        self.notifications = notifications
+        self.set_level_calls = 0
+        self.set_mute_calls = 0
+        self._callback = None
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def get_level(self):
+        return self.level
+
+    def set_level(self, level):
+        self.set_level_calls += 1
+        self.level = level
+        self._notify(own_change=True)
+
+    def get_mute(self):
+        return self.muted
+
+    def set_mute(self, muted):
+        self.set_mute_calls += 1
+        self.muted = muted
+        self._notify(own_change=True)
+
+    def subscribe(self, callback, on_status=None):
+        if not self.notifications:
+            return False
+        self._callback = callback
+        self._thread = threading.Thread(target=self._run, name='volume-events', daemon=True)
+        self._thread.start()
+        return True
+
+    def unsubscribe(self):
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._callback = None
+
+    def close(self):
+        """Stop change notifications; there is no connection to close"""
+        self.unsubscribe()
+
+    def external_change(self, level=None, muted=None):
+        """Change the volume or mute state as if from outside the application"""
+        if level is not None:
+            self.level = level
+        if muted is not None:
+            self.muted = muted
+        self._notify(own_change=False)
+
+    def wait_notified(self):
+        """Block until every notification so far has been delivered"""
+        if self._thread:
+            self._queue.join()
+
+    def _notify(self, own_change):
+        if self._thread:
+            self._queue.put((self.level, self.muted, own_change))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._callback(*item)
+            finally:
+                self._queue.task_done()
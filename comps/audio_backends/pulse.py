@@ -0,0 +1,281 @@
+import collections
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Notified levels this close to a level we wrote are its echo (PulseAudio
+# stores volumes as integers, 65536 for 100%)
+ECHO_TOLERANCE = 1e-4
+
+# Seconds between attempts to reach the server again after losing it
+RECONNECT_INITIAL = 0.5
+RECONNECT_MAX = 30.0
+
+def _backoff(failures):
+    """Seconds to wait after this many failed attempts in a row (exponential, jittered)"""
+    return random.uniform(0, min(RECONNECT_MAX, RECONNECT_INITIAL * (2 ** (failures - 1))))
+
+class PulseEndpoint:
+    """The default sink of a PulseAudio (or PipeWire) server through pulsectl (Linux)
+
+    One client connection is opened at start and kept, so a write is a
+    single request on an open socket instead of a pactl process per change.
+    subscribe() opens a second connection that only listens for sink and
+    server events, as pulsectl cannot send requests on a connection while
+    it is listening. Events are not tagged with their sender, so a
+    notification matching one of our recent writes counts as our own
+    change. The default sink is followed when it changes. When the server
+    goes away (restart, crash) both connections are opened again, retried
+    with exponential backoff, and subscribers are told that notifications
+    stopped until then. A request that fails on the main connection opens
+    it again too, so writes recover without a listener as well.
+
+    client is the pulsectl module by default; anything with the same Pulse
+    class and PulseLoopStop exception works, e.g. comps.fakes.FakePulseServer.
+    sink_name selects a sink instead of the server's default one.
+    """
+
+    name = 'pulse'
+
+    def __init__(self, sink_name=None, client=None):
+        if client is None:
+            import pulsectl as client
+        self.client = client
+        self.fixed_sink = sink_name
+        self.pulse = client.Pulse('xtouch-volume')
+        self._lock = threading.Lock()  # pulsectl connections are not thread safe
+        self._sink = self._find_sink(self.pulse)
+        self._state = (self._sink.volume.value_flat, bool(self._sink.mute))
+        self._written = collections.deque(maxlen=16)  # (level, muted) after each recent write
+        self._callback = None
+        self._on_status = None
+        self._events = None
+        self._listening = False
+        self._stop = threading.Event()  # Ends a reconnect wait on unsubscribe()
+        self._server_changed = False
+        self._thread = None
+        self._failures = 0  # Failed reopens of the main connection from a request
+        self._retry_at = 0.0  # No reopen from a request before this monotonic time
+        logger.info("Using PulseAudio sink %s", self._sink.name)
+
+    @property
+    def sink_name(self):
+        return self._sink.name
+
+    def _find_sink(self, pulse):
+        """Look up the configured sink, or the server's default one"""
+        return pulse.get_sink_by_name(self.fixed_sink or pulse.server_info().default_sink_name)
+
+    def get_level(self):
+        with self._lock:
+            return self._request(lambda pulse: pulse.get_sink_by_name(self._sink.name).volume.value_flat)
+
+    def set_level(self, level):
+        with self._lock:
+            self._written.append((level, self._state[1]))
+            self._state = (level, self._state[1])
+            self._request(lambda pulse: pulse.volume_set_all_chans(self._sink, level))
+
+    def get_mute(self):
+        with self._lock:
+            return self._request(lambda pulse: bool(pulse.get_sink_by_name(self._sink.name).mute))
+
+    def set_mute(self, muted):
+        with self._lock:
+            self._written.append((self._state[0], muted))
+            self._state = (self._state[0], muted)
+            self._request(lambda pulse: pulse.mute(self._sink, muted))
+
+    def _request(self, request):
+        """Run request(pulse) on the main connection, opening it again if it broke (hold _lock)
+
+        Reopening is tried once per failed request, no more often than the
+        backoff allows while the server stays away; the error is raised
+        when the connection cannot be opened.
+        """
+        try:
+            return request(self.pulse)
+        except Exception as e:
+            if time.monotonic() < self._retry_at:
+                raise
+            logger.warning("PulseAudio request failed, reconnecting: %s", e)
+        pulse = None
+        try:
+            pulse = self.client.Pulse('xtouch-volume')
+            sink = self._find_sink(pulse)
+        except Exception:
+            self._close_quietly(pulse)
+            self._failures += 1
+            self._retry_at = time.monotonic() + _backoff(self._failures)
+            raise
+        self._failures = 0
+        old, self.pulse = self.pulse, pulse
+        self._sink = sink
+        self._close_quietly(old)
+        logger.info("Reconnected to the PulseAudio server")
+        return request(pulse)
+
+    def subscribe(self, callback, on_status=None):
+        """Call callback(level, muted, own_change) on every change; False if unsupported
+
+        on_status(False) is called when the server connection is lost and
+        on_status(True) once it is back. Both run on the 'volume-events' thread.
+        """
+        try:
+            self._events = self.client.Pulse('xtouch-volume-events')
+            self._events.event_mask_set('sink', 'server')
+            self._events.event_callback_set(self._on_event)
+        except Exception as e:
+            logger.warning("Could not listen for PulseAudio volume changes: %s", e)
+            self._events = None
+            return False
+        self._callback = callback
+        self._on_status = on_status
+        self._listening = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='volume-events', daemon=True)
+        self._thread.start()
+        return True
+
+    def unsubscribe(self):
+        if self._thread is None:
+            return
+        with self._lock:
+            self._listening = False
+            events = self._events
+        self._stop.set()
+        try:
+            events.event_listen_stop()
+        except Exception as e:
+            logger.debug("Could not stop listening for PulseAudio events: %s", e)
+        self._thread.join(timeout=1.0)
+        self._thread = None
+        self._close_quietly(self._events)
+        self._events = None
+        self._callback = None
+        self._on_status = None
+
+    def close(self):
+        """Stop listening and close the server connection"""
+        self.unsubscribe()
+        with self._lock:
+            self.pulse.close()
+
+    def _on_event(self, event):
+        """pulsectl event callback: leave event_listen() when our sink or the server changed"""
+        if event.facility == 'server':
+            self._server_changed = True
+            raise self.client.PulseLoopStop
+        if event.facility == 'sink' and event.index == self._sink.index:
+            raise self.client.PulseLoopStop
+
+    def _is_own(self, level, muted):
+        """True if a notified state is the echo of one of our recent writes"""
+        with self._lock:
+            for index, (written_level, written_muted) in enumerate(self._written):
+                if abs(written_level - level) < ECHO_TOLERANCE and written_muted == muted:
+                    # Echoes arrive in write order; older writes were superseded
+                    for _ in range(index + 1):
+                        self._written.popleft()
+                    return True
+            self._state = (level, muted)
+            return False
+
+    def _run(self):
+        """Listener thread: wait for events, then read the sink once for all of them"""
+        events = self._events
+        while self._listening:
+            try:
+                events.event_listen()
+                if not self._listening:
+                    return
+                if self._server_changed:
+                    self._server_changed = False
+                    self._follow_default_sink(events)
+                sink = events.get_sink_by_name(self._sink.name)
+            except Exception as e:
+                if not self._listening:
+                    return
+                logger.warning("Lost the PulseAudio connection: %s", e)
+                self._report_status(False)
+                events = self._reconnect()
+                if events is None:
+                    return
+                logger.info("Reconnected to the PulseAudio server")
+                self._report_status(True)
+                continue
+            level = sink.volume.value_flat
+            muted = bool(sink.mute)
+            try:
+                self._callback(level, muted, self._is_own(level, muted))
+            except Exception as e:
+                logger.error("Error handling a volume change notification: %s", e)
+
+    def _reconnect(self):
+        """Open both connections again, with backoff; None if unsubscribed meanwhile"""
+        self._close_quietly(self._events)
+        failures = 0
+        while self._listening:
+            events = pulse = None
+            try:
+                events = self.client.Pulse('xtouch-volume-events')
+                events.event_mask_set('sink', 'server')
+                events.event_callback_set(self._on_event)
+                pulse = self.client.Pulse('xtouch-volume')
+                sink = self._find_sink(pulse)
+            except Exception as e:
+                self._close_quietly(events)
+                self._close_quietly(pulse)
+                failures += 1
+                delay = _backoff(failures)
+                logger.debug("Could not reach the PulseAudio server (%s), retrying in %.1f s", e, delay)
+                self._stop.wait(delay)
+                continue
+            with self._lock:
+                if not self._listening:
+                    events.close()
+                    pulse.close()
+                    return None
+                old, self.pulse = self.pulse, pulse
+                self._events = events
+                self._sink = sink
+                self._state = (sink.volume.value_flat, bool(sink.mute))
+                self._written.clear()
+                self._failures = 0
+                self._retry_at = 0.0
+            self._close_quietly(old)
+            return events
+        return None
+
+    def _report_status(self, listening):
+        if self._on_status is None:
+            return
+        try:
+            self._on_status(listening)
+        except Exception as e:
+            logger.error("Error handling a volume notification state change: %s", e)
+
+    @staticmethod
+    def _close_quietly(connection):
+        """Close a connection that may already be broken"""
+        if connection is None:
+            return
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug("Error closing a PulseAudio connection: %s", e)
+
+    def _follow_default_sink(self, events):
+        """Switch to the new default sink after a server change (listener thread)"""
+        if self.fixed_sink:
+            return
+        name = events.server_info().default_sink_name
+        if name == self._sink.name:
+            return
+        with self._lock:
+            self._sink = self.pulse.get_sink_by_name(name)
+            self._written.clear()
+        logger.info("Default PulseAudio sink changed to %s", name)
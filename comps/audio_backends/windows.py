@@ -0,0 +1,82 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PycawEndpoint:
+    """The default render endpoint through pycaw (Windows only)
+
+    subscribe() registers an IAudioEndpointVolumeCallback, so volume and
+    mute changes from Windows, media keys or other applications are pushed
+    to us. Writes carry our own event context GUID, which lets the
+    callback tell our own changes apart from everyone else's.
+    """
+
+    name = 'pycaw'
+
+    def __init__(self):
+        # COM and pycaw are imported here so importing this module stays cheap
+        from ctypes import cast, pointer, POINTER
+        from comtypes import CLSCTX_ALL, GUID
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+        self.devices = AudioUtilities.GetSpeakers()
+        interface = self.devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        self.volume = cast(interface, POINTER(IAudioEndpointVolume))
+        self.context = GUID.create_new()
+        self._context_pointer = pointer(self.context)
+        self._callback = None
+
+    def get_level(self):
+        return self.volume.GetMasterVolumeLevelScalar()
+
+    def set_level(self, level):
+        self.volume.SetMasterVolumeLevelScalar(level, self._context_pointer)
+
+    def get_mute(self):
+        return bool(self.volume.GetMute())
+
+    def set_mute(self, muted):
+        self.volume.SetMute(1 if muted else 0, self._context_pointer)
+
+    def subscribe(self, callback, on_status=None):
+        """Call callback(level, muted, own_change) on every change; False if unsupported
+
+        The callback runs on a COM worker thread. Notifications do not stop
+        while the endpoint is open, so on_status is never called.
+        """
+        from comtypes import COMObject
+        from pycaw.pycaw import IAudioEndpointVolumeCallback
+
+        endpoint = self
+
+        class VolumeCallback(COMObject):
+            _com_interfaces_ = [IAudioEndpointVolumeCallback]
+
+            def OnNotify(self, pNotify):
+                data = pNotify.contents
+                try:
+                    callback(data.fMasterVolume, bool(data.bMuted), data.guidEventContext == endpoint.context)
+                except Exception as e:
+                    logger.error("Error handling a volume change notification: %s", e)
+
+        try:
+            self._callback = VolumeCallback()
+            self.volume.RegisterControlChangeNotify(self._callback)
+            return True
+        except Exception as e:
+            logger.warning("Could not register for volume change notifications: %s", e)
+            self._callback = None
+            return False
+
+    def unsubscribe(self):
+        if self._callback is None:
+            return
+        try:
+            self.volume.UnregisterControlChangeNotify(self._callback)
+        except Exception as e:
+            logger.debug("Could not unregister volume change notifications: %s", e)
+        self._callback = None
+
+    def close(self):
+        """Stop change notifications; there is no connection to close"""
+        self.unsubscribe()
@@ -0,0 +1,270 @@
+import logging
+import sys
+import time
+
+from comps import latency
+from comps.mapping import LEVEL_ACTIONS
+from comps.volume_osd import VolumeOSD
+from comps.volume_writer import MASTER
+
+logger = logging.getLogger(__name__)
+
+# Colours and layout of the canvas
+BACKGROUND = '#1e1e1e'
+TRACK = '#3c3c3c'
+FILL = '#3a96dd'
+TEXT = '#ffffff'
+PADDING = 10
+ROW_HEIGHT = 26  # One bar per row in multi-channel mode
+LABEL_WIDTH = 90  # Channel names on the left of the bars
+VALUE_WIDTH = 40  # Percentages on the right of the bars
+
+MONITOR_DEFAULTTONEAREST = 2
+
+def osd_channels(*engines):
+    """Return [(channel, label)] for the level bindings of mapping engines
+
+    The master volume comes first, then applications in binding order,
+    each once even when several engines (controllers) bind it.
+    """
+    channels = [(MASTER, 'Master')]
+    bindings = [binding for engine in engines for binding in engine.table.values()]
+    for binding in bindings:
+        if binding.action not in LEVEL_ACTIONS or binding.action == 'master_volume':
+            continue
+        channel = binding.params['app'].lower()
+        if all(existing != channel for existing, _ in channels):
+            label = binding.params.get('label') or binding.params['app'].rsplit('.', 1)[0]
+            channels.append((channel, label))
+    return channels
+
+def _monitor_under_pointer(window):
+    """Return a key for the monitor the mouse pointer is on
+
+    Windows is asked for the monitor handle directly (one cheap call);
+    elsewhere Tk only knows one screen, so there is a single key.
+    """
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            user32 = ctypes.windll.user32
+            point = wintypes.POINT()
+            user32.GetCursorPos(ctypes.byref(point))
+            user32.MonitorFromPoint.argtypes = [wintypes.POINT, wintypes.DWORD]
+            user32.MonitorFromPoint.restype = wintypes.HMONITOR
+            return user32.MonitorFromPoint(point, MONITOR_DEFAULTTONEAREST)
+        except Exception as e:
+            logger.debug("Could not find the active monitor: %s", e)
+    return 'screen'
+
+def _monitor_work_area(monitor, window):
+    """Return (left, top, right, bottom) of a monitor's work area"""
+    if sys.platform == 'win32' and monitor != 'screen':
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class MONITORINFO(ctypes.Structure):
+                _fields_ = [
+                    ('cbSize', wintypes.DWORD),
+                    ('rcMonitor', wintypes.RECT),
+                    ('rcWork', wintypes.RECT),
+                    ('dwFlags', wintypes.DWORD),
+                ]
+
+            info = MONITORINFO()
+            info.cbSize = ctypes.sizeof(MONITORINFO)
+            if ctypes.windll.user32.GetMonitorInfoW(monitor, ctypes.byref(info)):
+                work = info.rcWork
+                return work.left, work.top, work.right, work.bottom
+        except Exception as e:
+            logger.debug("Could not read the monitor work area: %s", e)
+    return 0, 0, window.winfo_screenwidth(), window.winfo_screenheight()
+
+class CanvasVolumeOSD(VolumeOSD):
+    """Volume OSD drawn on a single Tk canvas
+
+    All text and bars are canvas items created once; a show only moves a
+    bar's end and changes a text item, so nothing is laid out again.
+    Renders are capped at max_fps: requests arriving faster collapse into
+    the next frame. The window geometry is computed once per monitor and
+    cached, and the OSD appears on the monitor the mouse pointer is on.
+
+    With multi_channel the window holds one bar per level binding (master
+    and applications, see set_channels()) instead of only the master.
+    """
+
+    def __init__(self, max_fps=60, multi_channel=False, duration=1.5):
+        super().__init__()
+        self.duration = duration
+        self.frame_interval = 1.0 / max_fps if max_fps else 0.0
+        self.multi_channel = multi_channel
+        self.channels = [(MASTER, 'Volume')]
+        self.pending_channels = {}  # Channel -> (level, stamps) waiting to be rendered
+        self.channel_percent = {}  # Channel -> percent currently drawn
+        self.items = {}  # Channel -> (fill rectangle id, text id, bar box, text format)
+        self.canvas = None
+        self.last_frame = 0.0
+        self.frames = 0
+        self.geometry_cache = {}  # (monitor, width, height) -> geometry string
+        self.current_monitor = None
+
+    def set_channels(self, channels):
+        """Set the [(channel, label)] shown in multi-channel mode"""
+        if not self.multi_channel:
+            return
+        self.channels = list(channels)
+        if self.initialized:
+            self._queue_tk_command(self._layout)
+
+    def update_channels(self, *engines):
+        """Rebuild the channel list from the mapping engines, e.g. after a reload"""
+        self.set_channels(osd_channels(*engines))
+
+    def _create_window(self):
+        """Create the OSD window and its canvas (called in tk thread)"""
+        # Tkinter is only loaded once the OSD is first needed
+        import tkinter as tk
+
+        self.window = tk.Tk()
+        self.window.withdraw()  # Hide initially
+        self.window.overrideredirect(True)  # Remove window decorations
+        self.window.attributes("-topmost", True)  # Keep on top
+        self.window.attributes("-alpha", 0.8)  # Semi-transparent
+
+        self.canvas = tk.Canvas(self.window, highlightthickness=0, bd=0, background=BACKGROUND)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self._layout()
+
+    def _layout(self):
+        """Create the canvas items for the current channels (called in tk thread)"""
+        canvas = self.canvas
+        canvas.delete('all')
+        self.items = {}
+        self.channel_percent = {}
+
+        if self.multi_channel:
+            self.height = PADDING * 2 + ROW_HEIGHT * len(self.channels)
+            bar_left = PADDING + LABEL_WIDTH
+            bar_right = self.width - PADDING - VALUE_WIDTH
+            for row, (channel, label) in enumerate(self.channels):
+                top = PADDING + row * ROW_HEIGHT
+                middle = top + ROW_HEIGHT // 2
+                canvas.create_text(PADDING, middle, text=label, anchor='w', fill=TEXT, font=("Arial", 10, "bold"))
+                canvas.create_rectangle(bar_left, middle - 5, bar_right, middle + 5, fill=TRACK, width=0)
+                fill = canvas.create_rectangle(bar_left, middle - 5, bar_left, middle + 5, fill=FILL, width=0)
+                text = canvas.create_text(self.width - PADDING, middle, text="--", anchor='e', fill=TEXT, font=("Arial", 10))
+                self.items[channel] = (fill, text, (bar_left, middle - 5, bar_right, middle + 5), "{}%")
+        else:
+            self.height = 50
+            bar_left = PADDING
+            bar_right = self.width - PADDING
+            text = canvas.create_text(self.width // 2, 14, text="", fill=TEXT, font=("Arial", 12, "bold"))
+            canvas.create_rectangle(bar_left, 28, bar_right, 42, fill=TRACK, width=0)
+            fill = canvas.create_rectangle(bar_left, 28, bar_left, 42, fill=FILL, width=0)
+            self.items[MASTER] = (fill, text, (bar_left, 28, bar_right, 42), "Volume: {}%")
+
+        canvas.configure(width=self.width, height=self.height)
+        # The size changed, so place the window again on the next show
+        self.current_monitor = None
+
+    def _place(self):
+        """Move the window to the active monitor, from the cache when possible"""
+        monitor = _monitor_under_pointer(self.window)
+        if monitor == self.current_monitor:
+            return
+        key = (monitor, self.width, self.height)
+        geometry = self.geometry_cache.get(key)
+        if geometry is None:
+            left, top, right, bottom = _monitor_work_area(monitor, self.window)
+            # Bottom center of the monitor, 100px above the bottom edge
+            x_position = left + (right - left - self.width) // 2
+            y_position = bottom - self.height - 100
+            geometry = f"{self.width}x{self.height}+{x_position}+{y_position}"
+            self.geometry_cache[key] = geometry
+        self.window.geometry(geometry)
+        self.current_monitor = monitor
+
+    def show_volume(self, volume_level, received_at=None, volume_set_at=None):
+        """Show the master volume (0.0 to 1.0)"""
+        self.show_channel(MASTER, volume_level, received_at=received_at, volume_set_at=volume_set_at)
+
+    def show_channel(self, channel, volume_level, received_at=None, volume_set_at=None):
+        """Show the level of one channel; channels without a bar are ignored"""
+        if channel is not MASTER and not self.multi_channel:
+            return
+        if not self.initialized:
+            self.initialize()
+
+        # Collapse bursts into one pending level per channel; only the first
+        # request of a frame wakes the Tk thread
+        with self.tk_lock:
+            stamps = (received_at, volume_set_at) if received_at is not None else None
+            self.pending_channels[channel] = (volume_level, stamps)
+            if self.render_scheduled:
+                return
+            self.render_scheduled = True
+
+        if not self._queue_tk_command(self._render_pending):
+            with self.tk_lock:
+                self.render_scheduled = False
+
+    def _render_pending(self):
+        """Draw the pending levels, at most once per frame interval (called in tk thread)"""
+        wait = self.last_frame + self.frame_interval - time.monotonic()
+        if wait > 0:
+            # Too soon: render_scheduled stays set, newer levels keep replacing the pending ones
+            self.window.after(max(1, int(wait * 1000)), self._render_pending)
+            return
+
+        with self.tk_lock:
+            pending = self.pending_channels
+            self.pending_channels = {}
+            self.render_scheduled = False
+        if not pending:
+            return
+
+        shown_at = time.perf_counter() if latency.tracker is not None else None
+        drawn = False
+        for channel, (volume_level, stamps) in pending.items():
+            if stamps is not None and shown_at is not None:
+                received_at, volume_set_at = stamps
+                latency.tracker.record('receive_to_osd', received_at, shown_at)
+                if volume_set_at is not None:
+                    latency.tracker.record('volume_to_osd', volume_set_at, shown_at)
+            drawn = self._draw_channel(channel, volume_level) or drawn
+        if not drawn:
+            return
+
+        self.last_frame = time.monotonic()
+        self.frames += 1
+        if not self.showing:
+            self._place()
+            self.window.deiconify()
+            self.showing = True
+
+        # Restart the hide timer
+        if self.hide_timer is not None:
+            self.window.after_cancel(self.hide_timer)
+        self.hide_timer = self.window.after(int(self.duration * 1000), self._do_hide)
+
+    def _draw_channel(self, channel, volume_level):
+        """Update one channel's bar and text in place; False if it has no bar"""
+        items = self.items.get(channel)
+        if items is None:
+            return False
+        percent = int(volume_level * 100)
+        if percent != self.channel_percent.get(channel):
+            fill, text, (left, top, right, bottom), label = items
+            self.canvas.coords(fill, left, top, left + (right - left) * percent / 100, bottom)
+            self.canvas.itemconfigure(text, text=label.format(percent))
+            self.channel_percent[channel] = percent
+        return True
+
+    def destroy(self):
+        """Destroy the window when closing the application"""
+        super().destroy()
+        with self.tk_lock:
+            self.pending_channels = {}
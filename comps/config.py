@@ -0,0 +1,125 @@
+import copy
+import json
+import os
+import sys
+
+# config.json next to midi.py is picked up automatically when present
+DEFAULT_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.json'
+)
+
+# Built-in defaults, overridden by values from the config file
+DEFAULTS = {
+    'logging': {
+        'level': 'INFO',  # Root level for all application loggers
+        'levels': {},  # Per-logger overrides, e.g. {"comps.midi_control": "DEBUG"}
+        'file': None,  # Optional log file in addition to the console
+        'ring_buffer_size': 0,  # Number of recent records kept in memory (0 disables)
+    },
+    'device': {
+        # The controller is the first MIDI input whose name contains this
+        # (case-insensitive); an empty string takes the first port
+        'port_name': 'X-TOUCH MINI',
+        'auto_reconnect': True,  # Watch for the device being plugged in or out
+        'poll_interval': 1.0,  # Seconds between port list checks
+        'backoff_max': 30.0,  # Longest wait between failed reconnect attempts
+    },
+    # Several controllers at once: a list of {"name", "port_name",
+    # "mappings", "feedback"} entries. Each device gets its own bindings
+    # (the top-level mappings when it has none) and reconnects on its own.
+    # Empty means one device found by device.port_name.
+    'devices': [],
+    # MIDI bindings, see comps/mapping.py. Channels are 0-based as in mido,
+    # so channel 10 here is MIDI channel 11 on the device.
+    'mappings': [
+        # Volume slider on layer A of the X-Touch Mini
+        {'type': 'control_change', 'channel': 10, 'control': 9, 'action': 'master_volume'},
+    ],
+    # Global hotkeys, see comps/hotkeys.py. Only these combinations are
+    # hooked; a list in the config file replaces this one
+    'hotkeys': [
+        {'keys': 'ctrl+page down', 'action': 'disconnect'},
+        {'keys': 'ctrl+page up', 'action': 'connect'},
+    ],
+    'audio': {
+        # "auto" (pycaw on Windows, pulse on Linux), or one of "pycaw",
+        # "pulse", "memory" (no audio); see comps/audio_backends
+        'backend': 'auto',
+    },
+    'feedback': {
+        # Mirror volume and mute state to the controller's LEDs
+        'enabled': True,
+        'max_flush_rate': 30,  # Batches of LED updates sent per second at most
+    },
+    'osd': {
+        # "widgets" (label and progress bar) or "canvas" (lighter redraws,
+        # frame rate cap, shown on the monitor with the mouse pointer)
+        'renderer': 'widgets',
+        'duration': 1.5,  # Seconds the OSD stays visible after a change
+        'max_fps': 60,  # Canvas renderer: redraws per second at most
+        'multi_channel': False,  # Canvas renderer: one bar per volume binding
+    },
+    'control': {
+        # Local control socket for xtouchctl.py; None opens it only when
+        # running with --headless
+        'enabled': None,
+        'address': None,  # Socket path or pipe name, None for a per-user default
+    },
+    'sessions': {
+        # Per-application volume index; None starts it only when an
+        # app_volume binding is configured
+        'enabled': None,
+        'refresh_interval': 5.0,  # Seconds between background index rebuilds
+    },
+}
+
+def _merge(base, override):
+    """Recursively merge override into a copy of base"""
+    result = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+def load_config(path=None):
+    """Load the JSON config file merged over the defaults
+    
+    When no path is given the default config.json is used if it exists;
+    an explicitly given path must exist.
+    """
+    if path is None:
+        path = DEFAULT_CONFIG_PATH
+        if not os.path.exists(path):
+            return copy.deepcopy(DEFAULTS)
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Config file {path} must contain a JSON object")
+    return _merge(DEFAULTS, data)
+
+def cache_dir():
+    """Per-user directory for files the application writes (icon cache, stats, profiles)
+
+    %LOCALAPPDATA% on Windows, ~/Library/Caches on macOS and $XDG_CACHE_HOME
+    (~/.cache) elsewhere, each with an xtouch-volume subdirectory. Unlike
+    the shared temp directory, no other user can create files there first.
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'xtouch-volume')
+
+def cache_path(name):
+    """Path of a file in cache_dir(), creating the directory (mode 0700) when missing"""
+    directory = cache_dir()
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    except OSError:
+        pass  # Reported by whatever opens the file
+    return os.path.join(directory, name)
@@ -0,0 +1,197 @@
+"""Local control endpoint for a running instance
+
+A Unix domain socket (or a named pipe on Windows) that accepts small JSON
+requests, one message per request: {"command": "status"}. Every request
+gets one reply, {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+Messages are framed by multiprocessing.connection; JSON rather than pickle
+keeps whatever connects to the endpoint from running code in the process.
+"""
+import getpass
+import json
+import logging
+import os
+import stat
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_SIZE = 64 * 1024
+
+def _user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return 'default'
+
+def runtime_dir():
+    """Directory of the default socket: $XDG_RUNTIME_DIR, else a per-user one in the temp directory
+
+    The shared temp directory itself is never used, as anyone could create
+    the socket path there first.
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if directory and os.path.isdir(directory):
+        return directory
+    return os.path.join(tempfile.gettempdir(), f'xtouch-volume-{_user()}')
+
+def default_address():
+    """Return the per-user socket path or pipe name"""
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\xtouch-volume-{_user()}'
+    return os.path.join(runtime_dir(), 'xtouch-volume.sock')
+
+def check_runtime_dir(address, create=False):
+    """Make sure a socket in runtime_dir() cannot be taken over by another user
+
+    Creates the directory with mode 0700 when create is set and it does not
+    exist yet. Raises OSError when it is a symlink, belongs to another user
+    or can be used by others. Addresses elsewhere are left to the user.
+    """
+    directory = runtime_dir()
+    if sys.platform == 'win32' or os.path.dirname(os.path.abspath(address)) != os.path.abspath(directory):
+        return
+    if create and not os.path.lexists(directory):
+        os.mkdir(directory, 0o700)
+    info = os.lstat(directory)
+    if stat.S_ISLNK(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError(f"{directory} must be a directory only the current user can access")
+
+def _family(address):
+    return 'AF_PIPE' if address.startswith('\\\\') else 'AF_UNIX'
+
+class ControlServer:
+    """Serves control requests on a local socket from a background thread
+
+    handlers maps command names to callables taking no arguments; their
+    return value (anything JSON can encode) is the reply's result. Each
+    client gets a short-lived thread, so a client that never sends its
+    request does not hold up anyone else.
+    """
+
+    def __init__(self, handlers, address=None):
+        self.handlers = dict(handlers)
+        self.address = address or default_address()
+        self.requests = 0
+        self._listener = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Open the endpoint and start accepting clients"""
+        if self._running:
+            return
+        family = _family(self.address)
+        if family == 'AF_UNIX':
+            check_runtime_dir(self.address, create=True)
+            self._remove_stale_socket()
+        self._listener = Listener(self.address, family=family)
+        if family == 'AF_UNIX':
+            os.chmod(self.address, 0o600)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='control-server', daemon=True)
+        self._thread.start()
+        logger.info("Control socket listening on %s", self.address)
+
+    def stop(self, timeout=1.0):
+        """Stop accepting clients and remove the endpoint"""
+        if not self._running:
+            return
+        self._running = False
+        # accept() does not return when the listener is closed, so connect once to wake it.
+        # At exit multiprocessing may have removed the socket file already; then nothing
+        # can wake it and the daemon thread is left to end with the process
+        try:
+            Client(self.address, family=_family(self.address)).close()
+        except OSError:
+            timeout = 0
+        if self._thread:
+            if timeout:
+                self._thread.join(timeout=timeout)
+            self._thread = None
+        try:
+            self._listener.close()
+        except FileNotFoundError:
+            pass  # The socket file was removed already
+        self._listener = None
+
+    def _remove_stale_socket(self):
+        """Remove a socket file left behind by a crashed instance
+
+        Raises OSError when another instance is still listening on it.
+        """
+        if not os.path.exists(self.address):
+            return
+        try:
+            Client(self.address, family='AF_UNIX').close()
+        except OSError:
+            os.unlink(self.address)
+            return
+        raise OSError(f"Another instance is already listening on {self.address}")
+
+    def _run(self):
+        """Accept loop"""
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except OSError as e:
+                if self._running:
+                    logger.error("Control socket accept failed: %s", e)
+                continue
+            if not self._running:
+                conn.close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), name='control-client', daemon=True).start()
+
+    def _serve(self, conn):
+        """Answer the requests of one client until it disconnects"""
+        with conn:
+            while True:
+                try:
+                    data = conn.recv_bytes(MAX_MESSAGE_SIZE)
+                except (EOFError, OSError):
+                    return
+                reply = self.handle(data)
+                try:
+                    conn.send_bytes(json.dumps(reply).encode('utf-8'))
+                except OSError:
+                    return
+
+    def handle(self, data):
+        """Run one encoded request and return the reply dictionary"""
+        self.requests += 1
+        try:
+            request = json.loads(data)
+            command = request['command']
+        except (ValueError, TypeError, KeyError):
+            return {'ok': False, 'error': "Requests must be JSON objects with a 'command'"}
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {'ok': False, 'error': f"Unknown command {command!r}"}
+        logger.debug("Control request: %s", command)
+        try:
+            return {'ok': True, 'result': handler()}
+        except Exception as e:
+            logger.exception("Error running control command %s: %s", command, e)
+            return {'ok': False, 'error': str(e)}
+
+def send_command(command, address=None, timeout=5.0):
+    """Send one command to a running instance and return its result
+
+    Raises OSError when nothing is listening, TimeoutError when there is
+    no reply within timeout seconds and RuntimeError when the command
+    failed in the instance.
+    """
+    address = address or default_address()
+    if _family(address) == 'AF_UNIX':
+        check_runtime_dir(address)
+    with Client(address, family=_family(address)) as conn:
+        conn.send_bytes(json.dumps({'command': command}).encode('utf-8'))
+        if not conn.poll(timeout):
+            raise TimeoutError(f"No reply to {command!r} within {timeout} seconds")
+        reply = json.loads(conn.recv_bytes(MAX_MESSAGE_SIZE))
+    if not reply.get('ok'):
+        raise RuntimeError(reply.get('error') or f"{command!r} failed")
+    return reply['result']
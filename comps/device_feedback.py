@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+
+import mido
+
+from comps.volume_writer import MASTER, MUTE
+
+logger = logging.getLogger(__name__)
+
+# X-Touch Mini button LEDs in standard mode: note on velocity 0 = off, 1 = on
+LED_OFF = 0
+LED_ON = 1
+
+def _binding_target(binding):
+    """Return (feedback target, kind) of a binding, or None if it has no state"""
+    if binding.action == 'master_volume':
+        return MASTER, 'level'
+    if binding.action == 'app_volume':
+        return binding.params['app'].lower(), 'level'
+    if binding.action == 'mute_toggle':
+        return MUTE, 'toggle'
+    return None
+
+def routes_from_engine(engine):
+    """Build {target: [(kind, type, channel, number)]} from a mapping engine
+
+    A binding reflects its state back to the control it is bound to, or to
+    the control given in its "feedback" parameter; "feedback": false turns
+    it off.
+    """
+    routes = {}
+    for (msg_type, channel, number), binding in engine.table.items():
+        if msg_type == 'note_off':
+            continue  # Release half of a note_on binding
+        target = _binding_target(binding)
+        feedback = binding.params.get('feedback', True)
+        if target is None or feedback is False:
+            continue
+        if isinstance(feedback, dict):
+            msg_type = feedback.get('type', msg_type)
+            channel = feedback.get('channel', channel)
+            number = feedback.get('control', feedback.get('note', number))
+        if msg_type == 'note_off':
+            msg_type = 'note_on'
+        target, kind = target
+        routes.setdefault(target, []).append((kind, msg_type, channel, number))
+    return routes
+
+class DeviceFeedback:
+    """Keeps the controller's LED rings and button lights in sync
+
+    A shadow copy holds the value last sent for every control. report()
+    records the wanted state and marks only controls whose value differs as
+    dirty; a flush thread sends the dirty controls in one batch at most
+    max_flush_rate times a second, so a volume sweep cannot flood the USB
+    MIDI link. attach() performs a full resync, e.g. after a reconnect. A
+    port that fails to send is dropped until the next attach(), so a device
+    that went away is not retried and logged on every flush.
+    """
+
+    def __init__(self, max_flush_rate=30):
+        self.min_interval = 1.0 / max_flush_rate if max_flush_rate else 0.0
+        self.routes = {}
+        self.port = None
+        self.shadow = {}  # (type, channel, number) -> value last sent
+        self.desired = {}  # (type, channel, number) -> value wanted
+        self.dirty = set()
+        self.messages_sent = 0
+        self.flushes = 0
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the flush thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='device-feedback', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the flush thread after sending what is still dirty"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def set_routes(self, routes):
+        """Install the target -> controls routing (see routes_from_engine)"""
+        with self._condition:
+            self.routes = routes
+
+    def update_routes(self, engine):
+        """Rebuild the routing from a mapping engine, e.g. after a reload"""
+        self.set_routes(routes_from_engine(engine))
+
+    def attach(self, port):
+        """Send to a newly opened output port, resending the full state"""
+        with self._condition:
+            self.port = port
+            self.shadow.clear()
+            self.dirty = set(self.desired)
+            self._condition.notify()
+
+    def detach(self):
+        """Stop sending, e.g. when the device is disconnected"""
+        with self._condition:
+            self.port = None
+
+    def report(self, target, value):
+        """Record the state of a target (a level 0.0-1.0 or a mute flag)"""
+        controls = self.routes.get(target)
+        if not controls:
+            return
+        with self._condition:
+            for kind, msg_type, channel, number in controls:
+                if kind == 'toggle':
+                    device_value = LED_ON if value else LED_OFF
+                else:
+                    device_value = max(0, min(127, int(round(value * 127))))
+                key = (msg_type, channel, number)
+                self.desired[key] = device_value
+                if self.shadow.get(key) != device_value:
+                    self.dirty.add(key)
+                else:
+                    self.dirty.discard(key)
+            if self.dirty:
+                self._condition.notify()
+
+    def _take_batch(self):
+        """Wait for dirty controls and return (port, [(key, value)])"""
+        with self._condition:
+            while self._running and not (self.dirty and self.port):
+                self._condition.wait()
+            if not (self.dirty and self.port):
+                return None, []
+            batch = [(key, self.desired[key]) for key in self.dirty]
+            self.dirty = set()
+            return self.port, batch
+
+    def _run(self):
+        """Flush thread main loop"""
+        next_flush = 0.0
+        while True:
+            delay = next_flush - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)  # Let more changes collapse into this batch
+
+            port, batch = self._take_batch()
+            if port is None:
+                return
+
+            sent = []
+            failed = False
+            try:
+                for (msg_type, channel, number), value in batch:
+                    if msg_type == 'control_change':
+                        msg = mido.Message('control_change', channel=channel, control=number, value=value)
+                    else:
+                        msg = mido.Message('note_on', channel=channel, note=number, velocity=value)
+                    port.send(msg)
+                    sent.append(((msg_type, channel, number), value))
+            except Exception as e:
+                failed = True
+                logger.error("Error sending feedback to X-Touch Mini, stopping until it reconnects: %s", e)
+
+            with self._condition:
+                for key, value in sent:
+                    self.shadow[key] = value
+                # Controls that failed to send stay dirty; attach() resends everything anyway
+                if self._running:
+                    for key, value in batch[len(sent):]:
+                        if self.desired.get(key) == value:
+                            self.dirty.add(key)
+                if failed and self.port is port:
+                    self.port = None
+                self.messages_sent += len(sent)
+                self.flushes += 1
+            next_flush = time.monotonic() + self.min_interval
+
+class FeedbackGroup:
+    """Fans state reports out to the DeviceFeedback of every controller
+
+    Has the part of the DeviceFeedback interface the volume writer and
+    shutdown use, so several controllers can mirror one volume state.
+    """
+
+    def __init__(self, feedbacks):
+        self.feedbacks = list(feedbacks)
+
+    @property
+    def messages_sent(self):
+        return sum(feedback.messages_sent for feedback in self.feedbacks)
+
+    @property
+    def flushes(self):
+        return sum(feedback.flushes for feedback in self.feedbacks)
+
+    def start(self):
+        for feedback in self.feedbacks:
+            feedback.start()
+
+    def stop(self, timeout=1.0):
+        for feedback in self.feedbacks:
+            feedback.stop(timeout=timeout)
+
+    def report(self, target, value):
+        for feedback in self.feedbacks:
+            feedback.report(target, value)
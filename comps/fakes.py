@@ -0,0 +1,349 @@
+"""In-memory stand-ins for the MIDI port, volume backends and OSD
+
+These let the message path run without an X-Touch Mini, Windows audio or a
+display, e.g. for the benchmarks in benchmarks/.
+"""
+import collections
+import queue
+import threading
+import time
+import types
+
+from comps import latency
+from comps.session_volume import SESSION_STATE_ACTIVE, SESSION_STATE_EXPIRED
+
+class ScriptedInputPort:
+    """Fake mido input port fed from a script of (delay, message) pairs
+
+    Messages are delivered to the callback when one is set (like mido's
+    callback ports), otherwise they queue up for iter_pending(). Each
+    delivered message is stamped with perf_counter() in delivered_at.
+    """
+
+    def __init__(self, name='Fake X-TOUCH MINI'):
+        self.name = name
+        self.callback = None
+        self.closed = False
+        self.pending = collections.deque()
+        self.delivered_at = []  # (perf_counter timestamp, message) per delivery
+        self.reads_after_close = 0
+        self._thread = None
+
+    def deliver(self, msg):
+        """Deliver one message right now"""
+        self.delivered_at.append((time.perf_counter(), msg))
+        callback = self.callback
+        if callback is not None:
+            callback(msg)
+        else:
+            self.pending.append(msg)
+
+    def play(self, script, wait=True):
+        """Deliver (delay_seconds, message) pairs on a feeder thread
+
+        A delay of 0 delivers the message back to back with the previous one.
+        """
+        def feed():
+            next_time = time.perf_counter()
+            for delay, msg in script:
+                if delay:
+                    next_time += delay
+                    remaining = next_time - time.perf_counter()
+                    if remaining > 0:
+                        time.sleep(remaining)
+                if self.closed:
+                    return
+                self.deliver(msg)
+
+        self._thread = threading.Thread(target=feed, name='fake-midi-feed', daemon=True)
+        self._thread.start()
+        if wait:
+            self._thread.join()
+
+    def iter_pending(self):
+        """Yield queued messages like mido's iter_pending()
+
+        Reading a closed port raises and is counted in reads_after_close,
+        so tests can check the port is never used after close().
+        """
+        if self.closed:
+            self.reads_after_close += 1
+            raise ValueError("iter_pending() called on closed port")
+        while self.pending:
+            yield self.pending.popleft()
+
+    def close(self):
+        self.closed = True
+
+class RecordingOutputPort:
+    """Fake mido output port that records every message sent"""
+
+    def __init__(self, name='Fake X-TOUCH MINI'):
+        self.name = name
+        self.closed = False
+        self.sent = []  # (perf_counter timestamp, message) per send
+        self.fail = False  # Set to make send() raise like an unplugged device
+
+    def send(self, msg):
+        if self.fail or self.closed:
+            raise OSError("Output port is not available")
+        self.sent.append((time.perf_counter(), msg))
+
+    def close(self):
+        self.closed = True
+
+class RecordingVolumeControl:
+    """Fake VolumeControl that records every write with a timestamp"""
+
+    def __init__(self, initial_volume=0.5, write_delay=0.0):
+        self.current_volume = initial_volume
+        self.muted = False
+        self.write_delay = write_delay  # Simulated cost of the backend call
+        self.writes = []  # (perf_counter timestamp, level) per write
+
+    def get_volume(self):
+        return self.current_volume
+
+    def set_volume(self, new_volume, received_at=None, ramp_time=None):
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        self.current_volume = new_volume
+        self.writes.append((time.perf_counter(), new_volume))
+        if received_at is not None and latency.tracker is not None:
+            latency.tracker.record('receive_to_volume', received_at)
+        return self.current_volume
+
+    def get_mute(self):
+        return self.muted
+
+    def set_mute(self, muted):
+        self.muted = muted
+        return muted
+
+    def toggle_mute(self):
+        return self.set_mute(not self.muted)
+
+class NullVolumeOSD:
+    """Fake VolumeOSD that only counts show requests"""
+
+    def __init__(self):
+        self.shows = 0
+
+    def show_volume(self, volume_level, received_at=None, volume_set_at=None):
+        self.shows += 1
+
+    def show_channel(self, channel, volume_level, received_at=None, volume_set_at=None):
+        self.shows += 1
+
+    def hide(self):
+        pass
+
+    def destroy(self):
+        pass
+
+class FakeSimpleAudioVolume:
+    """Stand-in for ISimpleAudioVolume that can be expired like a dead session"""
+
+    def __init__(self, level=1.0):
+        self.level = level
+        self.expired = False
+
+    def GetMasterVolume(self):
+        return self.level
+
+    def SetMasterVolume(self, level, context):
+        if self.expired:
+            raise OSError("Audio session expired")
+        self.level = level
+
+class FakeSessionProvider:
+    """In-memory session provider, so indexing and eviction run without Windows"""
+
+    def __init__(self):
+        self.sessions = []  # [process name, FakeSimpleAudioVolume, state]
+        self.list_calls = 0
+
+    def add_session(self, process_name, level=1.0):
+        """Start a fake session and return its volume object"""
+        volume = FakeSimpleAudioVolume(level)
+        self.sessions.append([process_name, volume, SESSION_STATE_ACTIVE])
+        return volume
+
+    def expire_session(self, volume):
+        """Mark a session expired; its volume raises from now on"""
+        volume.expired = True
+        for session in self.sessions:
+            if session[1] is volume:
+                session[2] = SESSION_STATE_EXPIRED
+
+    def remove_session(self, volume):
+        """Drop a session from the enumeration entirely"""
+        self.expire_session(volume)
+        self.sessions = [session for session in self.sessions if session[1] is not volume]
+
+    def thread_init(self):
+        pass
+
+    def list_sessions(self):
+        self.list_calls += 1
+        return [tuple(session) for session in self.sessions]
+
+class FakePulseServer:
+    """Stand-in for the pulsectl module and the PulseAudio server behind it
+
+    Pass it as client to comps.audio_backends.pulse.PulseEndpoint. Pulse()
+    opens a connection; every request on a connection takes round_trip
+    seconds, like a request on a real server socket. Like the real server,
+    every volume or mute change is announced as a sink change event to the
+    connections listening for sink events, and levels are stored with the
+    server's 1/65536 resolution. external_change() stands in for another
+    client changing the volume; stop() and start() for the server
+    restarting, which breaks every open connection.
+    """
+
+    class PulseLoopStop(Exception):
+        """Raised by an event callback to leave event_listen()"""
+
+    def __init__(self, sinks=('fake-sink',), level=0.5, muted=False, round_trip=0.0):
+        self.round_trip = round_trip
+        self.sinks = {name: {'index': index, 'level': level, 'mute': muted} for index, name in enumerate(sinks)}
+        self.default_sink_name = sinks[0]
+        self.running = True
+        self.connections_opened = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def Pulse(self, client_name=None):
+        """Open a client connection; fails while the server is stopped"""
+        if not self.running:
+            raise ConnectionRefusedError("PulseAudio server is not running")
+        connection = FakePulseConnection(self, client_name)
+        with self._lock:
+            self.connections_opened += 1
+            self._connections.append(connection)
+        return connection
+
+    def external_change(self, level=None, muted=None, sink_name=None):
+        """Change a sink (the default one) as if from another client"""
+        self._change(sink_name or self.default_sink_name, level, muted)
+
+    def set_default_sink(self, name):
+        """Make another sink the default, as a desktop sound setting would"""
+        with self._lock:
+            self.default_sink_name = name
+        self._emit('server', -1)
+
+    def stop(self):
+        """Stop the server: open connections fail and new ones are refused"""
+        with self._lock:
+            self.running = False
+            connections = list(self._connections)
+            self._connections.clear()
+        for connection in connections:
+            connection.lost = True
+            connection._events.put(None)
+
+    def start(self):
+        """Start the server again after stop()"""
+        self.running = True
+
+    def _request(self):
+        if self.round_trip:
+            time.sleep(self.round_trip)
+        with self._lock:
+            self.requests += 1
+
+    def _sink(self, name):
+        with self._lock:
+            sink = self.sinks[name]
+            level = sink['level']
+            return types.SimpleNamespace(
+                index=sink['index'], name=name, mute=int(sink['mute']),
+                volume=types.SimpleNamespace(value_flat=level, values=[level, level])
+            )
+
+    def _change(self, name, level=None, muted=None):
+        with self._lock:
+            sink = self.sinks[name]
+            if level is not None:
+                sink['level'] = round(level * 65536) / 65536
+            if muted is not None:
+                sink['mute'] = bool(muted)
+            index = sink['index']
+        self._emit('sink', index)
+
+    def _emit(self, facility, index):
+        event = types.SimpleNamespace(facility=facility, t='change', index=index)
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            if facility in connection.mask:
+                connection._events.put(event)
+
+    def _close(self, connection):
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+
+class FakePulseConnection:
+    """One client connection to a FakePulseServer, with the pulsectl.Pulse methods PulseEndpoint uses"""
+
+    def __init__(self, server, client_name=None):
+        self.server = server
+        self.client_name = client_name
+        self.mask = ()
+        self.callback = None
+        self.closed = False
+        self.lost = False  # Set when the server stops
+        self._events = queue.Queue()
+
+    def _request(self):
+        if self.lost:
+            raise ConnectionResetError("Connection to the PulseAudio server was lost")
+        self.server._request()
+
+    def server_info(self):
+        self._request()
+        return types.SimpleNamespace(default_sink_name=self.server.default_sink_name)
+
+    def get_sink_by_name(self, name):
+        self._request()
+        return self.server._sink(name)
+
+    def volume_set_all_chans(self, sink, level):
+        self._request()
+        self.server._change(sink.name, level=level)
+
+    def mute(self, sink, mute=True):
+        self._request()
+        self.server._change(sink.name, muted=mute)
+
+    def event_mask_set(self, *masks):
+        self.mask = masks
+
+    def event_callback_set(self, callback):
+        self.callback = callback
+
+    def event_listen(self, timeout=None):
+        """Pass events to the callback until it raises PulseLoopStop, event_listen_stop() or timeout"""
+        while True:
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if self.lost:
+                raise ConnectionResetError("Connection to the PulseAudio server was lost")
+            if event is None:
+                return
+            try:
+                self.callback(event)
+            except FakePulseServer.PulseLoopStop:
+                return
+
+    def event_listen_stop(self):
+        self._events.put(None)
+
+    def close(self):
+        self.closed = True
+        self.server._close(self)
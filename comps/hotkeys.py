@@ -0,0 +1,157 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Ends the worker thread
+
+class HotkeyTargets:
+    """What hotkey actions operate on
+
+    connect and disconnect are callables (e.g. the functions that also
+    update the tray and port watcher); volume_control is the VolumeWriter
+    or anything else with get_volume/set_volume/toggle_mute.
+    """
+
+    def __init__(self, connect, disconnect, volume_control):
+        self.connect = connect
+        self.disconnect = disconnect
+        self.volume_control = volume_control
+
+def _step_volume(targets, step):
+    volume_control = targets.volume_control
+    new_volume = min(1.0, max(0.0, volume_control.get_volume() + step))
+    volume_control.set_volume(new_volume)
+    logger.debug("Hotkey volume: %.0f%%", new_volume * 100)
+
+def action_connect(targets, params):
+    """Connect the X-Touch Mini (and resume automatic reconnects)"""
+    targets.connect()
+
+def action_disconnect(targets, params):
+    """Release the X-Touch Mini so another application can use it"""
+    targets.disconnect()
+
+def action_volume_up(targets, params):
+    """Raise the master volume by step"""
+    _step_volume(targets, abs(params['step']))
+
+def action_volume_down(targets, params):
+    """Lower the master volume by step"""
+    _step_volume(targets, -abs(params['step']))
+
+def action_mute_toggle(targets, params):
+    """Toggle the master mute"""
+    targets.volume_control.toggle_mute()
+
+# Action name -> (handler, optional parameters with defaults)
+ACTIONS = {
+    'connect': (action_connect, {}),
+    'disconnect': (action_disconnect, {}),
+    'volume_up': (action_volume_up, {'step': 0.05}),
+    'volume_down': (action_volume_down, {'step': 0.05}),
+    'mute_toggle': (action_mute_toggle, {}),
+}
+
+def compile_hotkeys(definitions):
+    """Compile hotkey definitions into a list of (keys, action, handler, params)
+
+    Each definition is a dict with the "keys" combination in the keyboard
+    library's syntax (e.g. "ctrl+page up"), the "action" name and any
+    parameters of that action. Raises ValueError for invalid definitions.
+    """
+    hotkeys = []
+    seen = set()
+    for index, definition in enumerate(definitions):
+        keys = definition.get('keys')
+        if not keys or not isinstance(keys, str):
+            raise ValueError(f"Hotkey {index}: 'keys' is required")
+        action = definition.get('action')
+        if action not in ACTIONS:
+            raise ValueError(f"Hotkey {index}: unknown action {action!r}")
+        handler, optional = ACTIONS[action]
+
+        params = dict(optional)
+        params.update({k: v for k, v in definition.items() if k not in ('keys', 'action')})
+        if 'step' in params:
+            params['step'] = float(params['step'])
+
+        normalized = keys.lower().replace(' + ', '+')
+        if normalized in seen:
+            logger.warning("Hotkey %d overrides an earlier hotkey for %s", index, keys)
+        seen.add(normalized)
+        hotkeys.append((keys, action, handler, params))
+    return hotkeys
+
+class HotkeyManager:
+    """Registers only the configured key combinations with the keyboard hook
+
+    The keyboard library still passes every key event through its listener
+    thread to match the combinations, but no handler of ours runs and no
+    is_pressed() lookups are made per key event. When a combination fires,
+    the hook callback only queues the action; a worker thread runs it, so a
+    slow connect can never hold up keyboard input.
+    """
+
+    def __init__(self, definitions, targets):
+        self.hotkeys = compile_hotkeys(definitions)
+        self.targets = targets
+        self.triggered = 0
+        self._queue = queue.Queue()
+        self._handles = []
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread and register the hotkeys"""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='hotkeys', daemon=True)
+        self._thread.start()
+        if not self.hotkeys:
+            return
+
+        import keyboard
+
+        for keys, action, handler, params in self.hotkeys:
+            try:
+                handle = keyboard.add_hotkey(keys, self._queue.put, args=((action, handler, params),))
+                self._handles.append(handle)
+                logger.debug("Registered hotkey %s -> %s", keys, action)
+            except Exception as e:
+                logger.error("Could not register hotkey %s: %s", keys, e)
+
+    def stop(self, timeout=1.0):
+        """Unregister the hotkeys and stop the worker after queued actions"""
+        if self._handles:
+            import keyboard
+
+            for handle in self._handles:
+                try:
+                    keyboard.remove_hotkey(handle)
+                except Exception as e:
+                    logger.debug("Could not remove hotkey: %s", e)
+            self._handles = []
+        if self._thread:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def trigger(self, action, params=None):
+        """Queue an action as if its hotkey had been pressed"""
+        handler, optional = ACTIONS[action]
+        self._queue.put((action, handler, dict(optional, **(params or {}))))
+
+    def _run(self):
+        """Worker thread main loop"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            action, handler, params = item
+            self.triggered += 1
+            logger.info("Hotkey: %s", action)
+            try:
+                handler(self.targets, params)
+            except Exception as e:
+                logger.exception("Error running hotkey action %s: %s", action, e)
@@ -0,0 +1,127 @@
+import json
+import math
+import threading
+import time
+
+# Active tracker, None while instrumentation is off. Hot paths only take a
+# timestamp when a message was stamped on receipt, so leaving this None
+# costs a single None check per message.
+tracker = None
+
+class LatencyHistogram:
+    """Fixed-memory latency histogram with logarithmic buckets
+
+    Bucket upper bounds grow by growth per bucket from min_value up to
+    max_value (seconds), so percentiles are accurate to within that ratio
+    while memory stays constant no matter how many samples are recorded.
+    """
+
+    def __init__(self, min_value=1e-6, max_value=60.0, growth=1.05):
+        self.min_value = min_value
+        self.log_growth = math.log(growth)
+        self.bounds = []
+        bound = min_value
+        while bound < max_value:
+            self.bounds.append(bound)
+            bound *= growth
+        self.bounds.append(bound)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last bucket catches overflow
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, value):
+        """Record one latency sample in seconds"""
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = min(
+                int(math.ceil(math.log(value / self.min_value) / self.log_growth)),
+                len(self.counts) - 1
+            )
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, p):
+        """Return the upper bound of the bucket holding the p-th percentile"""
+        with self.lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, int(math.ceil(self.count * p / 100.0)))
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= rank:
+                    if index < len(self.bounds):
+                        return min(self.bounds[index], self.max)
+                    return self.max
+            return self.max
+
+    def summary(self):
+        """Return count, mean, p50, p95, p99 and max (in milliseconds)"""
+        with self.lock:
+            count = self.count
+            mean = self.total / count if count else 0.0
+            maximum = self.max
+        return {
+            'count': count,
+            'mean_ms': mean * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': maximum * 1000,
+        }
+
+class LatencyTracker:
+    """Per-stage latency histograms for the fader to volume to OSD pipeline"""
+
+    # receive: message taken off the port in process_xtouch_messages
+    # volume: VolumeControl.set_volume returned
+    # osd: VolumeOSD._do_show ran on the Tk thread
+    STAGES = ('receive_to_volume', 'volume_to_osd', 'receive_to_osd')
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+
+    def record(self, stage, start, end=None):
+        """Record the time from start (a time.perf_counter() value) to end or now"""
+        if end is None:
+            end = time.perf_counter()
+        self.histograms[stage].record(end - start)
+
+    def summary(self):
+        """Return the stats for every stage as a dictionary"""
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def format_summary(self):
+        """Return a short human readable report, one line per stage"""
+        lines = []
+        for stage, stats in self.summary().items():
+            lines.append(
+                f"{stage}: n={stats['count']} p50={stats['p50_ms']:.2f}ms "
+                f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms "
+                f"max={stats['max_ms']:.2f}ms"
+            )
+        return '\n'.join(lines)
+
+    def dump_json(self, path):
+        """Write the stats for every stage to path as JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+def enable():
+    """Turn instrumentation on and return the active tracker"""
+    global tracker
+    if tracker is None:
+        tracker = LatencyTracker()
+    return tracker
+
+def disable():
+    """Turn instrumentation off"""
+    global tracker
+    tracker = None
@@ -0,0 +1,109 @@
+import collections
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(threadName)s %(name)s: %(message)s'
+
+# Background listener and optional ring buffer, set up by setup_logging()
+_listener = None
+_ring_buffer = None
+
+class RingBufferHandler(logging.Handler):
+    """Handler keeping the most recent formatted records in memory"""
+    
+    def __init__(self, capacity):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+        self.records_lock = threading.Lock()
+        
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self.records_lock:
+            self.records.append(line)
+            
+    def get_lines(self):
+        """Return a snapshot of the buffered lines, oldest first"""
+        with self.records_lock:
+            return list(self.records)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves all formatting to the listener thread
+    
+    The stock QueueHandler formats the message in the calling thread; here the
+    record is passed through untouched so the hot path only pays for the
+    enqueue.
+    """
+    
+    def prepare(self, record):
+        return record
+
+def setup_logging(level='INFO', levels=None, log_file=None, ring_buffer_size=0):
+    """Route all logging through a queue to a background listener thread
+    
+    level is the root level, levels maps logger names to their own levels,
+    log_file adds a file handler and ring_buffer_size keeps that many recent
+    records in memory for dump_recent_events().
+    """
+    global _listener, _ring_buffer
+    shutdown_logging()
+    
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    
+    # pythonw.exe has no console, sys.stderr is None there
+    if sys.stderr is not None:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    if ring_buffer_size:
+        _ring_buffer = RingBufferHandler(ring_buffer_size)
+        handlers.append(_ring_buffer)
+    else:
+        _ring_buffer = None
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    if handlers:
+        root.addHandler(DeferredQueueHandler(log_queue))
+    else:
+        root.addHandler(logging.NullHandler())
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(
+            logger_level.upper() if isinstance(logger_level, str) else logger_level
+        )
+    
+    if handlers:
+        _listener = logging.handlers.QueueListener(log_queue, *handlers)
+        _listener.start()
+        
+def shutdown_logging():
+    """Flush queued records and stop the background listener"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def dump_recent_events(path=None):
+    """Return the buffered recent log lines, optionally writing them to path"""
+    lines = _ring_buffer.get_lines() if _ring_buffer else []
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+            if lines:
+                f.write('\n')
+    return lines
@@ -0,0 +1,263 @@
+import logging
+import threading
+
+from comps.config import DEFAULTS, load_config
+from comps.taper import compile_taper
+
+logger = logging.getLogger(__name__)
+
+# Message types that can be bound, and the attribute holding their number
+BINDABLE_TYPES = {
+    'control_change': 'control',
+    'note_on': 'note',
+    'note_off': 'note',
+}
+
+# Actions that turn a 0-127 value into a level and so take "taper" and "smoothing"
+LEVEL_ACTIONS = ('master_volume', 'app_volume')
+
+# How close a fader has to come to the volume to pick it up without crossing it
+PICKUP_TOLERANCE = 0.01
+
+class Pickup:
+    """Soft takeover state of one fader
+
+    A fader only takes control once it reaches the current volume: either
+    it lands within PICKUP_TOLERANCE of it or it moves across it. When
+    the volume is then changed by anything else (Windows, media keys,
+    hotkeys, another binding) the fader lets go until it is picked up
+    again, so touching it never makes the volume jump.
+    """
+
+    __slots__ = ('position', 'engaged')
+
+    def __init__(self):
+        self.position = None  # Last level the fader was at
+        self.engaged = False
+
+    def take(self, level, current):
+        """Return True if the fader at level now controls the volume at current"""
+        position = self.position
+        self.position = level
+        if self.engaged and abs(current - position) > PICKUP_TOLERANCE:
+            self.engaged = False
+        if not self.engaged:
+            crossed = position is not None and (position - current) * (level - current) <= 0
+            self.engaged = crossed or abs(level - current) <= PICKUP_TOLERANCE
+        return self.engaged
+
+class Binding:
+    """A compiled binding: the action handler plus its parameters
+
+    Level bindings also carry their taper as a 128-entry lookup table and an
+    optional ramp time for the writer's smoothing; master volume bindings
+    with "pickup" also carry their soft takeover state.
+    """
+
+    __slots__ = ('action', 'handler', 'params', 'taper', 'smoothing', 'pickup')
+
+    def __init__(self, action, handler, params):
+        self.action = action
+        self.handler = handler
+        self.params = params
+        self.taper = None
+        self.smoothing = None
+        self.pickup = None
+        if action in LEVEL_ACTIONS:
+            self.taper = compile_taper(params.get('taper'))
+            smoothing = params.get('smoothing')
+            self.smoothing = float(smoothing) if smoothing else None
+        if params.get('pickup'):
+            if action != 'master_volume':
+                raise ValueError("'pickup' is only supported by master_volume")
+            self.pickup = Pickup()
+
+    def __repr__(self):
+        return f"Binding({self.action!r}, {self.params!r})"
+
+def _is_press(msg):
+    """True for the press half of a button (note on or non-zero CC value)"""
+    if msg.type == 'note_on':
+        return msg.velocity > 0
+    if msg.type == 'control_change':
+        return msg.value > 0
+    return False
+
+def _message_value(msg):
+    """The 0-127 value carried by a message"""
+    if msg.type == 'control_change':
+        return msg.value
+    return msg.velocity
+
+def action_master_volume(binding, msg, volume_control, volume_osd, received_at):
+    """Set the master volume from an absolute fader or encoder value"""
+    # Map the X-Touch Mini value (0-127) through the precompiled taper table
+    new_volume = binding.taper[_message_value(msg)]
+    if binding.pickup is not None:
+        current = volume_control.get_volume()
+        if not binding.pickup.take(new_volume, current):
+            logger.debug("Fader at %.0f%% not picked up (volume %.0f%%)", new_volume * 100, current * 100)
+            return
+    volume_control.set_volume(new_volume, received_at=received_at, ramp_time=binding.smoothing)
+    logger.debug("Volume target: %.0f%%", new_volume * 100)
+
+    if volume_osd:
+        volume_osd.show_volume(new_volume, received_at=received_at)
+
+def action_mute_toggle(binding, msg, volume_control, volume_osd, received_at):
+    """Toggle the master mute when a button is pressed"""
+    if _is_press(msg):
+        muted = volume_control.toggle_mute()
+        logger.debug("Mute toggled: %s", muted)
+
+def action_volume_step(binding, msg, volume_control, volume_osd, received_at):
+    """Move the master volume by a fixed step when a button is pressed"""
+    if not _is_press(msg):
+        return
+    new_volume = min(1.0, max(0.0, volume_control.get_volume() + binding.params['step']))
+    volume_control.set_volume(new_volume, received_at=received_at)
+    logger.debug("Volume stepped to: %.0f%%", new_volume * 100)
+
+    if volume_osd:
+        volume_osd.show_volume(new_volume, received_at=received_at)
+
+def action_app_volume(binding, msg, volume_control, volume_osd, received_at):
+    """Set the volume of one application from an absolute fader or encoder value"""
+    set_app_volume = getattr(volume_control, 'set_app_volume', None)
+    if set_app_volume is None:
+        logger.debug("Per-application volume is not available for %s", binding.params['app'])
+        return
+    level = binding.taper[_message_value(msg)]
+    set_app_volume(binding.params['app'], level, received_at=received_at, ramp_time=binding.smoothing)
+
+# Action name -> (handler, required parameters, optional parameters with defaults)
+ACTIONS = {
+    'master_volume': (action_master_volume, (), {}),
+    'mute_toggle': (action_mute_toggle, (), {}),
+    'volume_step': (action_volume_step, ('step',), {}),
+    'app_volume': (action_app_volume, ('app',), {}),
+}
+
+def compile_bindings(bindings):
+    """Compile binding definitions into a {(type, channel, number): Binding} table
+
+    Each definition is a dict with the message "type", the mido (0-based)
+    "channel", the "control" or "note" number, the "action" name and any
+    parameters of that action. Raises ValueError for invalid definitions.
+    """
+    table = {}
+    for index, definition in enumerate(bindings):
+        msg_type = definition.get('type', 'control_change')
+        number_field = BINDABLE_TYPES.get(msg_type)
+        if number_field is None:
+            raise ValueError(f"Binding {index}: unsupported message type {msg_type!r}")
+        if 'channel' not in definition or number_field not in definition:
+            raise ValueError(f"Binding {index}: 'channel' and '{number_field}' are required")
+
+        action = definition.get('action')
+        if action not in ACTIONS:
+            raise ValueError(f"Binding {index}: unknown action {action!r}")
+        handler, required, optional = ACTIONS[action]
+
+        params = dict(optional)
+        for name in required:
+            if name not in definition:
+                raise ValueError(f"Binding {index}: action {action!r} requires {name!r}")
+        reserved = ('type', 'channel', number_field, 'action')
+        params.update({k: v for k, v in definition.items() if k not in reserved})
+
+        key = (msg_type, int(definition['channel']), int(definition[number_field]))
+        if key in table:
+            logger.warning("Binding %d overrides an earlier binding for %s", index, key)
+        try:
+            table[key] = Binding(action, handler, params)
+        except ValueError as e:
+            raise ValueError(f"Binding {index}: {e}")
+
+        # A note_on binding also receives the matching note_off (button release)
+        if msg_type == 'note_on':
+            table.setdefault(('note_off',) + key[1:], table[key])
+    return table
+
+def message_key(msg):
+    """Return the lookup key of a message, or None if it cannot be bound"""
+    msg_type = msg.type
+    if msg_type == 'control_change':
+        return (msg_type, msg.channel, msg.control)
+    if msg_type == 'note_on' or msg_type == 'note_off':
+        return (msg_type, msg.channel, msg.note)
+    return None
+
+def device_mappings(config, device=None):
+    """Return the bindings of a device from the 'devices' config list
+
+    Devices without their own mappings, and device None, use the top-level
+    mappings.
+    """
+    if device is not None:
+        for entry in config['devices']:
+            if entry.get('name') == device and entry.get('mappings') is not None:
+                return entry['mappings']
+    return config['mappings']
+
+class MappingEngine:
+    """Routes MIDI messages to actions through a precompiled lookup table
+
+    The table is rebuilt off the MIDI path and swapped in with a single
+    assignment, so reload() can be called from any thread while messages
+    are being dispatched. device names the entry of the 'devices' config
+    list whose bindings reload() reads.
+    """
+
+    def __init__(self, bindings=None, config_path=None, device=None):
+        self.config_path = config_path
+        self.device = device
+        self.reload_lock = threading.Lock()
+        self.listeners = []  # Called with the engine after new bindings are installed
+        self.table = compile_bindings(DEFAULTS['mappings'] if bindings is None else bindings)
+
+    @classmethod
+    def from_config(cls, config, config_path=None, device=None):
+        """Create an engine from a loaded config dictionary"""
+        return cls(device_mappings(config, device), config_path=config_path, device=device)
+
+    def load(self, bindings):
+        """Compile and install a new set of bindings"""
+        table = compile_bindings(bindings)
+        with self.reload_lock:
+            self.table = table
+        if self.device is None:
+            logger.info("Loaded %d MIDI bindings", len(table))
+        else:
+            logger.info("Loaded %d MIDI bindings for %s", len(table), self.device)
+        for listener in self.listeners:
+            listener(self)
+
+    def reload(self):
+        """Re-read the bindings from the config file, keeping the old ones on error"""
+        try:
+            config = load_config(self.config_path)
+            self.load(device_mappings(config, self.device))
+            return True
+        except Exception as e:
+            logger.error("Failed to reload MIDI mappings: %s", e)
+            return False
+
+    def uses_action(self, action):
+        """True if any binding runs the given action"""
+        return any(binding.action == action for binding in self.table.values())
+
+    def lookup(self, msg):
+        """Return the Binding for a message, or None"""
+        key = message_key(msg)
+        if key is None:
+            return None
+        return self.table.get(key)
+
+    def dispatch(self, msg, volume_control, volume_osd, received_at=None):
+        """Run the action bound to a message; returns True if one was bound"""
+        binding = self.lookup(msg)
+        if binding is None:
+            return False
+        binding.handler(binding, msg, volume_control, volume_osd, received_at)
+        return True
@@ -0,0 +1,50 @@
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+def resident_memory():
+    """Return the resident set size of this process in bytes, or None if unknown
+
+    Uses GetProcessMemoryInfo on Windows and /proc/self/statm on Linux, so
+    no extra package is needed.
+    """
+    try:
+        if sys.platform == 'win32':
+            return _windows_working_set()
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm', 'r') as f:
+                resident_pages = int(f.read().split()[1])
+            return resident_pages * os.sysconf('SC_PAGE_SIZE')
+        import resource
+        # Peak rather than current, but the best available without psutil (bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception as e:
+        logger.debug("Could not read resident memory: %s", e)
+        return None
+
+def _windows_working_set():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
@@ -0,0 +1,170 @@
+"""Compact binary capture of the MIDI messages received from the controller
+
+File layout: an 8-byte header (MAGIC, format version, 3 reserved bytes),
+the wall clock start time as a little-endian double, then one record per
+message. A record is the time since the previous record in microseconds
+and the length of the raw message, both as unsigned LEB128 varints,
+followed by the raw status and data bytes. A fader message is typically
+4 to 5 bytes. Records are only ever appended, so a capture cut short by a
+crash is readable up to its last complete record.
+"""
+import logging
+import struct
+import threading
+import time
+
+import mido
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'XTMC'
+VERSION = 1
+_HEADER = struct.Struct('<4sB3xd')
+
+def _encode_varint(value, out):
+    """Append value as an unsigned LEB128 varint to the bytearray out"""
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _decode_varint(data, offset):
+    """Return (value, new offset), or (None, offset) if data ends mid-varint"""
+    value = 0
+    shift = 0
+    while offset < len(data):
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+    return None, offset
+
+class MidiCapture:
+    """Appends received messages to a capture file from a background thread
+
+    record() runs on the MIDI path and only encodes the message into an
+    in-memory buffer; a 'midi-capture' thread writes the buffer out in
+    batches every flush_interval seconds, or sooner once it holds
+    batch_size bytes.
+    """
+
+    def __init__(self, path, flush_interval=1.0, batch_size=64 * 1024):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.records = 0
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._condition = threading.Condition()
+        self._last = None  # perf_counter() of the previous record
+        self._running = False
+        self._thread = None
+        self._file = None
+
+    def start(self):
+        """Open the file, write the header and start the writer thread"""
+        if self._running:
+            return
+        self._file = open(self.path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._last = time.perf_counter()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='midi-capture', daemon=True)
+        self._thread.start()
+        logger.info("Capturing MIDI input to %s", self.path)
+
+    def stop(self, timeout=2.0):
+        """Write what is buffered and close the file"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info("Captured %d MIDI messages (%d bytes) to %s", self.records, self.bytes_written, self.path)
+
+    def record(self, msg, at=None):
+        """Append one message received at perf_counter() time at (default now)"""
+        if at is None:
+            at = time.perf_counter()
+        data = msg.bytes()
+        with self._condition:
+            if not self._running:
+                return
+            delta = max(0, int(round((at - self._last) * 1_000_000)))
+            self._last = max(self._last, at)
+            _encode_varint(delta, self._buffer)
+            _encode_varint(len(data), self._buffer)
+            self._buffer.extend(data)
+            self.records += 1
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def _take_batch(self):
+        """Wait for the next flush and return the buffered bytes"""
+        with self._condition:
+            if self._running and len(self._buffer) < self.batch_size:
+                self._condition.wait(self.flush_interval)
+            batch = self._buffer
+            self._buffer = bytearray()
+            return batch, self._running
+
+    def _run(self):
+        """Writer thread main loop"""
+        try:
+            while True:
+                batch, running = self._take_batch()
+                if batch:
+                    self._file.write(batch)
+                    self._file.flush()
+                    self.bytes_written += len(batch)
+                if not running:
+                    return
+        except Exception as e:
+            logger.error("Error writing MIDI capture %s: %s", self.path, e)
+        finally:
+            self._file.close()
+
+def read_capture(path):
+    """Read a capture file
+
+    Returns (started_at, records) where started_at is the wall clock time
+    capture began and records is a list of (seconds since the previous
+    record, mido.Message). Raises ValueError if the file is not a capture.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is too short to be a MIDI capture")
+    magic, version, started_at = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a MIDI capture")
+    if version != VERSION:
+        raise ValueError(f"{path} has unsupported capture version {version}")
+
+    records = []
+    offset = _HEADER.size
+    skipped = 0  # Microseconds of skipped records, added to the next one
+    while offset < len(data):
+        delta, offset = _decode_varint(data, offset)
+        if delta is None:
+            break
+        length, offset = _decode_varint(data, offset)
+        if length is None or offset + length > len(data):
+            logger.warning("Capture %s ends with an incomplete record", path)
+            break
+        raw = data[offset:offset + length]
+        offset += length
+        try:
+            msg = mido.Message.from_bytes(raw)
+        except ValueError as e:
+            logger.warning("Skipping invalid message in capture %s: %s", path, e)
+            skipped += delta
+            continue
+        records.append(((skipped + delta) / 1_000_000, msg))
+        skipped = 0
+    return started_at, records
@@ -0,0 +1,139 @@
+import contextlib
+import threading
+
+# Connection states
+DISCONNECTED = 'disconnected'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+CLOSING = 'closing'
+
+class MidiConnection:
+    """Connection state of the controller, shared by every thread
+
+    The state only moves DISCONNECTED -> CONNECTING -> CONNECTED -> CLOSING
+    -> DISCONNECTED (or CONNECTING -> DISCONNECTED when opening fails), and
+    every transition happens under one condition variable. begin_connect()
+    and begin_close() first wait for a settled state, so a connect and a
+    disconnect racing from the keyboard hook, tray and watcher threads are
+    serialized instead of interleaving.
+
+    Readers borrow the input port with reading(); begin_close() waits until
+    no reader holds it, so a port is never closed while iter_pending() runs.
+    Every transition and wake() bumps generation, and wait_for_change()
+    waits for it to move past a value read earlier, so a change between
+    checking the state and starting to wait is never missed.
+
+    Several connections (one per controller) can share one condition, so a
+    thread can wait for a change on any of them.
+    """
+
+    def __init__(self, condition=None):
+        self.condition = condition or threading.Condition()
+        self.state = DISCONNECTED
+        self.inport = None
+        self.outport = None
+        self.generation = 0
+        self._readers = 0
+
+    def _set_state(self, state):
+        """Change state and wake every waiter (condition must be held)"""
+        self.state = state
+        self.generation += 1
+        self.condition.notify_all()
+
+    def _wait_settled(self):
+        """Wait until no connect or close is in progress (condition must be held)"""
+        self.condition.wait_for(lambda: self.state in (DISCONNECTED, CONNECTED))
+
+    @property
+    def connected(self):
+        return self.state == CONNECTED
+
+    def begin_connect(self):
+        """Move to CONNECTING; returns False if already connected
+
+        The caller opens the ports without holding the lock and then calls
+        finish_connect() or abort_connect().
+        """
+        with self.condition:
+            self._wait_settled()
+            if self.state == CONNECTED:
+                return False
+            self._set_state(CONNECTING)
+            return True
+
+    def finish_connect(self, inport, outport=None):
+        """Move from CONNECTING to CONNECTED with the opened ports"""
+        with self.condition:
+            if self.state != CONNECTING:
+                raise RuntimeError(f"finish_connect() in state {self.state}")
+            self.inport = inport
+            self.outport = outport
+            self._set_state(CONNECTED)
+
+    def abort_connect(self):
+        """Move from CONNECTING back to DISCONNECTED after opening failed"""
+        with self.condition:
+            if self.state != CONNECTING:
+                raise RuntimeError(f"abort_connect() in state {self.state}")
+            self._set_state(DISCONNECTED)
+
+    def begin_close(self):
+        """Move to CLOSING and return (inport, outport), or None if not connected
+
+        Waits for readers to return the input port first. The caller closes
+        the ports without holding the lock and then calls finish_close().
+        """
+        with self.condition:
+            self._wait_settled()
+            if self.state != CONNECTED:
+                return None
+            self._set_state(CLOSING)
+            self.condition.wait_for(lambda: self._readers == 0)
+            return self.inport, self.outport
+
+    def finish_close(self):
+        """Move from CLOSING to DISCONNECTED"""
+        with self.condition:
+            if self.state != CLOSING:
+                raise RuntimeError(f"finish_close() in state {self.state}")
+            self.inport = None
+            self.outport = None
+            self._set_state(DISCONNECTED)
+
+    @contextlib.contextmanager
+    def reading(self):
+        """Borrow the input port while connected, yields None otherwise"""
+        with self.condition:
+            if self.state != CONNECTED:
+                port = None
+            else:
+                port = self.inport
+                self._readers += 1
+        try:
+            yield port
+        finally:
+            if port is not None:
+                with self.condition:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self.condition.notify_all()
+
+    def wake(self):
+        """Wake every waiter without changing state, e.g. on exit"""
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait_for_change(self, generation, timeout=None):
+        """Wait until generation moves past the given value, return the new one"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+    def wait_for_state(self, states, timeout=None):
+        """Wait until the state is one of states; returns True if it is"""
+        if isinstance(states, str):
+            states = (states,)
+        with self.condition:
+            return self.condition.wait_for(lambda: self.state in states, timeout)
@@ -1,122 +1,456 @@
+import logging
 import mido
+import queue
+import threading
 import time
 
+from comps import latency
+from comps.mapping import MappingEngine
+from comps.midi_connection import MidiConnection, CONNECTED
+
+logger = logging.getLogger(__name__)
+
+# Input modes for process_xtouch_messages
+INPUT_MODE_CALLBACK = 'callback'  # Port callback feeds a queue, thread blocks until a message arrives
+INPUT_MODE_POLL = 'poll'  # Legacy iter_pending() loop with a 1 ms sleep
+
+# Shared by the connections of all devices, so a loop can wait for a change on any
+_devices_condition = threading.Condition()
+
+class MidiDevice:
+    """One controller: how its port is found, its bindings, feedback and connection
+
+    The device's input port is the first one whose name contains port_name
+    (any case) and is not already used by another device, so two identical
+    controllers are told apart by connection order. engine is the device's
+    own MappingEngine, or None to use the engine given to the processing
+    loop. feedback is the DeviceFeedback attached to its output port.
+    """
+
+    def __init__(self, name, port_name='X-TOUCH MINI', engine=None, feedback=None):
+        self.name = name
+        self.port_name = port_name or ''
+        self.engine = engine
+        self.feedback = feedback
+        self.connection = MidiConnection(_devices_condition)
+        self.port = None  # Name of the input port claimed while connecting or connected
+
+    def __repr__(self):
+        return f"MidiDevice({self.name!r}, {self.port_name!r})"
+
+    def deliver(self, msg):
+        """Port callback: tag the message with this device and pass it on"""
+        _message_sink((self, msg))
+
+    def matches(self, port_name):
+        return self.port_name.lower() in port_name.lower()
+
 # Global variables related to MIDI
-inport = None
-connected = False
+default_device = MidiDevice('X-Touch Mini')
+devices = [default_device]  # Every configured controller, default_device first
+connection = default_device.connection  # Input port, output port (for LED feedback) and state
+input_mode = INPUT_MODE_CALLBACK
+capture = None  # MidiCapture recording every received message, when capturing
+
+# Backends tried in order when connecting; None is mido's default backend
+BACKENDS = (None, 'mido.backends.rtmidi', 'mido.backends.portmidi')
+_backends = {}  # Backend name -> loaded mido.Backend
+_last_backend = None  # Name of the backend that last connected successfully
+
+# (device, message) pairs from the port callbacks of every device, in
+# arrival order, consumed by process_xtouch_messages
+_message_queue = queue.Queue()
+_WAKE = object()  # Sentinel used to wake the processing thread without a message
+_message_sink = _message_queue.put  # Called by the port callbacks with every (device, message)
+
+# Bindings used when process_xtouch_messages is not given an engine
+default_engine = MappingEngine()
+
+def set_input_mode(mode):
+    """Select how MIDI input is read (takes effect on the next connect)"""
+    global input_mode
+    if mode not in (INPUT_MODE_CALLBACK, INPUT_MODE_POLL):
+        raise ValueError(f"Unknown input mode: {mode}")
+    input_mode = mode
+
+def devices_from_config(config, config_path=None):
+    """Create the MidiDevices of a loaded config, each with its own MappingEngine
+
+    An empty 'devices' list gives one device found by device.port_name
+    using the top-level mappings.
+    """
+    entries = config['devices']
+    if not entries:
+        return [MidiDevice('X-Touch Mini', config['device']['port_name'],
+                           engine=MappingEngine.from_config(config, config_path))]
+    
+    new_devices = []
+    names = set()
+    for index, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Device {index}: must be an object")
+        name = entry.get('name')
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"Device {index}: 'name' is required")
+        if name in names:
+            raise ValueError(f"Device {index}: duplicate name {name!r}")
+        names.add(name)
+        port_name = entry.get('port_name', config['device']['port_name'])
+        if not isinstance(port_name, str):
+            raise ValueError(f"Device {index}: 'port_name' must be a string")
+        try:
+            engine = MappingEngine.from_config(config, config_path, device=name)
+        except ValueError as e:
+            raise ValueError(f"Device {index}: {e}") from e
+        new_devices.append(MidiDevice(name, port_name, engine=engine))
+    return new_devices
+
+def set_devices(new_devices):
+    """Replace the configured controllers, disconnecting the current ones
+
+    The first device becomes the default device (see connection).
+    """
+    global devices, default_device, connection
+    if not new_devices:
+        raise ValueError("At least one MIDI device is required")
+    disconnect_xtouch()
+    devices = list(new_devices)
+    default_device = devices[0]
+    connection = default_device.connection
+
+def set_message_sink(sink):
+    """Deliver callback mode (device, message) pairs to sink instead of the internal queue
+    
+    None restores the queue read by process_xtouch_messages. Used by the
+    asyncio runtime.
+    """
+    global _message_sink
+    _message_sink = sink or _message_queue.put
+
+def set_capture(midi_capture):
+    """Record every message the processing loop receives (None stops recording)"""
+    global capture
+    capture = midi_capture
+
+def wake_xtouch_thread():
+    """Wake the processing thread, e.g. so it can notice the exit flag"""
+    _message_queue.put(_WAKE)
+    default_device.connection.wake()
+
+def _get_backend(name):
+    """Return the mido.Backend for a backend name, loading it once
+    
+    Using Backend objects instead of mido.set_backend() keeps a failed
+    attempt from changing the global backend for the rest of the process.
+    """
+    key = name or mido.backend.name
+    backend = _backends.get(key)
+    if backend is None:
+        backend = mido.Backend(key, load=True)
+        _backends[key] = backend
+    return backend
+
+def _backend_order():
+    """Backend names to try, the one that worked last time first"""
+    names = []
+    for name in (_last_backend,) + BACKENDS:
+        name = name or mido.backend.name
+        if name not in names:
+            names.append(name)
+    return names
+
+def find_xtouch_port(port_names, device=None):
+    """Return the first port name for a device (default_device), or None
+
+    Ports used by other devices are skipped. A connected device keeps its
+    own port as long as that port is listed.
+    """
+    device = device or default_device
+    with _devices_condition:
+        if device.port is not None:
+            return device.port if device.port in port_names else None
+        taken = {other.port for other in devices if other is not device}
+        for name in port_names:
+            if name not in taken and device.matches(name):
+                return name
+    return None
+
+def _claim_port(device, port_names):
+    """Find a free port for device and reserve it, so no other device opens it"""
+    with _devices_condition:
+        name = find_xtouch_port(port_names, device)
+        device.port = name
+        return name
+
+def list_input_ports():
+    """Return the available input port names from the last working backend
+    
+    Errors (e.g. a backend that fails while a device is being unplugged)
+    are logged at debug level and give an empty list.
+    """
+    try:
+        return _get_backend(_last_backend).get_input_names()
+    except Exception as e:
+        logger.debug("Could not list MIDI input ports: %s", e)
+        return []
+
+def set_device_feedback(feedback, device=None):
+    """Use a DeviceFeedback to mirror state to a controller (default_device) while connected"""
+    device = device or default_device
+    device.feedback = feedback
+    outport = device.connection.outport
+    if feedback and outport:
+        feedback.attach(outport)
+
+def _port_base_name(port_name):
+    """Strip the trailing port index some backends add (e.g. 'X-TOUCH MINI 0')"""
+    base, _, suffix = port_name.rpartition(' ')
+    return base if base and suffix.isdigit() else port_name
+
+def _open_output_for(backend, input_name):
+    """Open the output port belonging to the same device as input_name, or return None"""
+    try:
+        base_name = _port_base_name(input_name)
+        for output_name in backend.get_output_names():
+            if _port_base_name(output_name) == base_name:
+                outport = backend.open_output(output_name)
+                logger.info("Opened X-Touch Mini output for feedback: %s", output_name)
+                return outport
+        logger.info("No matching MIDI output for %s, device feedback disabled", input_name)
+    except Exception as e:
+        logger.warning("Could not open X-Touch Mini output: %s", e)
+    return None
+
+def _close_output(device, outport):
+    """Detach feedback and close the output port"""
+    if device.feedback:
+        device.feedback.detach()
+    if outport:
+        try:
+            outport.close()
+        except Exception as e:
+            logger.error("Error closing X-Touch Mini output: %s", e)
+
+def _open_input(backend, device, port_name):
+    """Open an input port, attaching the device's callback in callback mode"""
+    if input_mode == INPUT_MODE_CALLBACK:
+        return backend.open_input(port_name, callback=device.deliver)
+    return backend.open_input(port_name)
+
+def attach_port(port, outport=None, device=None):
+    """Use already opened ports (e.g. fake ports) as a controller (default_device)
+    
+    Returns False, leaving the ports alone, if the device is already connected.
+    """
+    device = device or default_device
+    if not device.connection.begin_connect():
+        return False
+    device.port = getattr(port, 'name', None)
+    if input_mode == INPUT_MODE_CALLBACK:
+        port.callback = device.deliver
+    if device.feedback and outport:
+        device.feedback.attach(outport)
+    device.connection.finish_connect(port, outport)
+    return True
 
 def connect_xtouch():
-    """Connect to the X-Touch Mini controller"""
-    global inport, connected
+    """Connect every configured controller that is not connected yet
+
+    Returns True if all of them are connected afterwards.
+    """
+    results = [connect_device(device) for device in devices]
+    return all(results)
+
+def connect_device(device):
+    """Connect one controller
+    
+    The device is found by port name (see MidiDevice). The backend that
+    connected last time is tried first, then the others in BACKENDS.
+    Safe to call from any thread; a connect or disconnect of the same
+    device already in progress is waited for first.
+    """
+    global _last_backend
     
+    connection = device.connection
     try:
-        # Handle case where device might be visible but not accessible
-        if connected and inport:
-            print("Already connected.")
+        if not connection.begin_connect():
+            logger.info("Already connected to %s.", device.name)
             return True
-            
-        ports = mido.get_input_names()
-        if not ports:
-            print("No X-Touch Mini detected. Please connect your X-Touch Mini and try again.")
-            return False
-        
+    except Exception as e:
+        logger.exception("Error connecting to %s: %s", device.name, e)
+        return False
+    
+    # Ports are opened outside the connection lock; other threads wait on
+    # the CONNECTING state instead of blocking on the lock
+    inport = outport = None
+    try:
+        ports = list_input_ports()
         # List all available ports for debugging
-        print(f"Available MIDI ports: {ports}")
-            
-        selected_port = ports[0]  # Always use first port (X-Touch Mini)
-        print(f"Connecting to X-Touch Mini: {selected_port}")
+        logger.info("Available MIDI ports: %s", ports)
         
-        # Try with default backend first (which should be available)
-        try:
-            print("Trying with default backend")
-            # Don't explicitly set a backend, let mido choose the available one
-            inport = mido.open_input(selected_port)
-            print(f"Successfully connected to X-Touch Mini: {inport.name}")
-            connected = True
-            return True
-        except Exception as backend_error:
-            print(f"  Failed with default backend: {backend_error}")
+        selected_port = _claim_port(device, ports)
+        if selected_port is None:
+            logger.warning("No %s detected. Please connect your %s and try again.", device.name, device.name)
+        else:
+            logger.info("Connecting to %s: %s", device.name, selected_port)
             
-            # If that fails, we can still try with explicit backends as before
-            backends = ['mido.backends.rtmidi', 'mido.backends.portmidi']
-            
-            for backend in backends:
+            for backend_name in _backend_order():
                 try:
-                    print(f"Trying with backend: {backend}")
-                    mido.set_backend(backend)
-                    inport = mido.open_input(selected_port)
-                    print(f"Successfully connected to X-Touch Mini: {inport.name}")
-                    connected = True
-                    return True
+                    logger.debug("Trying with backend: %s", backend_name)
+                    backend = _get_backend(backend_name)
+                    inport = _open_input(backend, device, selected_port)
+                    logger.info("Successfully connected to %s: %s (%s)", device.name, inport.name, backend_name)
+                    _last_backend = backend_name
+                    outport = _open_output_for(backend, selected_port)
+                    break
                 except Exception as backend_error:
-                    print(f"  Failed with {backend}: {backend_error}")
-            
-        print("\nCould not connect to the X-Touch Mini with any available backend.")
-        
-        # Provide suggestions for troubleshooting
-        print("\nTroubleshooting tips:")
-        print("1. Make sure your X-Touch Mini is properly connected via USB")
-        print("2. Check if you need to install X-Touch Mini drivers from Behringer's website")
-        print("3. Try running the program as administrator")
-        print("4. Check Windows Device Manager to see if the device is recognized")
-        print("5. Ensure no other application is using the X-Touch Mini")
-        
-        return False
-                
+                    logger.warning("Failed with %s: %s", backend_name, backend_error)
+            else:
+                # Provide suggestions for troubleshooting
+                logger.error(
+                    "Could not connect to %s with any available backend.\n"
+                    "Troubleshooting tips:\n"
+                    "1. Make sure your X-Touch Mini is properly connected via USB\n"
+                    "2. Check if you need to install X-Touch Mini drivers from Behringer's website\n"
+                    "3. Try running the program as administrator\n"
+                    "4. Check Windows Device Manager to see if the device is recognized\n"
+                    "5. Ensure no other application is using the X-Touch Mini",
+                    device.name
+                )
     except Exception as e:
-        print(f"\nError connecting to X-Touch Mini: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error connecting to %s: %s", device.name, e)
+    
+    if inport is None:
+        with _devices_condition:
+            device.port = None
+        connection.abort_connect()
         return False
+    
+    if device.feedback and outport:
+        device.feedback.attach(outport)
+    connection.finish_connect(inport, outport)
+    return True
 
 def disconnect_xtouch():
-    """Disconnect from the X-Touch Mini controller"""
-    global inport, connected
+    """Disconnect every controller; returns True if any was connected"""
+    results = [disconnect_device(device) for device in devices]
+    return any(results)
+
+def disconnect_device(device):
+    """Disconnect one controller
     
-    if inport:
-        try:
-            print("Disconnecting from X-Touch Mini...")
-            inport.close()
-            inport = None
-            connected = False
-            print("X-Touch Mini disconnected")
-            return True
-        except Exception as e:
-            print(f"Error disconnecting from X-Touch Mini: {e}")
-    return False
+    Waits for a poll loop pass that is reading the port to finish, so the
+    port is never closed under iter_pending().
+    """
+    connection = device.connection
+    ports = connection.begin_close()
+    if ports is None:
+        return False
+    
+    inport, outport = ports
+    logger.info("Disconnecting from %s...", device.name)
+    _close_output(device, outport)
+    try:
+        inport.close()
+        logger.info("%s disconnected", device.name)
+    except Exception as e:
+        logger.error("Error disconnecting from %s: %s", device.name, e)
+    finally:
+        with _devices_condition:
+            device.port = None
+        connection.finish_close()
+    return True
+
+def handle_xtouch_message(msg, volume_control, volume_osd, received_at=None, engine=None):
+    """Handle a single message from the X-Touch Mini controller
+    
+    The message is routed through the mapping engine's lookup table.
+    received_at is the perf_counter() receive timestamp when latency
+    instrumentation is on, None otherwise.
+    """
+    (engine or default_engine).dispatch(msg, volume_control, volume_osd, received_at)
 
-def process_xtouch_messages(exit_flag, volume_control, volume_osd):
-    """Process messages from the X-Touch Mini controller"""
-    global inport, connected
+def process_xtouch_messages(exit_flag, volume_control, volume_osd, mode=None, engine=None):
+    """Process messages from the X-Touch Mini controller
+    
+    In callback mode the thread blocks on the message queue and uses no CPU
+    while idle; call wake_xtouch_thread() after setting the exit flag so it
+    returns promptly. Poll mode keeps the original iter_pending() loop.
+    
+    Messages of every device arrive in one stream in arrival order. Each is
+    routed by its device's own engine, or by engine (default_engine when
+    not given) for devices without one; bindings can be reloaded while this
+    loop runs.
+    """
+    engine = engine or default_engine
+    
+    if (mode or input_mode) == INPUT_MODE_POLL:
+        _poll_xtouch_messages(exit_flag, volume_control, volume_osd, engine)
+        return
     
     while not exit_flag():
-        if not connected or not inport:
-            time.sleep(0.1)
+        item = _message_queue.get()
+        if item is _WAKE:
             continue
+        device, msg = item
+        received_at = time.perf_counter() if latency.tracker is not None else None
+        if capture is not None:
+            capture.record(msg, received_at)
             
         try:
-            for msg in inport.iter_pending():
-                # Filter for controller 9 on channel 11 (0-indexed, so channel 10 in mido)
-                # This is the volume slider on layer A of the X-Touch Mini
-                if msg.type == 'control_change' and msg.channel == 10 and msg.control == 9:
-                    print(f"Received: {msg}")
-                    
-                    # Direct mapping from X-Touch Mini value (0-127) to volume percentage (0-100%)
-                    new_volume = msg.value / 127.0
-                    
-                    # Set the volume
-                    volume_control.set_volume(new_volume)
-                    print(f"Volume set to: {new_volume * 100:.0f}%")
-                    
-                    # Show volume OSD
-                    if volume_osd:
-                        volume_osd.show_volume(new_volume)
-            time.sleep(0.001)  # Small sleep to prevent CPU hogging
+            (device.engine or engine).dispatch(msg, volume_control, volume_osd, received_at)
         except Exception as e:
-            print(f"Error processing X-Touch Mini messages: {e}")
-            time.sleep(1)  # Wait before retrying
-            
+            logger.exception("Error processing %s messages: %s", device.name, e)
+
+def _devices_generation():
+    """Sum of the connection generations; changes with any connection"""
+    return sum(device.connection.generation for device in devices)
+
+def _poll_xtouch_messages(exit_flag, volume_control, volume_osd, engine):
+    """Fallback processing loop that polls the ports for pending messages
+    
+    One pass reads every connected device in turn. While none is connected
+    the loop waits on the connections' shared condition variable, so a
+    reconnect (or wake_xtouch_thread()) is picked up immediately. A read
+    error (typically the device being unplugged) disconnects that device
+    and leaves reconnecting to the port watcher; an error in an action
+    is only logged.
+    """
+    while not exit_flag():
+        generation = _devices_generation()
+        read_any = False
+        for device in devices:
+            failed = False
+            with device.connection.reading() as port:
+                if port is not None:
+                    read_any = True
+                    dispatch = (device.engine or engine).dispatch
+                    try:
+                        for msg in port.iter_pending():
+                            received_at = time.perf_counter() if latency.tracker is not None else None
+                            if capture is not None:
+                                capture.record(msg, received_at)
+                            # A failing action only loses its message, like in callback mode
+                            try:
+                                dispatch(msg, volume_control, volume_osd, received_at)
+                            except Exception as e:
+                                logger.exception("Error processing %s messages: %s", device.name, e)
+                    except Exception as e:
+                        logger.exception("Error reading from %s: %s", device.name, e)
+                        failed = True
+            if failed:
+                disconnect_device(device)
+        
+        if not read_any:
+            with _devices_condition:
+                _devices_condition.wait_for(lambda: _devices_generation() != generation)
+        else:
+            time.sleep(0.001)  # Small sleep to prevent CPU hogging
+
 def get_connection_status():
-    """Return the current connection status"""
-    global connected
-    return connected
+    """Return True if any controller is connected"""
+    return any(device.connection.state == CONNECTED for device in devices)
+
+def get_device_states():
+    """Return {device name: connection state} for every controller"""
+    return {device.name: device.connection.state for device in devices}
@@ -0,0 +1,179 @@
+import logging
+import random
+import threading
+import time
+
+from comps import midi_control
+
+logger = logging.getLogger(__name__)
+
+class _DeviceState:
+    """Reconnect backoff of one controller"""
+    __slots__ = ('failures', 'next_attempt')
+
+    def __init__(self):
+        self.failures = 0  # Consecutive failed connects, drives the backoff
+        self.next_attempt = 0.0
+
+    def reset(self):
+        self.failures = 0
+        self.next_attempt = 0.0
+
+class PortWatcher:
+    """Connects controllers when they are plugged in and releases them when unplugged
+
+    A background thread lists the MIDI input ports every poll_interval
+    seconds and matches every configured device by name
+    (midi_control.find_xtouch_port). When a device appears it is
+    connected; failed attempts are retried with exponential backoff and
+    full jitter, capped at backoff_max, so a device that is busy in another
+    application is not hammered. Each device backs off on its own, so one
+    busy controller does not delay the others. When a device disappears
+    its stale port is closed.
+
+    suspend() stops automatic reconnects after the user released the
+    devices on purpose; resume() turns them back on. on_change is called
+    with the new connection state (True if any device is connected)
+    whenever the watcher changed it.
+    """
+
+    def __init__(self, poll_interval=1.0, backoff_initial=0.5, backoff_max=30.0, on_change=None,
+                 list_ports=None, find_port=None, connect=None, disconnect=None, is_connected=None,
+                 devices=None):
+        self.poll_interval = poll_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.on_change = on_change
+        # The port functions can be replaced, e.g. by fakes in benchmarks;
+        # all but list_ports take the device
+        self.list_ports = list_ports or midi_control.list_input_ports
+        self.find_port = find_port or midi_control.find_xtouch_port
+        self.connect = connect or midi_control.connect_device
+        self.disconnect = disconnect or midi_control.disconnect_device
+        self.is_connected = is_connected or (lambda device: device.connection.connected)
+        self.devices = devices or (lambda: midi_control.devices)
+        self.suspended = False
+        self.reconnects = 0
+        self._states = {}  # Device -> _DeviceState
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start watching for the devices on a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='port-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the watcher thread"""
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def suspend(self):
+        """Stop reconnecting automatically, e.g. after a manual release"""
+        self.suspended = True
+
+    def resume(self):
+        """Reconnect automatically again and check the ports right away"""
+        self.suspended = False
+        for state in self._states.values():
+            state.reset()
+        self.wake()
+
+    def wake(self):
+        """Check the ports now instead of at the next poll"""
+        self._wake.set()
+
+    @property
+    def failures(self):
+        """Consecutive failed connects of the device that failed most"""
+        return max((state.failures for state in self._states.values()), default=0)
+
+    def next_check_delay(self):
+        """Seconds until the next check is due, sooner while a retry is pending"""
+        now = time.monotonic()
+        delay = self.poll_interval
+        for state in self._states.values():
+            retry_in = state.next_attempt - now
+            if retry_in > 0:
+                delay = min(delay, retry_in)
+        return delay
+
+    def _backoff_delay(self, failures):
+        """Delay before the next connect attempt after failures failures"""
+        ceiling = min(self.backoff_max, self.backoff_initial * (2 ** (failures - 1)))
+        return random.uniform(0, ceiling)
+
+    def _state(self, device):
+        state = self._states.get(device)
+        if state is None:
+            state = self._states[device] = _DeviceState()
+        return state
+
+    def check(self):
+        """Compare the port list with each device's connection state once, act on differences"""
+        ports = self.list_ports()
+        devices = list(self.devices())
+        # Forget devices that are no longer configured
+        for device in list(self._states):
+            if device not in devices:
+                del self._states[device]
+
+        changed = False
+        for device in devices:
+            changed |= self._check_device(device, ports)
+        if changed:
+            self._changed()
+
+    def _check_device(self, device, ports):
+        """Check one device; returns True if its connection state was changed"""
+        state = self._state(device)
+        present = self.find_port(ports, device) is not None
+        connected = self.is_connected(device)
+
+        if connected and not present:
+            logger.info("%s was unplugged, releasing the port", device.name)
+            self.disconnect(device)
+            return True
+        if present and not connected and not self.suspended:
+            if time.monotonic() < state.next_attempt:
+                return False
+            if self.connect(device):
+                logger.info("%s reconnected", device.name)
+                state.reset()
+                self.reconnects += 1
+                return True
+            state.failures += 1
+            delay = self._backoff_delay(state.failures)
+            state.next_attempt = time.monotonic() + delay
+            logger.info("Retrying %s connection in %.1f s", device.name, delay)
+        elif present == connected:
+            # Plugged in and connected (perhaps manually), or gone: start
+            # again from the shortest delay next time
+            state.reset()
+        return False
+
+    def _changed(self):
+        """Report a connection change made by the watcher"""
+        if self.on_change:
+            try:
+                self.on_change(any(self.is_connected(device) for device in self.devices()))
+            except Exception as e:
+                logger.error("Error in connection change callback: %s", e)
+
+    def _run(self):
+        """Watcher thread main loop"""
+        while self._running:
+            # Cleared before checking, so a wake() during the check is not lost
+            self._wake.clear()
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Error watching MIDI ports: %s", e)
+            self._wake.wait(self.next_check_delay())
@@ -0,0 +1,231 @@
+"""Statistical profiler that samples the stacks of every thread
+
+The work of the application is spread over the MIDI, volume writer, Tk,
+tray and keyboard hook threads, so a deterministic profiler on one thread
+misses most of it. A 'profiler' thread instead reads the current frame of
+every thread with sys._current_frames() at a fixed rate and counts each
+distinct stack. Nothing runs on the profiled threads themselves.
+
+Results are written as collapsed stacks, one line per distinct stack:
+
+    midi/midi-input;midi.py:main;midi_control.py:process_xtouch_messages 42
+
+which flamegraph.pl, speedscope and inferno read directly. The first
+element is the subsystem and thread name. With track_allocations the
+top allocation sites from tracemalloc are written next to it.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Thread name (prefix) -> subsystem, used as the root of every stack
+SUBSYSTEMS = {
+    'MainThread': 'main',
+    'midi-input': 'midi',
+    'midi-io': 'midi',
+    'midi-capture': 'midi',
+    'port-watcher': 'midi',
+    'device-feedback': 'midi',
+    'volume-writer': 'volume',
+    'volume-com': 'volume',
+    'volume-events': 'volume',
+    'session-index': 'volume',
+    'volume-osd': 'osd',
+    'osd-prewarm': 'osd',
+    'system-tray': 'tray',
+    'hotkeys': 'hotkeys',
+    'control-server': 'control',
+    'control-client': 'control',
+}
+
+# Threads started by libraries have generic names; a module on their stack
+# tells which subsystem they belong to
+MODULE_SUBSYSTEMS = (
+    ('keyboard', 'hotkeys'),
+    ('pystray', 'tray'),
+    ('tkinter', 'osd'),
+    ('rtmidi', 'midi'),
+    ('mido', 'midi'),
+    ('logging', 'logging'),
+)
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def _subsystem(thread_name, codes):
+    """Return the subsystem of a thread from its name or the modules on its stack"""
+    subsystem = SUBSYSTEMS.get(thread_name) or SUBSYSTEMS.get(thread_name.split('_', 1)[0])
+    if subsystem:
+        return subsystem
+    for code in codes:
+        path = code.co_filename.replace('\\', '/')
+        for module, subsystem in MODULE_SUBSYSTEMS:
+            if f'/{module}/' in path or path.endswith(f'/{module}.py'):
+                return subsystem
+    return 'other'
+
+class SamplingProfiler:
+    """Samples all thread stacks rate times per second until stopped
+
+    Stacks are counted by their code objects, so a sample costs one walk
+    of each thread's frames and a dictionary update; file and function
+    names are only formatted when the profile is written.
+    """
+
+    def __init__(self, rate=100, track_allocations=False, allocation_frames=10, top_allocations=25,
+                 max_depth=128):
+        self.interval = 1.0 / rate
+        self.track_allocations = track_allocations
+        self.allocation_frames = allocation_frames
+        self.top_allocations = top_allocations
+        self.max_depth = max_depth
+        self.samples = 0
+        self.sampling_time = 0.0  # Seconds spent taking samples, the profiler's overhead
+        self.started_at = None
+        self._stacks = {}  # (thread ident, code objects root first) -> count
+        self._thread_names = {}  # ident -> name, refreshed when an unknown thread appears
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling (and allocation tracking when enabled)"""
+        if self._thread:
+            return
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(self.allocation_frames)
+        self.started_at = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        logger.info("Sampling profiler started at %d Hz%s", round(1.0 / self.interval),
+                    " with allocation tracking" if self.track_allocations else "")
+
+    def stop(self, timeout=1.0):
+        """Stop sampling; the collected samples are kept for write()"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self):
+        """Profiler thread main loop"""
+        own_ident = threading.get_ident()
+        next_sample = time.perf_counter()
+        while True:
+            # Fixed schedule, so a slow sample does not lower the rate
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay < 0:
+                next_sample = time.perf_counter()
+                delay = 0
+            if self._stop.wait(delay):
+                return
+            self.sample(skip=own_ident)
+
+    def sample(self, skip=None):
+        """Take one sample of every thread except skip"""
+        start = time.perf_counter()
+        frames = sys._current_frames()
+        max_depth = self.max_depth
+        with self._lock:
+            for ident, frame in frames.items():
+                if ident == skip:
+                    continue
+                codes = []
+                while frame is not None and len(codes) < max_depth:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                key = (ident, tuple(codes))
+                self._stacks[key] = self._stacks.get(key, 0) + 1
+                if ident not in self._thread_names:
+                    self._refresh_thread_names()
+                    # Threads started outside Python have no name; do not look again
+                    self._thread_names.setdefault(ident, f'thread-{ident}')
+            self.samples += 1
+            self.sampling_time += time.perf_counter() - start
+        del frames
+
+    def _refresh_thread_names(self):
+        """Remember the names of the running threads (threads that exit keep theirs)"""
+        for thread in threading.enumerate():
+            self._thread_names[thread.ident] = thread.name
+
+    def collapsed_stacks(self):
+        """Return the samples as collapsed stack lines, most frequent first"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+            thread_names = dict(self._thread_names)
+        counts = {}
+        for (ident, codes), count in stacks:
+            thread_name = thread_names.get(ident, f'thread-{ident}')
+            root = f"{_subsystem(thread_name, codes)}/{thread_name}"
+            line = ';'.join([root] + [_frame_name(code) for code in codes])
+            counts[line] = counts.get(line, 0) + count
+        return [f"{line} {count}" for line, count in sorted(counts.items(), key=lambda item: -item[1])]
+
+    def allocation_report(self):
+        """Return the top allocation sites as text, or None when not tracking"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB",
+            f"Top {self.top_allocations} allocation sites (live blocks):",
+        ]
+        for rank, stat in enumerate(snapshot.statistics('traceback')[:self.top_allocations], 1):
+            lines.append(f"#{rank}: {stat.size / 1024:.1f} KiB in {stat.count} blocks")
+            for frame_line in stat.traceback.format(most_recent_first=True):
+                lines.append(f"    {frame_line.strip()}")
+        return '\n'.join(lines)
+
+    def summary(self):
+        """Return the sample count, duration and overhead as a dictionary"""
+        with self._lock:
+            samples = self.samples
+            sampling_time = self.sampling_time
+        duration = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            'samples': samples,
+            'duration_s': duration,
+            'mean_sample_us': sampling_time / samples * 1_000_000 if samples else 0.0,
+            'overhead_percent': sampling_time / duration * 100 if duration else 0.0,
+        }
+
+    def write(self, path):
+        """Write the collapsed stacks to path and the allocation report next to it
+
+        Returns the paths written. Can be called while sampling continues.
+        """
+        written = []
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in self.collapsed_stacks():
+                f.write(line + '\n')
+        written.append(path)
+
+        report = self.allocation_report()
+        if report is not None:
+            allocation_path = os.path.splitext(path)[0] + '-allocations.txt'
+            with open(allocation_path, 'w', encoding='utf-8') as f:
+                f.write(report + '\n')
+            written.append(allocation_path)
+
+        summary = self.summary()
+        logger.info(
+            "Wrote profile of %d samples over %.1fs (%.0f us per sample, %.2f%% overhead) to %s",
+            summary['samples'], summary['duration_s'], summary['mean_sample_us'],
+            summary['overhead_percent'], ', '.join(written)
+        )
+        return written
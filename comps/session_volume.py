@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# AudioSessionState values from audiopolicy.h
+SESSION_STATE_INACTIVE = 0
+SESSION_STATE_ACTIVE = 1
+SESSION_STATE_EXPIRED = 2
+
+class PycawSessionProvider:
+    """Enumerates audio sessions through pycaw (Windows only)"""
+
+    def thread_init(self):
+        """Prepare COM on the background refresh thread"""
+        import comtypes
+        comtypes.CoInitialize()
+
+    def list_sessions(self):
+        """Return (process name, ISimpleAudioVolume, state) for every process session"""
+        from pycaw.pycaw import AudioUtilities
+
+        sessions = []
+        for session in AudioUtilities.GetAllSessions():
+            if session.Process is None:
+                continue  # System sounds session
+            sessions.append((session.Process.name(), session.SimpleAudioVolume, session.State))
+        return sessions
+
+class SessionVolumeController:
+    """Per-application volume with a cached process name -> session index
+
+    Enumerating sessions is far too slow for the MIDI path, so the index is
+    rebuilt on a background thread every refresh_interval seconds, or sooner
+    when a lookup misses or a write hits a dead session. Lookups are a single
+    dict access; the index is replaced as a whole so readers never see a
+    partially built one.
+    """
+
+    def __init__(self, provider=None, refresh_interval=5.0, min_refresh_gap=0.5):
+        self.provider = provider or PycawSessionProvider()
+        self.refresh_interval = refresh_interval
+        self.min_refresh_gap = min_refresh_gap  # Debounce for miss-triggered refreshes
+        self.index = {}  # Lower-cased process name -> tuple of ISimpleAudioVolume
+        self.refresh_count = 0
+        self.evictions = 0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        self._last_refresh = 0.0
+
+    def start(self):
+        """Build the index and keep it fresh on a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='session-index', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the background refresh thread"""
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def refresh(self):
+        """Rebuild the index from the provider, dropping expired sessions"""
+        index = {}
+        for process_name, volume, state in self.provider.list_sessions():
+            if state == SESSION_STATE_EXPIRED:
+                continue
+            key = process_name.lower()
+            index[key] = index.get(key, ()) + (volume,)
+        self.index = index
+        self.refresh_count += 1
+        self._last_refresh = time.monotonic()
+        logger.debug("Audio session index refreshed: %s", sorted(index))
+
+    def request_refresh(self):
+        """Ask the background thread to rebuild the index soon"""
+        self._wake.set()
+
+    def get_sessions(self, app):
+        """Return the cached session volumes of an application (may be empty)"""
+        return self.index.get(app.lower(), ())
+
+    def set_app_volume(self, app, level):
+        """Set the volume of every session of an application
+
+        Returns False if the application has no live session in the index.
+        Dead sessions found while writing are evicted immediately.
+        """
+        key = app.lower()
+        volumes = self.index.get(key)
+        if not volumes:
+            self.request_refresh()
+            return False
+
+        alive = []
+        for volume in volumes:
+            try:
+                volume.SetMasterVolume(level, None)
+                alive.append(volume)
+            except Exception as e:
+                logger.debug("Evicting dead audio session of %s: %s", app, e)
+                self.evictions += 1
+
+        if len(alive) != len(volumes):
+            index = dict(self.index)
+            if alive:
+                index[key] = tuple(alive)
+            else:
+                index.pop(key, None)
+            self.index = index
+            self.request_refresh()
+        return bool(alive)
+
+    def _run(self):
+        """Background refresh loop"""
+        try:
+            self.provider.thread_init()
+        except Exception as e:
+            logger.error("Could not initialize audio session thread: %s", e)
+        while self._running:
+            # Cleared before refreshing, so a request during the refresh is not lost
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Error refreshing audio sessions: %s", e)
+            self._wake.wait(self.refresh_interval)
+            # Debounce bursts of refresh requests from missed lookups
+            gap = self._last_refresh + self.min_refresh_gap - time.monotonic()
+            if gap > 0 and self._running:
+                time.sleep(gap)
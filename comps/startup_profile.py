@@ -0,0 +1,57 @@
+import contextlib
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+class StartupProfiler:
+    """Records how long each startup phase takes
+
+    started_at should be taken as early as possible (before the heavy
+    imports) so the report covers the whole cold start. When disabled the
+    phase() context manager does nothing but yield.
+    """
+
+    def __init__(self, started_at=None, enabled=False):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.enabled = enabled
+        self.phases = []  # (name, start offset, duration) in seconds
+        self.marks = []  # (name, offset) in seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the body of the with statement as one phase"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.phases.append((name, start - self.started_at, end - start))
+
+    def mark(self, name):
+        """Record a point in time, e.g. when the first fader message can be handled"""
+        if self.enabled:
+            self.marks.append((name, time.perf_counter() - self.started_at))
+
+    def format_report(self):
+        """Return the per-phase timings as text"""
+        lines = ["Startup profile (ms since process start):"]
+        for name, offset, duration in self.phases:
+            lines.append(f"  {name:<28} at {offset * 1000:8.1f}  took {duration * 1000:8.1f}")
+        for name, offset in self.marks:
+            lines.append(f"  {name:<28} at {offset * 1000:8.1f}")
+        return '\n'.join(lines)
+
+    def report(self):
+        """Print the report (pythonw.exe has no stdout, log it there instead)"""
+        if not self.enabled:
+            return
+        text = self.format_report()
+        if sys.stdout is not None:
+            print(text, flush=True)
+        else:
+            logger.warning("%s", text)
@@ -1,21 +1,62 @@
-import pystray
-from PIL import Image, ImageDraw
+import logging
 import threading
-import time
-import os
+
+from comps.config import cache_path
+
+logger = logging.getLogger(__name__)
+
+# Rendered icon, reused across launches (bump the version when the drawing changes)
+ICON_CACHE_NAME = 'xtouch-volume-icon-v1.png'
+
+def _menu_action(callback):
+    """Wrap a no-argument callback as a pystray action
+
+    pystray rejects actions taking more than two arguments, so the callback
+    cannot be bound through a default argument of the lambda.
+    """
+    return lambda icon, item: callback()
 
 class SystemTray:
     """Class to handle the system tray icon and menu"""
     
-    def __init__(self, connect_func, disconnect_func, exit_func):
-        """Initialize with callback functions"""
+    def __init__(self, connect_func, disconnect_func, exit_func, extra_items=None):
+        """Initialize with callback functions
+        
+        extra_items is an optional list of (label, callback) pairs added to the
+        menu above Exit; each callback is called without arguments.
+        """
         self.connect_func = connect_func
         self.disconnect_func = disconnect_func  
         self.exit_func = exit_func
+        self.extra_items = list(extra_items or [])
+        self.get_connection_status = None
+        self.connected = False
         self.icon = None
+        self.ready = threading.Event()  # Set once the icon is visible and its menu can be updated
+        
+    def load_image(self):
+        """Load the tray icon from the cache, drawing and caching it on first use"""
+        from PIL import Image
         
+        path = cache_path(ICON_CACHE_NAME)
+        try:
+            image = Image.open(path)
+            image.load()
+            return image
+        except Exception:
+            pass
+        
+        image = self.create_image()
+        try:
+            image.save(path)
+        except Exception as e:
+            logger.debug("Could not cache tray icon: %s", e)
+        return image
+    
     def create_image(self):
         """Create an image for the system tray icon"""
+        from PIL import Image, ImageDraw
+        
         width = 64
         height = 64
         color1 = (0, 0, 255)  # Blue
@@ -75,45 +116,65 @@ class SystemTray:
         """Exit the application from the tray menu"""
         self.exit_func(icon)
         
-    def update_connection_status(self, connected=False):
+    def build_menu(self, connected):
+        """Build the tray menu for the given connection status"""
+        import pystray
+        
+        items = [
+            pystray.MenuItem('Connected: ' + str(connected), lambda: None, enabled=False),
+            pystray.MenuItem('Connect X-Touch Mini', self.connect_xtouch_from_tray),
+            pystray.MenuItem('Disconnect X-Touch Mini', self.disconnect_xtouch_from_tray),
+        ]
+        for label, callback in self.extra_items:
+            items.append(pystray.MenuItem(label, _menu_action(callback)))
+        items.append(pystray.MenuItem('Exit', self.exit_app))
+        return tuple(items)
+        
+    def update_connection_status(self, connected=None):
         """Update the connection status in the tray menu"""
-        if self.icon:
+        if connected is None:
+            connected = bool(self.get_connection_status and self.get_connection_status())
+        self.connected = connected
+        # Before the icon is running the menu is applied by _on_icon_ready
+        if self.icon and self.ready.is_set():
             # Update the first menu item to show connection status
-            self.icon.menu = (
-                pystray.MenuItem('Connected: ' + str(connected), lambda: None, enabled=False),
-                pystray.MenuItem('Connect X-Touch', self.connect_xtouch_from_tray),
-                pystray.MenuItem('Disconnect X-Touch', self.disconnect_xtouch_from_tray),
-                pystray.MenuItem('Exit', self.exit_app)
-            )
+            self.icon.menu = self.build_menu(connected)
+        
+    def _on_icon_ready(self, icon):
+        """Called by pystray on the icon thread once the icon is running"""
+        icon.visible = True
+        icon.menu = self.build_menu(self.connected)
+        self.ready.set()
         
     def setup(self, get_connection_status):
         """Set up the system tray icon and menu"""
-        # Create the icon image
-        image = self.create_image()
+        import pystray
+        
+        self.get_connection_status = get_connection_status
+        self.connected = get_connection_status()
+        
+        # Load the icon image (drawn only when not cached yet)
+        image = self.load_image()
         
         # Define the menu items
-        menu = (
-            pystray.MenuItem('Connected: ' + str(get_connection_status()), lambda: None, enabled=False),
-            pystray.MenuItem('Connect X-Touch Mini', self.connect_xtouch_from_tray),
-            pystray.MenuItem('Disconnect X-Touch Mini', self.disconnect_xtouch_from_tray),
-            pystray.MenuItem('Exit', self.exit_app)
-        )
+        menu = self.build_menu(self.connected)
         
         # Create the icon
         self.icon = pystray.Icon("XTouchVolumeControl", image, "X-Touch Volume Control", menu)
         
         # Run the icon in a separate thread to avoid blocking
         # We need to make sure this thread can be properly stopped on exit
-        icon_thread = threading.Thread(target=lambda: self.icon.run(), daemon=True)
+        # The ready event is set from pystray's setup callback, nothing waits here
+        icon_thread = threading.Thread(
+            target=lambda: self.icon.run(setup=self._on_icon_ready),
+            name='system-tray', daemon=True
+        )
         icon_thread.start()
         
-        # Give the icon time to initialize
-        time.sleep(0.5)
-        
     def stop(self):
         """Stop the system tray icon"""
         if self.icon:
             try:
                 self.icon.stop()
             except Exception as e:
-                print(f"Error stopping icon: {e}")
+                logger.error("Error stopping icon: %s", e)
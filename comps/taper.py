@@ -0,0 +1,70 @@
+import json
+
+MIDI_STEPS = 128  # Values 0-127 a fader or encoder can send
+
+# Compiled tables by spec, so bindings with the same curve share one table
+_cache = {}
+
+def _linear():
+    return [value / 127.0 for value in range(MIDI_STEPS)]
+
+def _db(range_db=60.0):
+    """Linear amplitude gains for equal dB steps from -range_db to 0 dB; 0 is silence
+
+    The audio backends take levels that already follow the OS volume
+    curve, so this table makes the fader much steeper than the OS slider;
+    the steps are only equal in dB for targets taking linear amplitude.
+    """
+    table = [0.0]
+    for value in range(1, MIDI_STEPS):
+        gain_db = -range_db * (1.0 - value / 127.0)
+        table.append(10 ** (gain_db / 20.0))
+    return table
+
+def _breakpoints(points):
+    """Piecewise linear curve through [midi value, level] points"""
+    points = sorted((int(x), float(y)) for x, y in points)
+    if len(points) < 2:
+        raise ValueError("A breakpoint taper needs at least two points")
+    if points[0][0] != 0 or points[-1][0] != 127:
+        raise ValueError("Breakpoints must start at MIDI value 0 and end at 127")
+
+    table = []
+    segment = 0
+    for value in range(MIDI_STEPS):
+        while points[segment + 1][0] < value:
+            segment += 1
+        (x0, y0), (x1, y1) = points[segment], points[segment + 1]
+        fraction = (value - x0) / (x1 - x0) if x1 != x0 else 1.0
+        table.append(y0 + (y1 - y0) * fraction)
+    return table
+
+def compile_taper(spec=None):
+    """Compile a taper spec into a 128-entry tuple of volume levels (0.0 to 1.0)
+
+    spec is None or "linear", "log"/"db" (optionally as a dict with
+    "range_db", default 60), or {"curve": "breakpoints", "points": [[0, 0],
+    [64, 0.2], [127, 1]]}. Lookups at runtime are a single index, no math.
+    """
+    if spec is None:
+        spec = 'linear'
+    if isinstance(spec, str):
+        spec = {'curve': spec}
+    key = json.dumps(spec, sort_keys=True)
+    table = _cache.get(key)
+    if table is not None:
+        return table
+
+    curve = spec.get('curve', 'linear')
+    if curve == 'linear':
+        values = _linear()
+    elif curve in ('log', 'db'):
+        values = _db(float(spec.get('range_db', 60.0)))
+    elif curve == 'breakpoints':
+        values = _breakpoints(spec.get('points', ()))
+    else:
+        raise ValueError(f"Unknown taper curve: {curve!r}")
+
+    table = tuple(min(1.0, max(0.0, level)) for level in values)
+    _cache[key] = table
+    return table
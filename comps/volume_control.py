@@ -1,26 +1,133 @@
-from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+import logging
+import time
+
+from comps import latency
+from comps.audio_backends import AUTO, create_endpoint
+
+logger = logging.getLogger(__name__)
+
+# Levels closer than this are the same volume (a fader step is about 0.008)
+LEVEL_EPSILON = 1e-4
 
 class VolumeControl:
-    """Class to handle system volume control"""
-    
-    def __init__(self):
-        # Set up volume control
-        self.devices = AudioUtilities.GetSpeakers()
-        interface = self.devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        self.volume = cast(interface, POINTER(IAudioEndpointVolume))
-        
+    """Class to handle system volume control
+
+    The master level and mute state are cached. The endpoint pushes every
+    change made outside this application, so the cache stays correct
+    without polling, and writes that would not change the volume never
+    reach the audio API. Listeners are called with (level, muted) after
+    such an outside change. Endpoints without notifications fall back to
+    reading the real value on every get, as does the cache while the
+    endpoint reports its notifications as stopped.
+
+    endpoint is opened from the named backend (see comps.audio_backends)
+    unless given. The time every write to it takes is recorded, so
+    backends can be compared on the machine they run on.
+    """
+
+    def __init__(self, endpoint=None, backend=AUTO):
+        self.endpoint = endpoint or create_endpoint(backend)
+        self.listeners = []
+        self.set_level_time = latency.LatencyHistogram()
+        self.writes = 0
+        self.writes_skipped = 0
+        self.external_changes = 0
+
         # Get current volume (value between 0.0 and 1.0)
-        self.current_volume = self.volume.GetMasterVolumeLevelScalar()
-        print(f"Current volume: {self.current_volume * 100:.0f}%")
-        
+        self.current_volume = self.endpoint.get_level()
+        self.muted = self.endpoint.get_mute()
+        self.notifications = self.endpoint.subscribe(self._on_change, self._on_status)
+        logger.info("Current volume: %.0f%%", self.current_volume * 100)
+        if not self.notifications:
+            logger.warning("No volume change notifications, the volume is read on every use")
+
     def get_volume(self):
         """Get the current system volume (0.0 to 1.0)"""
+        if not self.notifications:
+            self.current_volume = self.endpoint.get_level()
         return self.current_volume
-        
-    def set_volume(self, new_volume):
-        """Set the system volume (0.0 to 1.0)"""
-        self.volume.SetMasterVolumeLevelScalar(new_volume, None)
+
+    def set_volume(self, new_volume, received_at=None, ramp_time=None):
+        """Set the system volume (0.0 to 1.0)
+
+        received_at is the MIDI receive timestamp used for latency stats.
+        ramp_time is accepted for bindings with smoothing and ignored: only
+        VolumeWriter ramps, a direct write lands at once.
+        """
+        if self.notifications and abs(new_volume - self.current_volume) < LEVEL_EPSILON:
+            self.writes_skipped += 1
+        else:
+            started = time.perf_counter()
+            self.endpoint.set_level(new_volume)
+            self.set_level_time.record(time.perf_counter() - started)
+            self.writes += 1
         self.current_volume = new_volume
+        if received_at is not None and latency.tracker is not None:
+            latency.tracker.record('receive_to_volume', received_at)
         return self.current_volume
+
+    def get_mute(self):
+        """Get the master mute state"""
+        if not self.notifications:
+            self.muted = self.endpoint.get_mute()
+        return self.muted
+
+    def set_mute(self, muted):
+        """Set the master mute state"""
+        muted = bool(muted)
+        if not self.notifications or muted != self.muted:
+            self.endpoint.set_mute(muted)
+        self.muted = muted
+        return muted
+
+    def toggle_mute(self):
+        """Toggle the master mute state and return the new state"""
+        return self.set_mute(not self.get_mute())
+
+    def get_stats(self):
+        """Return the backend, write and notification counters and write times as a dictionary"""
+        return {
+            'backend': getattr(self.endpoint, 'name', type(self.endpoint).__name__),
+            'notifications': self.notifications,
+            'writes': self.writes,
+            'writes_skipped': self.writes_skipped,
+            'external_changes': self.external_changes,
+            'set_volume_time': self.set_level_time.summary(),
+        }
+
+    def close(self):
+        """Stop receiving change notifications and release the backend"""
+        self.endpoint.close()
+        self.notifications = False
+
+    def _on_status(self, listening):
+        """Endpoint notifications stopped or resumed (called on the endpoint's thread)"""
+        if not listening:
+            logger.warning("Volume change notifications stopped, reading the volume on every use")
+            self.notifications = False
+            return
+        # Changes made while not listening are picked up as outside changes
+        try:
+            self._on_change(self.endpoint.get_level(), self.endpoint.get_mute(), False)
+        except Exception as e:
+            logger.error("Could not read the volume after notifications resumed: %s", e)
+            return
+        self.notifications = True
+        logger.info("Volume change notifications resumed")
+
+    def _on_change(self, level, muted, own_change):
+        """Endpoint notification (called on the endpoint's thread)"""
+        if own_change:
+            # Already in the cache; a late echo must not undo a newer write
+            return
+        if abs(level - self.current_volume) < LEVEL_EPSILON and muted == self.muted:
+            return
+        self.current_volume = level
+        self.muted = muted
+        self.external_changes += 1
+        logger.debug("Volume changed outside: %.0f%%%s", level * 100, " (muted)" if muted else "")
+        for listener in self.listeners:
+            try:
+                listener(level, muted)
+            except Exception as e:
+                logger.error("Error in volume change listener: %s", e)
@@ -1,10 +1,19 @@
-import tkinter as tk
-from tkinter import ttk
+import logging
 import threading
 import time
 
+from comps import latency
+
+logger = logging.getLogger(__name__)
+
 class VolumeOSD:
-    """Class to display an on-screen volume indicator"""
+    """Class to display an on-screen volume indicator
+    
+    Show requests from other threads collapse into a single pending level.
+    The Tk thread is only woken (through a marshalled after_idle call) when a
+    new level arrives and no render is already scheduled, so it sleeps in
+    mainloop while the OSD is idle instead of polling a command queue.
+    """
     
     def __init__(self):
         self.window = None
@@ -14,25 +23,58 @@ class VolumeOSD:
         self.width = 300
         self.height = 50
         self.initialized = False
+        self.failed = False  # The window could not be created; the OSD stays off
         self.tk_thread = None
-        self.tk_queue = []  # Commands to run on tk thread
         self.tk_lock = threading.Lock()
+        self.init_lock = threading.Lock()  # Serializes initialize() between callers
+        self.ready = threading.Event()  # Set once the Tk mainloop is running
+        self.pending_level = None  # Latest level waiting to be rendered
+        self.pending_stamps = None  # (received_at, volume_set_at) of that level, for latency stats
+        self.render_scheduled = False  # A render is already queued on the Tk thread
+        self.displayed_percent = None  # Percent currently shown in the widgets
         
     def initialize(self):
         """Initialize the OSD window (called once)"""
-        if self.initialized:
+        if self.initialized or self.failed:
             return
-            
-        # Start Tkinter in its own thread to avoid mainloop issues
-        self.tk_thread = threading.Thread(target=self._tk_mainloop, daemon=True)
-        self.tk_thread.start()
         
-        # Wait for initialization to complete
-        while not self.initialized:
-            time.sleep(0.05)
+        with self.init_lock:
+            if self.failed:
+                return
+            if self.tk_thread is None or not self.tk_thread.is_alive():
+                # Start Tkinter in its own thread to avoid mainloop issues
+                self.ready.clear()
+                self.tk_thread = threading.Thread(target=self._tk_mainloop, name='volume-osd', daemon=True)
+                self.tk_thread.start()
+        
+        # Wait until the mainloop can accept commands
+        self.ready.wait()
     
     def _tk_mainloop(self):
         """Run Tkinter mainloop in separate thread"""
+        try:
+            self._create_window()
+        except Exception as e:
+            # Release initialize() and do not try again on every show
+            logger.error("Error creating volume OSD, it stays disabled: %s", e)
+            self.failed = True
+            self.ready.set()
+            return
+        
+        def mark_ready():
+            self.initialized = True
+            self.ready.set()
+        
+        # Signal readiness from inside the mainloop so queued commands are served
+        self.window.after_idle(mark_ready)
+        self.window.mainloop()
+    
+    def _create_window(self):
+        """Create the OSD window and widgets (called in tk thread)"""
+        # Tkinter is only loaded once the OSD is first needed
+        import tkinter as tk
+        from tkinter import ttk
+        
         self.window = tk.Tk()
         self.window.withdraw()  # Hide initially
         self.window.overrideredirect(True)  # Remove window decorations
@@ -68,36 +110,55 @@ class VolumeOSD:
             mode='determinate'
         )
         self.progress.pack(side=tk.BOTTOM, pady=5, padx=10, fill=tk.X)
-        
-        self.initialized = True
-        
-        # Process tk commands
-        def check_queue():
-            with self.tk_lock:
-                while self.tk_queue:
-                    func, args = self.tk_queue.pop(0)
-                    try:
-                        func(*args)
-                    except Exception as e:
-                        print(f"Error in tk command: {e}")
-            self.window.after(50, check_queue)
-            
-        check_queue()
-        self.window.mainloop()
     
     def _queue_tk_command(self, func, *args):
-        """Add a command to be executed in the Tkinter thread"""
+        """Schedule a command to be executed in the Tkinter thread"""
         if not self.initialized:
-            return
-            
+            return False
+        
+        # Tkinter marshals calls from other threads to the Tk thread, which
+        # wakes its mainloop; the command then runs once the loop is idle
+        try:
+            self.window.after_idle(self._run_tk_command, func, args)
+            return True
+        except Exception as e:
+            logger.error("Error queueing tk command: %s", e)
+            return False
+    
+    def _run_tk_command(self, func, args):
+        """Run a queued command (called in tk thread)"""
+        try:
+            func(*args)
+        except Exception as e:
+            logger.exception("Error in tk command: %s", e)
+    
+    def _render_pending(self):
+        """Render the latest requested level (called in tk thread)"""
         with self.tk_lock:
-            self.tk_queue.append((func, args))
+            volume_level = self.pending_level
+            stamps = self.pending_stamps
+            self.pending_level = None
+            self.pending_stamps = None
+            self.render_scheduled = False
+        
+        if volume_level is not None:
+            self._do_show(volume_level, *(stamps or ()))
     
-    def _do_show(self, volume_level):
+    def _do_show(self, volume_level, received_at=None, volume_set_at=None):
         """Actually show the window (called in tk thread)"""
+        if received_at is not None and latency.tracker is not None:
+            shown_at = time.perf_counter()
+            latency.tracker.record('receive_to_osd', received_at, shown_at)
+            if volume_set_at is not None:
+                latency.tracker.record('volume_to_osd', volume_set_at, shown_at)
+        
         percent = int(volume_level * 100)
-        self.volume_text.set(f"Volume: {percent}%")
-        self.progress['value'] = percent
+        
+        # Only touch the widgets when the displayed value changes
+        if percent != self.displayed_percent:
+            self.volume_text.set(f"Volume: {percent}%")
+            self.progress['value'] = percent
+            self.displayed_percent = percent
         
         if not self.showing:
             self.window.deiconify()
@@ -108,7 +169,7 @@ class VolumeOSD:
             self.window.after_cancel(self.hide_timer)
             
         # Set timer to hide after duration
-        self.hide_timer = self.window.after(int(self.duration * 300), self._do_hide)
+        self.hide_timer = self.window.after(int(self.duration * 1000), self._do_hide)
     
     def _do_hide(self):
         """Actually hide the window (called in tk thread)"""
@@ -122,12 +183,35 @@ class VolumeOSD:
         if self.window:
             self.window.quit()
         
-    def show_volume(self, volume_level):
-        """Show the volume OSD with the given level (0.0 to 1.0)"""
+    def show_volume(self, volume_level, received_at=None, volume_set_at=None):
+        """Show the volume OSD with the given level (0.0 to 1.0)
+        
+        received_at and volume_set_at are perf_counter() timestamps of the
+        MIDI message and the volume write, passed when latency stats are on.
+        """
         if not self.initialized:
             self.initialize()
+        
+        # Collapse bursts into one pending level; only the first request of a
+        # burst wakes the Tk thread, later ones just replace the value
+        with self.tk_lock:
+            self.pending_level = volume_level
+            self.pending_stamps = (received_at, volume_set_at) if received_at is not None else None
+            if self.render_scheduled:
+                return
+            self.render_scheduled = True
             
-        self._queue_tk_command(self._do_show, volume_level)
+        if not self._queue_tk_command(self._render_pending):
+            with self.tk_lock:
+                self.render_scheduled = False
+        
+    def show_channel(self, channel, volume_level, received_at=None, volume_set_at=None):
+        """Show the level of one channel (None is the master volume)
+        
+        This OSD only shows the master volume; other channels are ignored.
+        """
+        if channel is None:
+            self.show_volume(volume_level, received_at=received_at, volume_set_at=volume_set_at)
         
     def hide(self):
         """Hide the volume OSD"""
@@ -139,10 +223,16 @@ class VolumeOSD:
         if self.initialized:
             try:
                 self._queue_tk_command(self._do_destroy)
-                # Give a short time for the command to execute
-                time.sleep(0.1)
+                # Wait for the mainloop to exit instead of a fixed sleep
+                if self.tk_thread and self.tk_thread is not threading.current_thread():
+                    self.tk_thread.join(timeout=1.0)
             except Exception as e:
-                print(f"Error destroying volume OSD: {e}")
+                logger.error("Error destroying volume OSD: %s", e)
             finally:
                 self.initialized = False
                 self.showing = False
+                self.ready.clear()
+                with self.tk_lock:
+                    self.pending_level = None
+                    self.pending_stamps = None
+                    self.render_scheduled = False
@@ -0,0 +1,238 @@
+import logging
+import threading
+import time
+
+from comps import latency
+
+logger = logging.getLogger(__name__)
+
+MASTER = None  # Slot key of the master volume; other slots are application names
+MUTE = 'mute'  # Feedback target of the master mute state
+DEFAULT_TICK = 1.0 / 60  # Smoothing tick when writes are not rate limited
+
+class VolumeWriter:
+    """Class to apply volume changes on a separate thread, latest value wins
+
+    The MIDI thread only drops the newest target level into a slot, one slot
+    for the master volume and one per application. The writer thread picks
+    the slots up, skips levels that would not change the volume, and makes
+    at most max_writes_per_second writes a second: a batch that wrote
+    several slots waits that many intervals before the next one. Values that
+    arrive in between simply replace the pending one in their slot.
+
+    A value submitted with a ramp_time is approached on a fixed tick (the
+    write interval) instead of being jumped to, moving at most one tick's
+    share of a full-scale ramp per write. The thread only ticks while a ramp
+    is in progress; a still fader costs nothing.
+    """
+
+    def __init__(self, volume_control, volume_osd=None, max_writes_per_second=60,
+                 session_volume=None, feedback=None):
+        self.volume_control = volume_control
+        self.volume_osd = volume_osd
+        self.session_volume = session_volume  # SessionVolumeController for per-app slots
+        self.feedback = feedback  # DeviceFeedback told about every applied change
+        self.min_interval = 1.0 / max_writes_per_second if max_writes_per_second else 0.0
+        self.tick = self.min_interval or DEFAULT_TICK
+
+        self._condition = threading.Condition()
+        self._pending = {}  # Slot -> (level, receive timestamp for latency stats)
+        self._targets = {}  # Slot -> newest level asked for, or set from outside
+        self._last_written = {}  # Slot -> last level written
+        self._ramps = {}  # Slot -> [goal level, receive timestamp, step per tick] (writer thread only)
+        self._running = False
+        self._thread = None
+
+        # Counters to see how much work coalescing saves
+        self.messages_received = 0
+        self.writes = 0
+        self.writes_skipped = 0
+
+    def start(self):
+        """Start the writer thread"""
+        if self._running:
+            return
+        try:
+            self._last_written[MASTER] = self.volume_control.get_volume()
+        except Exception:
+            self._last_written.pop(MASTER, None)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='volume-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the writer thread, writing any pending values first"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def submit(self, level, received_at=None, target=MASTER, ramp_time=None):
+        """Store the newest level (0.0 to 1.0) for a slot and return immediately
+
+        With ramp_time (seconds for a full 0 to 1 sweep) the level is reached
+        gradually by the smoothing ramp.
+        """
+        with self._condition:
+            self.messages_received += 1
+            if target in self._pending:
+                # An older value was never written, it is superseded
+                self.writes_skipped += 1
+            self._pending[target] = (level, received_at, ramp_time)
+            self._targets[target] = level
+            self._condition.notify()
+
+    # Lets the writer stand in for VolumeControl on the MIDI thread
+    set_volume = submit
+
+    def set_app_volume(self, app, level, received_at=None, ramp_time=None):
+        """Store the newest level for an application's slot"""
+        self.submit(level, received_at, target=app.lower(), ramp_time=ramp_time)
+
+    def get_volume(self):
+        """Get the most recent master target level, falling back to the real volume
+
+        The target stays valid while the level is waiting, ramping or being
+        written, and is replaced when the volume is changed from outside.
+        """
+        level = self._targets.get(MASTER)
+        if level is not None:
+            return level
+        return self.volume_control.get_volume()
+
+    def external_change(self, level, muted):
+        """VolumeControl listener: the master volume was changed outside this application"""
+        with self._condition:
+            # Otherwise a fader moving back to the old level would be skipped
+            self._last_written[MASTER] = level
+            if MASTER not in self._pending:
+                self._targets[MASTER] = level
+        if self.feedback:
+            self.feedback.report(MASTER, level)
+            self.feedback.report(MUTE, muted)
+
+    def toggle_mute(self):
+        """Toggle the master mute (a single rare call, done directly)"""
+        muted = self.volume_control.toggle_mute()
+        if self.feedback:
+            self.feedback.report(MUTE, muted)
+        return muted
+
+    def get_stats(self):
+        """Return the work counters as a dictionary"""
+        with self._condition:
+            return {
+                'messages_received': self.messages_received,
+                'writes': self.writes,
+                'writes_skipped': self.writes_skipped,
+            }
+
+    def _take_pending(self, block=True, timeout=None):
+        """Take all pending slots, waiting for one if block is set
+
+        Waits at most timeout seconds when given. Returns an empty dict when
+        nothing arrived or when stopping with nothing left to write.
+        """
+        with self._condition:
+            if block and not self._pending and self._running:
+                self._condition.wait_for(lambda: self._pending or not self._running, timeout)
+            pending = self._pending
+            self._pending = {}
+            return pending
+
+    def _run(self):
+        """Writer thread main loop"""
+        next_write = 0.0
+        while True:
+            if self._ramps:
+                # Wake for the next smoothing tick even without new values
+                pending = self._take_pending(timeout=max(0.0, next_write - time.monotonic()))
+            else:
+                pending = self._take_pending()
+                if not pending:
+                    return
+
+            # Respect the write rate limit; newer values may arrive meanwhile
+            delay = next_write - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                self._merge_newer(pending)
+
+            writes = self.writes
+            self._apply(pending)
+            next_write = time.monotonic() + self._next_interval(self.writes - writes)
+
+    def _merge_newer(self, pending):
+        """Add values that arrived while waiting to pending, newest wins"""
+        newer = self._take_pending(block=False)
+        with self._condition:
+            # Values superseded while waiting count as skipped
+            self.writes_skipped += sum(1 for target in newer if target in pending)
+        pending.update(newer)
+
+    def _apply(self, pending):
+        """Write a batch of pending slots and advance the smoothing ramps"""
+        for target, (level, received_at, ramp_time) in pending.items():
+            if ramp_time and self._running:
+                self._ramps[target] = [level, received_at, self.tick / ramp_time]
+                continue
+            self._ramps.pop(target, None)
+            if level == self._last_written.get(target):
+                with self._condition:
+                    self.writes_skipped += 1
+                continue
+            self._write(target, level, received_at)
+
+        self._step_ramps()
+
+    def _next_interval(self, writes=1):
+        """Seconds until the next batch may be written, after one that made this many writes
+
+        Every write uses up one interval of the rate limit; a ramp in
+        progress waits at least one smoothing tick.
+        """
+        return max(self.min_interval * writes, self.tick if self._ramps else 0.0)
+
+    def _step_ramps(self):
+        """Move every ramping slot one tick toward its goal"""
+        for target, (goal, received_at, step) in list(self._ramps.items()):
+            current = self._last_written.get(target)
+            if current is None or not self._running:
+                level = goal  # Unknown start or shutting down: go straight there
+            elif goal > current:
+                level = min(goal, current + step)
+            else:
+                level = max(goal, current - step)
+            if level == goal:
+                del self._ramps[target]
+            if level != current:
+                self._write(target, level, received_at if level == goal else None)
+
+    def _write(self, target, level, received_at):
+        """Write one slot's level to its backend"""
+        try:
+            if target is MASTER:
+                self.volume_control.set_volume(level, received_at=received_at)
+            elif self.session_volume is None or not self.session_volume.set_app_volume(target, level):
+                # No session for this application (yet), try again on the next value
+                return
+            self._last_written[target] = level
+            volume_set_at = None
+            if received_at is not None and latency.tracker is not None:
+                volume_set_at = time.perf_counter()
+            with self._condition:
+                self.writes += 1
+            logger.debug("Volume of %s set to: %.0f%%", target or 'master', level * 100)
+
+            if self.feedback:
+                self.feedback.report(target, level)
+
+            if self.volume_osd:
+                # The OSD decides which channels it shows (the master at least)
+                self.volume_osd.show_channel(
+                    target, level, received_at=received_at, volume_set_at=volume_set_at
+                )
+        except Exception as e:
+            logger.error("Error setting volume of %s: %s", target or 'master', e)
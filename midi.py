@@ -1,17 +1,43 @@
-import threading
 import time
+
+# Taken before any other import so --startup-profile covers the whole cold start
+STARTED_AT = time.perf_counter()
+
+import argparse
+import logging
+import threading
 import atexit
-import keyboard
 import os
 
-# Import our components
+# Import our components (GUI, keyboard and audio libraries load lazily on first use)
 from comps.volume_osd import VolumeOSD
+from comps.canvas_osd import CanvasVolumeOSD
 from comps.midi_control import (
     connect_xtouch, disconnect_xtouch, process_xtouch_messages, 
-    get_connection_status
+    get_connection_status, set_input_mode, wake_xtouch_thread, set_device_feedback,
+    set_capture, devices_from_config, set_devices, get_device_states,
+    INPUT_MODE_CALLBACK, INPUT_MODE_POLL
 )
 from comps.volume_control import VolumeControl
+from comps.audio_backends import AUTO, BACKENDS
+from comps.volume_writer import VolumeWriter, MASTER, MUTE
 from comps.system_tray import SystemTray
+from comps.config import cache_path, load_config
+from comps.session_volume import SessionVolumeController
+from comps.device_feedback import DeviceFeedback, FeedbackGroup
+from comps.port_watcher import PortWatcher
+from comps.logging_setup import setup_logging, shutdown_logging, dump_recent_events
+from comps import latency
+from comps.startup_profile import StartupProfiler
+from comps.hotkeys import HotkeyManager, HotkeyTargets
+from comps.midi_capture import MidiCapture
+from comps.sampling_profiler import SamplingProfiler
+
+# Values of --runtime
+RUNTIME_THREADS = 'threads'
+RUNTIME_ASYNCIO = 'asyncio'
+
+logger = logging.getLogger('xtouch')
 
 # Global variables
 midi_thread = None
@@ -19,32 +45,214 @@ exit_flag = False
 volume_osd = None
 system_tray = None
 volume_control = None
+volume_writer = None
+session_volume = None
+device_feedback = None
+mapping_engine = None  # Bindings of the first device
+midi_devices = []
+port_watcher = None
+async_runtime = None
+hotkey_manager = None
+midi_capture = None
+control_server = None
+headless = False
+sampling_profiler = None
+profile_path = None
+latency_stats_path = None
+cleaned_up = False
+
+def release_xtouch():
+    """Release the X-Touch Mini on request and keep the port watcher from retaking it"""
+    if port_watcher:
+        port_watcher.suspend()
+    result = disconnect_xtouch()
+    if system_tray:
+        system_tray.update_connection_status(get_connection_status())
+    return result
+
+def reconnect_xtouch():
+    """Connect the X-Touch Mini on request and let the port watcher manage it again"""
+    result = connect_xtouch()
+    if port_watcher:
+        port_watcher.resume()
+    if system_tray:
+        system_tray.update_connection_status(get_connection_status())
+    return result
+
+def on_connection_change(connected):
+    """Called by the port watcher after it connected or released the device"""
+    if system_tray:
+        system_tray.update_connection_status(connected)
+
+def reload_mappings():
+    """Re-read the bindings of every device from the config file"""
+    results = [device.engine.reload() for device in midi_devices]
+    return all(results)
+
+def request_shutdown():
+    """Stop the application from another thread, e.g. the control socket"""
+    global exit_flag
+    logger.info("Shutdown requested")
+    if async_runtime:
+        async_runtime.request_stop()
+    else:
+        # main() leaves its wait loop and cleanup() runs at exit
+        exit_flag = True
+    return {'stopping': True}
+
+def get_status():
+    """Short status of this instance for the control socket"""
+    from comps.memory import resident_memory
+    
+    return {
+        'connected': get_connection_status(),
+        'devices': get_device_states(),
+        'headless': headless,
+        'runtime': RUNTIME_ASYNCIO if async_runtime else RUNTIME_THREADS,
+        'pid': os.getpid(),
+        'uptime_s': round(time.perf_counter() - STARTED_AT, 1),
+        'rss_bytes': resident_memory(),
+    }
+
+def control_connect():
+    """Connect from the control socket and reply with the new status"""
+    reconnect_xtouch()
+    return get_status()
 
-def handle_keyboard_shortcuts(e):
-    """Handle keyboard shortcuts for connecting/disconnecting X-Touch Mini"""
-    # Ctrl+Page Down to release X-Touch Mini
-    if keyboard.is_pressed('ctrl') and e.name == 'page down':
-        if get_connection_status():
-            print("Keyboard shortcut: Releasing X-Touch Mini")
-            disconnect_xtouch()
-            if system_tray:
-                system_tray.update_connection_status(get_connection_status())
-    
-    # Ctrl+Page Up to reconnect X-Touch Mini
-    elif keyboard.is_pressed('ctrl') and e.name == 'page up':
-        if not get_connection_status():
-            print("Keyboard shortcut: Reconnecting X-Touch Mini")
-            connect_xtouch()
-            if system_tray:
-                system_tray.update_connection_status(get_connection_status())
+def control_disconnect():
+    """Release the device from the control socket and reply with the new status"""
+    release_xtouch()
+    return get_status()
+
+def get_volume_state():
+    """Current master volume and mute state for the control socket"""
+    return {'volume': volume_writer.get_volume(), 'muted': volume_control.get_mute()}
+
+def get_metrics():
+    """Work counters of the running components for the control socket"""
+    from comps.memory import resident_memory
+    
+    metrics = {
+        'connected': get_connection_status(),
+        'devices': get_device_states(),
+        'rss_bytes': resident_memory(),
+        'threads': threading.active_count(),
+        'writer': volume_writer.get_stats() if volume_writer else None,
+        'volume_backend': volume_control.get_stats() if volume_control else None,
+    }
+    if port_watcher:
+        metrics['reconnects'] = port_watcher.reconnects
+    if device_feedback:
+        metrics['feedback'] = {'messages_sent': device_feedback.messages_sent, 'flushes': device_feedback.flushes}
+    if session_volume:
+        metrics['session_refreshes'] = session_volume.refresh_count
+    if hotkey_manager:
+        metrics['hotkeys_triggered'] = hotkey_manager.triggered
+    if midi_capture:
+        metrics['capture'] = {'records': midi_capture.records, 'bytes_written': midi_capture.bytes_written}
+    if latency.tracker is not None:
+        metrics['latency'] = latency.tracker.summary()
+    if sampling_profiler:
+        metrics['profiler'] = sampling_profiler.summary()
+    return metrics
+
+def write_profile():
+    """Write the sampled stacks (and allocation report) gathered so far"""
+    if sampling_profiler is None:
+        return None
+    return sampling_profiler.write(profile_path)
+
+def start_control_server(control_config):
+    """Open the local control socket when it is enabled"""
+    global control_server
+    enabled = control_config['enabled']
+    if enabled is None:
+        enabled = headless
+    if not enabled:
+        return
+    # multiprocessing.connection is only loaded when the socket is used
+    from comps.control_server import ControlServer
+    
+    control_server = ControlServer({
+        'status': get_status,
+        'connect': control_connect,
+        'disconnect': control_disconnect,
+        'volume': get_volume_state,
+        'metrics': get_metrics,
+        'shutdown': request_shutdown,
+    }, address=control_config['address'])
+    if sampling_profiler:
+        control_server.handlers['profile'] = lambda: {'written': write_profile()}
+    try:
+        control_server.start()
+    except OSError as e:
+        logger.error("Could not open the control socket %s: %s", control_server.address, e)
+        control_server = None
 
 def cleanup():
     """Cleanup function to release resources on exit"""
-    global exit_flag, system_tray, volume_osd
-    print("\nCleaning up resources...")
+    global exit_flag, system_tray, volume_osd, volume_writer, session_volume, device_feedback
+    global volume_control, port_watcher, cleaned_up, hotkey_manager, midi_capture, control_server, sampling_profiler
+    # Runs from main() in the asyncio runtime and again from atexit
+    if cleaned_up:
+        return
+    cleaned_up = True
+    logger.info("Cleaning up resources...")
     exit_flag = True
+    wake_xtouch_thread()
+    
+    # No more hotkey actions or control requests, e.g. a reconnect while shutting down
+    if hotkey_manager:
+        hotkey_manager.stop()
+        hotkey_manager = None
+    if control_server:
+        control_server.stop()
+        control_server = None
+    
+    # Stop the watcher first so it cannot reconnect while shutting down
+    if port_watcher:
+        port_watcher.stop()
+        port_watcher = None
     disconnect_xtouch()
     
+    # Nothing more can arrive, write out the rest of the capture
+    if midi_capture:
+        set_capture(None)
+        midi_capture.stop()
+        midi_capture = None
+    
+    # Flush the last pending volume change and report how much work was saved
+    if volume_writer:
+        volume_writer.stop()
+        logger.info("Volume writer stats: %s", volume_writer.get_stats())
+        volume_writer = None
+    
+    if volume_control:
+        volume_control.close()
+        logger.info("Volume backend stats: %s", volume_control.get_stats())
+        volume_control = None
+    
+    if session_volume:
+        session_volume.stop()
+        session_volume = None
+    
+    if device_feedback:
+        device_feedback.stop()
+        device_feedback = None
+    
+    # Write the latency stats gathered during this run
+    if latency.tracker is not None and latency_stats_path:
+        dump_latency_stats()
+    
+    # Everything interesting has happened, write the profile of this run
+    if sampling_profiler:
+        sampling_profiler.stop()
+        try:
+            write_profile()
+        except Exception as e:
+            logger.error("Error writing profile to %s: %s", profile_path, e)
+        sampling_profiler = None
+    
     # First stop the icon (which might be waiting on user interaction)
     if system_tray:
         system_tray.stop()
@@ -54,12 +262,20 @@ def cleanup():
         try:
             volume_osd.destroy()
         except Exception as e:
-            print(f"Error destroying volume OSD: {e}")
+            logger.error("Error destroying volume OSD: %s", e)
     
-    print("Cleanup complete. Goodbye!")
+    logger.info("Cleanup complete. Goodbye!")
+    shutdown_logging()
 
 def exit_app(icon):
     """Exit the application from the tray menu"""
+    if async_runtime:
+        # The event loop shuts down in order and main() returns normally
+        if icon:
+            icon.stop()
+        async_runtime.request_stop()
+        return
+    
     cleanup()
     # Use a more gentle exit that doesn't interrupt ongoing threads abruptly
     if icon:
@@ -72,63 +288,402 @@ def get_exit_flag():
     global exit_flag
     return exit_flag
 
-# Main function
-def main():
-    global midi_thread, exit_flag, volume_osd, system_tray, volume_control
+def dump_recent_log():
+    """Write the in-memory ring buffer of recent log events to a file"""
+    path = cache_path('xtouch-volume-recent.log')
+    lines = dump_recent_events(path)
+    logger.info("Wrote %d recent log events to %s", len(lines), path)
+    return path
+
+def dump_latency_stats():
+    """Log the latency stats and write them as JSON"""
+    tracker = latency.tracker
+    if tracker is None:
+        return None
+    logger.info("Latency stats:\n%s", tracker.format_summary())
+    tracker.dump_json(latency_stats_path)
+    logger.info("Wrote latency stats to %s", latency_stats_path)
+    return latency_stats_path
+
+def create_volume_osd(osd_config):
+    """Create the OSD with the renderer selected in the config file"""
+    renderer = osd_config['renderer']
+    if renderer == 'canvas':
+        return CanvasVolumeOSD(
+            max_fps=osd_config['max_fps'],
+            multi_channel=osd_config['multi_channel'],
+            duration=osd_config['duration']
+        )
+    if renderer != 'widgets':
+        logger.warning("Unknown OSD renderer %r, using the default", renderer)
+    osd = VolumeOSD()
+    osd.duration = osd_config['duration']
+    return osd
+
+def create_device_feedback(config):
+    """Start LED feedback for every device that has not turned it off
+
+    Returns the DeviceFeedback of the only such device, a FeedbackGroup
+    when there are several, or None.
+    """
+    options = {entry['name']: entry for entry in config['devices']}
+    feedbacks = []
+    for device in midi_devices:
+        if not options.get(device.name, {}).get('feedback', True):
+            continue
+        feedback = DeviceFeedback(max_flush_rate=config['feedback']['max_flush_rate'])
+        feedback.update_routes(device.engine)
+        device.engine.listeners.append(feedback.update_routes)
+        feedback.report(MASTER, volume_control.get_volume())
+        feedback.report(MUTE, volume_control.get_mute())
+        feedback.start()
+        set_device_feedback(feedback, device)
+        feedbacks.append(feedback)
+    if not feedbacks:
+        return None
+    return feedbacks[0] if len(feedbacks) == 1 else FeedbackGroup(feedbacks)
+
+def create_port_watcher(device_config):
+    """Create the hot-plug port watcher, or None when auto_reconnect is off"""
+    if not device_config['auto_reconnect']:
+        return None
+    # Reconnect on hot-plug and release the port when the device is unplugged
+    return PortWatcher(
+        poll_interval=device_config['poll_interval'],
+        backoff_max=device_config['backoff_max'],
+        on_change=on_connection_change
+    )
+
+def start_user_interface(profiler, ring_buffer_size, hotkey_config):
+    """Bring up the OSD window, tray icon and hotkeys once MIDI input is live"""
+    global system_tray, hotkey_manager
     
-    try:
-        # Initialize volume control
-        volume_control = VolumeControl()
-        
-        # Initialize volume OSD
-        volume_osd = VolumeOSD()
+    # Create the OSD window in the background so the first show is instant
+    threading.Thread(target=volume_osd.initialize, name='osd-prewarm', daemon=True).start()
+    
+    with profiler.phase('system tray'):
+        # Optional tray menu items for the diagnostics that are turned on
+        tray_items = [('Reload Config', reload_mappings)]
+        if ring_buffer_size:
+            tray_items.append(('Dump Recent Log', dump_recent_log))
+        if latency.tracker is not None:
+            tray_items.append(('Latency Stats', dump_latency_stats))
+        if sampling_profiler:
+            tray_items.append(('Write Profile', write_profile))
         
         # Set up system tray icon with callbacks
         system_tray = SystemTray(
-            connect_func=lambda: connect_xtouch() and system_tray.update_connection_status(get_connection_status()),
-            disconnect_func=lambda: disconnect_xtouch() and system_tray.update_connection_status(get_connection_status()),
-            exit_func=exit_app
+            connect_func=reconnect_xtouch,
+            disconnect_func=release_xtouch,
+            exit_func=exit_app,
+            extra_items=tray_items
         )
         system_tray.setup(get_connection_status)
+    
+    with profiler.phase('keyboard hook'):
+        # Only the configured combinations are hooked; actions run on a worker thread
+        try:
+            hotkey_manager = HotkeyManager(
+                hotkey_config,
+                HotkeyTargets(connect=reconnect_xtouch, disconnect=release_xtouch, volume_control=volume_writer)
+            )
+            hotkey_manager.start()
+        except ValueError as e:
+            logger.error("Invalid hotkeys in the config file, hotkeys disabled: %s", e)
+    
+    if profiler.enabled:
+        # Include when the GUI pieces actually became ready
+        if system_tray.ready.wait(timeout=5.0):
+            profiler.mark('tray icon visible')
+        if volume_osd.ready.wait(timeout=5.0):
+            profiler.mark('osd window ready')
+        profiler.report()
+    
+    hotkey_lines = ''.join(
+        f"- Press {keys} to {action.replace('_', ' ')}\n"
+        for keys, action, _, _ in (hotkey_manager.hotkeys if hotkey_manager else ())
+    )
+    logger.info(
+        "X-Touch Mini controller is active:\n"
+        "- The application is now running in the system tray\n"
+        "%s"
+        "- Right-click the tray icon to access the menu",
+        hotkey_lines
+    )
+
+def start_frontends(profiler, ring_buffer_size, config):
+    """Open the control socket, then the tray, OSD and hotkeys unless headless"""
+    from comps.memory import resident_memory
+    
+    start_control_server(config['control'])
+    rss = resident_memory()
+    if rss is not None:
+        logger.info("Resident memory after startup: %.1f MB", rss / (1024 * 1024))
+    if not headless:
+        start_user_interface(profiler, ring_buffer_size, config['hotkeys'])
+        return
+    
+    if profiler.enabled:
+        profiler.report()
+    logger.info(
+        "X-Touch Mini controller is active (headless):\n"
+        "- No tray icon, OSD or hotkeys; faders and buttons work as usual\n"
+        "- Control it with xtouchctl.py (status, connect, disconnect, volume, metrics, shutdown)"
+    )
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="X-Touch Mini volume controller")
+    parser.add_argument(
+        '--config', default=None,
+        help="Path to a JSON config file (defaults to config.json next to midi.py)"
+    )
+    parser.add_argument(
+        '--log-level', default=None,
+        help="Root log level, e.g. DEBUG, INFO, WARNING (overrides the config file)"
+    )
+    parser.add_argument(
+        '--log-file', default=None,
+        help="Also write log output to this file"
+    )
+    parser.add_argument(
+        '--log-ring-size', type=int, default=None,
+        help="Keep this many recent log events in memory for dumping from the tray menu"
+    )
+    parser.add_argument(
+        '--input-mode', choices=[INPUT_MODE_CALLBACK, INPUT_MODE_POLL],
+        default=INPUT_MODE_CALLBACK,
+        help="How MIDI input is read: event-driven callback (default) or legacy polling"
+    )
+    parser.add_argument(
+        '--max-writes-per-second', type=int, default=60,
+        help="Upper bound on system volume writes per second (0 for no limit)"
+    )
+    parser.add_argument(
+        '--audio-backend', choices=[AUTO] + list(BACKENDS), default=None,
+        help="System volume backend (overrides the config file; default auto picks "
+             "pycaw on Windows and pulse on Linux)"
+    )
+    parser.add_argument(
+        '--latency-stats', nargs='?', metavar='PATH', default=None,
+        const=cache_path('xtouch-volume-latency.json'),
+        help="Measure fader to volume to OSD latency and write the stats as JSON "
+             "to PATH on exit or from the tray menu (off by default)"
+    )
+    parser.add_argument(
+        '--startup-profile', action='store_true',
+        help="Print how long each startup phase takes"
+    )
+    parser.add_argument(
+        '--runtime', choices=[RUNTIME_THREADS, RUNTIME_ASYNCIO], default=RUNTIME_THREADS,
+        help="Run MIDI input and volume writes on dedicated threads (default) or as "
+             "tasks on a single asyncio event loop with ordered shutdown"
+    )
+    parser.add_argument(
+        '--capture', metavar='PATH', default=None,
+        help="Record every received MIDI message to a compact binary capture file "
+             "(replay it with benchmarks/replay_capture.py)"
+    )
+    parser.add_argument(
+        '--profile', nargs='?', metavar='PATH', default=None,
+        const=cache_path('xtouch-volume-profile.txt'),
+        help="Sample the stacks of all threads and write them as collapsed stacks "
+             "(flamegraph input) to PATH on exit or from the tray menu (off by default)"
+    )
+    parser.add_argument(
+        '--profile-rate', type=int, default=100, metavar='HZ',
+        help="Stack samples per second taken by --profile (default 100)"
+    )
+    parser.add_argument(
+        '--profile-allocations', action='store_true',
+        help="With --profile, also trace memory allocations and write the top "
+             "allocation sites next to the profile (slows everything down)"
+    )
+    parser.add_argument(
+        '--headless', action='store_true',
+        help="Run without the tray icon, OSD and keyboard hook; control the "
+             "instance through its control socket with xtouchctl.py"
+    )
+    parser.add_argument(
+        '--control', action='store_true',
+        help="Open the control socket also when not headless"
+    )
+    parser.add_argument(
+        '--control-address', metavar='ADDRESS', default=None,
+        help="Unix socket path or Windows pipe name of the control socket "
+             "(overrides the config file)"
+    )
+    return parser.parse_args(argv)
+
+# Main function
+def main(argv=None):
+    global midi_thread, exit_flag, volume_osd, system_tray, volume_control, volume_writer
+    global latency_stats_path, mapping_engine, session_volume, device_feedback, port_watcher
+    global async_runtime, midi_capture, headless, sampling_profiler, profile_path, midi_devices
+    
+    args = parse_args(argv)
+    headless = args.headless
+    profiler = StartupProfiler(started_at=STARTED_AT, enabled=args.startup_profile)
+    
+    with profiler.phase('config and logging'):
+        config = load_config(args.config)
         
-        # Connect to X-Touch Mini on startup
-        if not connect_xtouch():
-            print("Failed to connect to X-Touch Mini on startup")
-            print("You can try reconnecting with Ctrl+Page Up or from the tray menu")
+        # Command line options take precedence over the config file
+        log_config = config['logging']
+        ring_buffer_size = (
+            args.log_ring_size if args.log_ring_size is not None
+            else log_config['ring_buffer_size']
+        )
+        setup_logging(
+            level=args.log_level or log_config['level'],
+            levels=log_config['levels'],
+            log_file=args.log_file or log_config['file'],
+            ring_buffer_size=ring_buffer_size,
+        )
+    
+    if args.profile:
+        # Started first so startup shows up in the profile too
+        profile_path = args.profile
+        sampling_profiler = SamplingProfiler(rate=args.profile_rate, track_allocations=args.profile_allocations)
+        sampling_profiler.start()
+    
+    set_input_mode(args.input_mode)
+    if args.control:
+        config['control']['enabled'] = True
+    if args.control_address:
+        config['control']['address'] = args.control_address
+    
+    if args.capture:
+        midi_capture = MidiCapture(args.capture)
+        midi_capture.start()
+        set_capture(midi_capture)
+    
+    if args.latency_stats:
+        latency_stats_path = args.latency_stats
+        latency.enable()
+    
+    try:
+        # Everything the fader path needs comes first; the GUI pieces follow
+        with profiler.phase('volume control'):
+            volume_control = VolumeControl(backend=args.audio_backend or config['audio']['backend'])
         
-        # Update connection status in tray menu
-        system_tray.update_connection_status(get_connection_status())
+        # Initialize volume OSD (the Tk window is created later, off the critical path)
+        if not headless:
+            volume_osd = create_volume_osd(config['osd'])
+        
+        with profiler.phase('mappings and sessions'):
+            # One device per controller, each with its own MIDI bindings from
+            # the config file, reloadable from the tray menu
+            midi_devices = devices_from_config(config, config_path=args.config)
+            set_devices(midi_devices)
+            mapping_engine = midi_devices[0].engine
+            
+            # Per-application volume keeps a background-refreshed session index
+            sessions_enabled = config['sessions']['enabled']
+            if sessions_enabled is None:
+                sessions_enabled = any(device.engine.uses_action('app_volume') for device in midi_devices)
+            if sessions_enabled:
+                session_volume = SessionVolumeController(
+                    refresh_interval=config['sessions']['refresh_interval']
+                )
+                session_volume.start()
+            
+            # One bar per level binding when the OSD shows several channels,
+            # of every controller, rebuilt when any of them reloads
+            if getattr(volume_osd, 'multi_channel', False):
+                engines = [device.engine for device in midi_devices]
+                volume_osd.update_channels(*engines)
+                for engine in engines:
+                    engine.listeners.append(lambda _engine: volume_osd.update_channels(*engines))
+        
+        with profiler.phase('volume writer'):
+            # LED feedback to each controller, resynced whenever it (re)connects
+            if config['feedback']['enabled']:
+                device_feedback = create_device_feedback(config)
+            
+            port_watcher = create_port_watcher(config['device'])
+            
+            if args.runtime == RUNTIME_ASYNCIO:
+                # MIDI input, volume writes and the port watcher become tasks
+                # on one event loop; COM calls go through an executor. asyncio
+                # is only imported for this runtime
+                from comps.async_runtime import AsyncRuntime
+                
+                async_runtime = AsyncRuntime(
+                    volume_control, volume_osd, mapping_engine,
+                    max_writes_per_second=args.max_writes_per_second,
+                    session_volume=session_volume,
+                    feedback=device_feedback,
+                    port_watcher=port_watcher,
+                    headless=headless
+                )
+                volume_writer = async_runtime.writer
+            else:
+                # Volume writes and OSD updates run on their own thread, coalesced
+                volume_writer = VolumeWriter(
+                    volume_control, volume_osd,
+                    max_writes_per_second=args.max_writes_per_second,
+                    session_volume=session_volume,
+                    feedback=device_feedback
+                )
+                volume_writer.start()
+            
+            # Keep the writer's targets and the LEDs right when the volume is changed elsewhere
+            volume_control.listeners.append(volume_writer.external_change)
         
-        # Start monitoring keyboard shortcuts
-        keyboard.on_release(handle_keyboard_shortcuts)
+        if async_runtime:
+            def on_started():
+                profiler.mark('fader response ready')
+                start_frontends(profiler, ring_buffer_size, config)
+            
+            # Returns after request_stop() (tray Exit, shutdown request) or Ctrl+C, once the
+            # loop has shut down in order
+            async_runtime.run(on_started)
+            logger.info("Exiting program - bye!")
+            cleanup()
+            return
         
-        # Start X-Touch Mini processing thread
-        midi_thread = threading.Thread(
-            target=process_xtouch_messages, 
-            args=(get_exit_flag, volume_control, volume_osd),
-            daemon=True
-        )
-        midi_thread.start()
+        with profiler.phase('midi connect'):
+            # Start X-Touch Mini processing thread
+            midi_thread = threading.Thread(
+                target=process_xtouch_messages, 
+                args=(get_exit_flag, volume_writer, None),
+                kwargs={'engine': mapping_engine},
+                name='midi-input',
+                daemon=True
+            )
+            midi_thread.start()
+            
+            # Connect to X-Touch Mini on startup
+            if not connect_xtouch():
+                logger.warning("Failed to connect to X-Touch Mini on startup")
+                if headless:
+                    logger.warning("You can try reconnecting with: xtouchctl.py connect")
+                else:
+                    logger.warning("You can try reconnecting with Ctrl+Page Up or from the tray menu")
+            
+            if port_watcher:
+                port_watcher.start()
+        profiler.mark('fader response ready')
         
-        print("\nX-Touch Mini controller is active:")
-        print("- The application is now running in the system tray")
-        print("- Press Ctrl+Page Down to release the X-Touch Mini")
-        print("- Press Ctrl+Page Up to reconnect the X-Touch Mini")
-        print("- Right-click the tray icon to access the menu")
+        start_frontends(profiler, ring_buffer_size, config)
         
         # Keep main thread alive until interrupted
         while not exit_flag:
             time.sleep(0.1)
             
     except KeyboardInterrupt:
-        print("\nExiting program - bye!")
+        logger.info("Exiting program - bye!")
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error: %s", e)
     finally:
         # Make sure to set exit flag in case of any exit
         exit_flag = True
+        wake_xtouch_thread()
+        # Close the control socket while its file is still there; at exit
+        # multiprocessing removes it before cleanup() runs
+        if control_server:
+            control_server.stop()
         if midi_thread and midi_thread.is_alive():
             midi_thread.join(timeout=1.0)
 
@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comps import midi_control
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+@pytest.fixture
+def wait_until():
+    """wait_until(predicate, timeout=5.0): poll until predicate() is true, False on timeout"""
+    return _wait_until
+
+@pytest.fixture
+def midi_state():
+    """Leave comps.midi_control with one disconnected default device, in callback mode"""
+    yield midi_control
+    midi_control.set_devices([midi_control.MidiDevice('X-Touch Mini')])
+    midi_control.set_input_mode(midi_control.INPUT_MODE_CALLBACK)
+    while not midi_control._message_queue.empty():
+        midi_control._message_queue.get_nowait()
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from comps import audio_backends
+from comps.audio_backends import pulse
+from comps.audio_backends.memory import MemoryEndpoint
+from comps.fakes import FakePulseServer
+from comps.volume_control import VolumeControl
+
+@pytest.fixture
+def no_system_backend(monkeypatch):
+    """Make 'auto' try a pulse backend whose module cannot be imported"""
+    monkeypatch.setattr(audio_backends, 'auto_order', lambda platform=None: ('pulse',))
+    monkeypatch.setitem(audio_backends.BACKENDS, 'pulse', ('comps.audio_backends.missing', 'PulseEndpoint'))
+
+def test_auto_never_falls_back_to_memory(no_system_backend):
+    with pytest.raises(RuntimeError):
+        audio_backends.create_endpoint(audio_backends.AUTO)
+
+def test_named_backend_must_open(no_system_backend):
+    with pytest.raises(ImportError):
+        audio_backends.create_endpoint('pulse')
+
+def test_memory_is_used_when_named():
+    assert isinstance(audio_backends.create_endpoint('memory'), MemoryEndpoint)
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        audio_backends.create_endpoint('alsa')
+
+@pytest.mark.parametrize('platform, order', [('win32', ('pycaw',)), ('linux', ('pulse',)), ('darwin', ())])
+def test_auto_order_by_platform(platform, order):
+    assert audio_backends.auto_order(platform) == order
+
+def test_pulse_reconnects_after_a_server_restart(monkeypatch, wait_until):
+    monkeypatch.setattr(pulse, 'RECONNECT_INITIAL', 0.01)
+    server = FakePulseServer(level=0.5)
+    volume = VolumeControl(pulse.PulseEndpoint(client=server))
+    changes = []
+    volume.listeners.append(lambda level, muted: changes.append(level))
+    try:
+        server.stop()
+        assert wait_until(lambda: not volume.notifications)
+
+        # Changed while we were away: picked up once the server is back
+        server.external_change(level=0.25)
+        server.start()
+        assert wait_until(lambda: volume.notifications)
+        assert abs(volume.get_volume() - 0.25) < 1e-4
+        assert len(changes) == 1
+
+        # Both connections work again
+        volume.set_volume(0.75)
+        assert abs(server.sinks['fake-sink']['level'] - 0.75) < 1e-4
+        server.external_change(level=0.1)
+        assert wait_until(lambda: abs(volume.get_volume() - 0.1) < 1e-4)
+    finally:
+        volume.close()
+
+def test_pulse_writes_reconnect_a_broken_connection(monkeypatch):
+    monkeypatch.setattr(pulse, 'RECONNECT_INITIAL', 0.01)
+    server = FakePulseServer(level=0.5)
+    endpoint = pulse.PulseEndpoint(client=server)
+    volume = VolumeControl(endpoint)
+    try:
+        # Only the main connection broke; the listener is fine
+        endpoint.pulse.lost = True
+        volume.set_volume(0.75)
+        assert abs(server.sinks['fake-sink']['level'] - 0.75) < 1e-4
+        assert volume.notifications
+    finally:
+        volume.close()
+
+def test_pulse_writes_recover_without_a_listener(monkeypatch):
+    # As when subscribe() failed at start: nothing else reconnects
+    monkeypatch.setattr(pulse, 'RECONNECT_INITIAL', 0.01)
+    server = FakePulseServer(level=0.5)
+    endpoint = pulse.PulseEndpoint(client=server)
+    try:
+        server.stop()
+        with pytest.raises(ConnectionError):
+            endpoint.set_level(0.25)
+        server.start()
+        time.sleep(0.02)  # Past the backoff
+        endpoint.set_level(0.25)
+        assert abs(server.sinks['fake-sink']['level'] - 0.25) < 1e-4
+        assert endpoint.get_level() == server.sinks['fake-sink']['level']
+    finally:
+        endpoint.close()
+
+def test_pulse_close_while_reconnecting_is_prompt(monkeypatch, wait_until):
+    monkeypatch.setattr(pulse, 'RECONNECT_INITIAL', 10.0)
+    server = FakePulseServer()
+    volume = VolumeControl(pulse.PulseEndpoint(client=server))
+    server.stop()
+    assert wait_until(lambda: not volume.notifications)
+    started = time.monotonic()
+    volume.close()
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+from comps.config import cache_path
+
+@pytest.mark.skipif(sys.platform in ('win32', 'darwin'), reason="XDG cache directory")
+def test_cache_files_go_to_a_private_per_user_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    path = cache_path('xtouch-volume-latency.json')
+    directory = tmp_path / 'xtouch-volume'
+    assert path == str(directory / 'xtouch-volume-latency.json')
+    assert os.stat(directory).st_mode & 0o777 == 0o700
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+import pytest
+
+from comps.control_server import ControlServer, send_command
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="Unix domain sockets")
+
+@pytest.fixture
+def address(tmp_path):
+    return str(tmp_path / 'control.sock')
+
+@pytest.fixture
+def server(address):
+    def fail():
+        raise ValueError("Not now")
+    server = ControlServer({'status': lambda: {'connected': True}, 'fail': fail}, address=address)
+    server.start()
+    yield server
+    server.stop()
+
+def test_command_gets_its_result(server, address):
+    assert send_command('status', address=address) == {'connected': True}
+    assert send_command('status', address=address) == {'connected': True}
+    assert server.requests == 2
+
+def test_socket_is_private_to_the_user(server, address):
+    assert os.stat(address).st_mode & 0o777 == 0o600
+
+@pytest.mark.parametrize('command, error', [('reboot', "Unknown command 'reboot'"), ('fail', "Not now")])
+def test_failures_are_reported_to_the_client(server, address, command, error):
+    with pytest.raises(RuntimeError, match=error):
+        send_command(command, address=address)
+
+def test_nothing_listening_raises_oserror(address):
+    with pytest.raises(OSError):
+        send_command('status', address=address)
+
+def test_stale_socket_is_replaced_and_live_one_refused(server, address):
+    with pytest.raises(OSError, match="already listening"):
+        ControlServer({}, address=address).start()
+    server.stop()
+
+    # Left behind without a listener, as after a crash
+    open(address, 'w').close()
+    restarted = ControlServer({'status': lambda: 'ok'}, address=address)
+    restarted.start()
+    try:
+        assert send_command('status', address=address) == 'ok'
+    finally:
+        restarted.stop()
+
+def test_stop_is_prompt(address):
+    server = ControlServer({}, address=address)
+    server.start()
+    started = time.monotonic()
+    server.stop()
+    assert time.monotonic() - started < 0.5
+
+def test_stop_is_prompt_when_the_socket_file_is_gone(address):
+    # As at exit, when multiprocessing's finalizer has unlinked it first
+    server = ControlServer({}, address=address)
+    server.start()
+    os.unlink(address)
+    started = time.monotonic()
+    server.stop()
+    assert time.monotonic() - started < 0.5
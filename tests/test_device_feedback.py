@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from comps.device_feedback import DeviceFeedback, LED_OFF, LED_ON, routes_from_engine
+from comps.fakes import RecordingOutputPort
+from comps.mapping import MappingEngine
+from comps.volume_writer import MASTER, MUTE
+
+RING = ('control_change', 10, 1)
+BUTTON = ('note_on', 10, 8)
+
+def sent_values(port):
+    """[(type, channel, number, value)] of everything sent to a port"""
+    values = []
+    for _, msg in port.sent:
+        if msg.type == 'control_change':
+            values.append((msg.type, msg.channel, msg.control, msg.value))
+        else:
+            values.append((msg.type, msg.channel, msg.note, msg.velocity))
+    return values
+
+@pytest.fixture
+def feedback():
+    feedback = DeviceFeedback(max_flush_rate=20)
+    feedback.set_routes({
+        MASTER: [('level', 'control_change', 10, 1)],
+        MUTE: [('toggle', 'note_on', 10, 8)],
+    })
+    feedback.start()
+    yield feedback
+    feedback.stop()
+
+def test_routes_follow_bindings_and_overrides():
+    engine = MappingEngine([
+        {'type': 'control_change', 'channel': 10, 'control': 9, 'action': 'master_volume', 'feedback': {'control': 1}},
+        {'type': 'control_change', 'channel': 10, 'control': 2, 'action': 'app_volume', 'app': 'Spotify.exe'},
+        {'type': 'control_change', 'channel': 10, 'control': 3, 'action': 'app_volume', 'app': 'chrome.exe',
+         'feedback': False},
+        {'type': 'note_on', 'channel': 10, 'note': 8, 'action': 'mute_toggle'},
+    ])
+    assert routes_from_engine(engine) == {
+        MASTER: [('level', 'control_change', 10, 1)],
+        'spotify.exe': [('level', 'control_change', 10, 2)],
+        MUTE: [('toggle', 'note_on', 10, 8)],
+    }
+
+def test_unchanged_values_are_not_resent(feedback, wait_until):
+    port = RecordingOutputPort()
+    feedback.attach(port)
+    feedback.report(MASTER, 0.5)
+    feedback.report(MUTE, True)
+    assert wait_until(lambda: feedback.messages_sent == 2)
+
+    # Same device values as the shadow copy: nothing to send
+    feedback.report(MASTER, 0.5)
+    feedback.report(MASTER, 0.501)
+    feedback.report(MUTE, True)
+    time.sleep(0.2)
+    assert sorted(sent_values(port)) == [RING + (64,), BUTTON + (LED_ON,)]
+
+    # A change and its undo before the next flush cancel out
+    feedback.report(MUTE, False)
+    feedback.report(MUTE, True)
+    time.sleep(0.2)
+    assert feedback.messages_sent == 2
+
+def test_sweep_is_batched_to_the_flush_rate(feedback, wait_until):
+    port = RecordingOutputPort()
+    feedback.attach(port)
+    started = time.monotonic()
+    for step in range(2000):
+        feedback.report(MASTER, (step % 128) / 127.0)
+        if step % 100 == 0:
+            time.sleep(0.01)
+    feedback.report(MASTER, 1.0)
+    assert wait_until(lambda: sent_values(port) and sent_values(port)[-1] == RING + (127,))
+    elapsed = time.monotonic() - started
+
+    # At most one batch per 1/20 s (plus the first one) instead of 2001 messages
+    assert feedback.flushes <= elapsed * 20 + 2
+    assert feedback.messages_sent == len(port.sent) <= feedback.flushes
+
+def test_reconnect_resends_the_full_state(feedback, wait_until):
+    first = RecordingOutputPort()
+    feedback.attach(first)
+    feedback.report(MASTER, 1.0)
+    feedback.report(MUTE, True)
+    assert wait_until(lambda: len(first.sent) == 2)
+
+    # Changes while disconnected are kept, then everything is resent once
+    feedback.detach()
+    feedback.report(MASTER, 0.0)
+    time.sleep(0.1)
+    second = RecordingOutputPort()
+    feedback.attach(second)
+    assert wait_until(lambda: len(second.sent) == 2)
+    assert sorted(sent_values(second)) == [RING + (0,), BUTTON + (LED_ON,)]
+    assert len(first.sent) == 2
+
+def test_failed_port_is_dropped_until_reattached(feedback, wait_until):
+    port = RecordingOutputPort()
+    port.fail = True
+    feedback.attach(port)
+    feedback.report(MUTE, False)
+    assert wait_until(lambda: feedback.flushes == 1)
+    assert feedback.port is None
+
+    # Not retried while the device is down
+    port.fail = False
+    feedback.report(MASTER, 1.0)
+    time.sleep(0.2)
+    assert port.sent == [] and feedback.flushes == 1
+
+    # Reconnected: everything wanted so far is sent
+    feedback.attach(port)
+    assert wait_until(lambda: len(port.sent) == 2)
+    assert sorted(sent_values(port)) == [RING + (127,), BUTTON + (LED_OFF,)]
+
+def test_stop_flushes_what_is_dirty(wait_until):
+    feedback = DeviceFeedback(max_flush_rate=1)
+    feedback.set_routes({MASTER: [('level', 'control_change', 10, 1)]})
+    port = RecordingOutputPort()
+    feedback.attach(port)
+    feedback.start()
+    feedback.report(MASTER, 0.0)
+    assert wait_until(lambda: len(port.sent) == 1)
+    # The next flush is a second away; stop() must not lose this value
+    feedback.report(MASTER, 1.0)
+    feedback.stop(timeout=2.0)
+    assert sent_values(port)[-1] == RING + (127,)
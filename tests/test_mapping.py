@@ -0,0 +1,78 @@
+import mido
+import pytest
+
+from comps.fakes import RecordingVolumeControl
+from comps.mapping import PICKUP_TOLERANCE, MappingEngine, Pickup
+
+def fader(value):
+    return mido.Message('control_change', channel=10, control=9, value=value)
+
+def test_fader_far_from_the_volume_is_not_picked_up():
+    pickup = Pickup()
+    assert not pickup.take(0.0, 0.5)
+    assert not pickup.take(0.2, 0.5)
+    assert not pickup.take(0.49, 0.5)
+
+def test_fader_landing_on_the_volume_is_picked_up():
+    pickup = Pickup()
+    assert pickup.take(0.5 + PICKUP_TOLERANCE / 2, 0.5)
+
+def test_fader_crossing_the_volume_is_picked_up():
+    pickup = Pickup()
+    assert not pickup.take(0.8, 0.5)
+    assert pickup.take(0.2, 0.5)
+
+def test_first_position_alone_does_not_count_as_crossing():
+    pickup = Pickup()
+    assert not pickup.take(1.0, 0.5)
+    assert pickup.position == 1.0
+
+def test_engaged_fader_follows_its_own_writes():
+    pickup = Pickup()
+    assert pickup.take(0.5, 0.5)
+    assert pickup.take(0.7, 0.5)
+    assert pickup.take(0.3, 0.7)
+
+def test_volume_changed_elsewhere_releases_the_fader():
+    pickup = Pickup()
+    assert pickup.take(0.5, 0.5)
+    # Media keys moved the volume to 0.9 while the fader stayed at 0.5
+    assert not pickup.take(0.52, 0.9)
+    assert not pickup.engaged
+    assert pickup.take(0.95, 0.9)
+
+def test_pickup_binding_only_writes_once_engaged():
+    engine = MappingEngine([
+        {'type': 'control_change', 'channel': 10, 'control': 9, 'action': 'master_volume', 'pickup': True},
+    ])
+    volume = RecordingVolumeControl(initial_volume=0.5)
+
+    engine.dispatch(fader(0), volume, None)
+    engine.dispatch(fader(30), volume, None)
+    assert volume.writes == []
+
+    engine.dispatch(fader(100), volume, None)
+    assert [level for _, level in volume.writes] == [100 / 127.0]
+
+    # An outside change: the fader has to come back to it first
+    volume.current_volume = 0.1
+    engine.dispatch(fader(90), volume, None)
+    assert len(volume.writes) == 1
+    engine.dispatch(fader(0), volume, None)
+    assert [level for _, level in volume.writes][-1] == 0.0
+
+def test_pickup_is_only_allowed_on_master_volume():
+    with pytest.raises(ValueError, match="Binding 0"):
+        MappingEngine([
+            {'type': 'control_change', 'channel': 10, 'control': 1, 'action': 'app_volume', 'app': 'x.exe',
+             'pickup': True},
+        ])
+
+def test_smoothing_binding_writes_directly_without_a_writer():
+    # As with replay_capture.py --pipeline direct: ramps need the VolumeWriter
+    engine = MappingEngine([
+        {'type': 'control_change', 'channel': 10, 'control': 9, 'action': 'master_volume', 'smoothing': 0.15},
+    ])
+    volume = RecordingVolumeControl(initial_volume=0.5)
+    engine.dispatch(fader(127), volume, None)
+    assert [level for _, level in volume.writes] == [1.0]
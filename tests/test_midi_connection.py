@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+
+import pytest
+
+from comps.fakes import ScriptedInputPort
+from comps.midi_connection import CLOSING, CONNECTED, CONNECTING, DISCONNECTED, MidiConnection
+
+# Length of the stress round; every join is bounded as well
+STRESS_SECONDS = 0.5
+WAKE_LIMIT = 0.25  # A waiter must notice a change within this
+
+def connect(connection):
+    """Run one connect through the state machine; the opened port, or None if already connected"""
+    if not connection.begin_connect():
+        return None
+    port = ScriptedInputPort()
+    connection.finish_connect(port)
+    return port
+
+def close(connection):
+    """Run one close through the state machine; True if it closed a port"""
+    ports = connection.begin_close()
+    if ports is None:
+        return False
+    ports[0].close()
+    connection.finish_close()
+    return True
+
+def test_states_follow_the_transitions():
+    connection = MidiConnection()
+    assert connection.state == DISCONNECTED
+    assert connection.begin_close() is None
+
+    assert connection.begin_connect()
+    assert connection.state == CONNECTING
+    with pytest.raises(RuntimeError):
+        connection.finish_close()
+    connection.abort_connect()
+    assert connection.state == DISCONNECTED
+
+    port = connect(connection)
+    assert connection.connected and connection.inport is port
+    assert connect(connection) is None
+    assert connection.begin_close() == (port, None)
+    assert connection.state == CLOSING
+    connection.finish_close()
+    assert connection.state == DISCONNECTED and connection.inport is None
+
+def test_close_waits_for_readers():
+    connection = MidiConnection()
+    port = connect(connection)
+    closed = threading.Event()
+    with connection.reading() as borrowed:
+        assert borrowed is port
+        closer = threading.Thread(target=lambda: close(connection) and closed.set())
+        closer.start()
+        assert not closed.wait(0.1)
+        assert not port.closed
+    closer.join(timeout=5.0)
+    assert closed.is_set() and port.closed
+
+    with connection.reading() as borrowed:
+        assert borrowed is None
+
+def test_waiters_see_the_state_they_waited_for():
+    connection = MidiConnection()
+    for _ in range(100):
+        for wanted, change in ((CONNECTED, connect), (DISCONNECTED, close)):
+            seen = []
+            def wait():
+                woke = connection.wait_for_state(wanted, timeout=2.0)
+                seen.append((woke, connection.state))
+            waiter = threading.Thread(target=wait)
+            waiter.start()
+            change(connection)
+            waiter.join(timeout=5.0)
+            assert seen == [(True, wanted)]
+
+class TimedConnection(MidiConnection):
+    """MidiConnection that remembers when each generation was reached"""
+
+    def __init__(self):
+        super().__init__()
+        self.changed_at = {}
+
+    def _set_state(self, state):
+        super()._set_state(state)
+        self.changed_at[self.generation] = time.monotonic()
+
+def test_no_change_is_lost_under_churn():
+    connection = TimedConnection()
+    stop = threading.Event()
+    stop_observers = threading.Event()
+    lock = threading.Lock()
+    counts = {'transitions': 0, 'closed_reads': 0}
+    wake_delays = []
+    errors = []
+
+    def churn(seed):
+        chooser = random.Random(seed)
+        try:
+            while not stop.is_set():
+                if chooser.random() < 0.5:
+                    changed = connect(connection) is not None
+                else:
+                    changed = close(connection)
+                if changed:
+                    with lock:
+                        counts['transitions'] += 2  # begin and finish
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        while not stop.is_set():
+            with connection.reading() as port:
+                if port is not None and port.closed:
+                    with lock:
+                        counts['closed_reads'] += 1
+            time.sleep(0)
+
+    def observe(last_seen):
+        with connection.condition:
+            generation = connection.generation
+        while not stop_observers.is_set():
+            # Far longer than the round: only a notification ends this wait in time
+            new = connection.wait_for_change(generation, timeout=2.0)
+            woke_at = time.monotonic()
+            changed_at = connection.changed_at.get(generation + 1)
+            if changed_at is not None:
+                with lock:
+                    wake_delays.append(woke_at - changed_at)
+            generation = new
+        last_seen.append(generation)
+
+    last_seen = []
+    workers = [threading.Thread(target=churn, args=(seed,), daemon=True) for seed in range(6)]
+    workers += [threading.Thread(target=read, daemon=True) for _ in range(2)]
+    observers = [threading.Thread(target=observe, args=(last_seen,), daemon=True) for _ in range(3)]
+    for thread in workers + observers:
+        thread.start()
+    time.sleep(STRESS_SECONDS)
+    stop.set()
+    for thread in workers:
+        thread.join(timeout=5.0)
+    # Then wake the observers once more, so each ends on the final generation
+    stop_observers.set()
+    connection.wake()
+    for thread in observers:
+        thread.join(timeout=5.0)
+
+    assert not [thread for thread in workers + observers if thread.is_alive()]
+    assert errors == []
+    assert counts['transitions'] > 0 and wake_delays
+    # Every change wakes every waiter right away, none waits for a later one
+    assert max(wake_delays) < WAKE_LIMIT
+    assert counts['closed_reads'] == 0
+    # Every transition and the final wake() moved the generation exactly once
+    assert connection.generation == counts['transitions'] + 1
+    assert last_seen == [connection.generation] * 3
+    assert connection.state in (CONNECTED, DISCONNECTED)
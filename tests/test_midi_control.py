@@ -0,0 +1,92 @@
+import threading
+import time
+
+import mido
+import pytest
+
+from comps import midi_control
+from comps.fakes import ScriptedInputPort
+
+# Disconnecting or stopping must never take longer than this
+SHUTDOWN_LIMIT = 1.0
+
+class RecordingEngine:
+    """Mapping engine that only remembers the messages dispatched to it"""
+
+    def __init__(self):
+        self.dispatched = []
+
+    def dispatch(self, msg, volume_control, volume_osd, received_at=None):
+        self.dispatched.append(msg)
+
+def fader_script(count):
+    """count back to back fader messages whose values tell them apart"""
+    return [(0, mido.Message('control_change', channel=10, control=index // 128 % 128, value=index % 128))
+            for index in range(count)]
+
+def start(mode, count=1):
+    """Attach count scripted ports and start the processing thread; return (engines, ports, stop)"""
+    engines = [RecordingEngine() for _ in range(count)]
+    devices = [midi_control.MidiDevice(f'Controller {index}', f'Port {index}', engine=engine)
+               for index, engine in enumerate(engines)]
+    midi_control.set_devices(devices)
+    midi_control.set_input_mode(mode)
+    ports = [ScriptedInputPort(device.port_name) for device in devices]
+    for port, device in zip(ports, devices):
+        assert midi_control.attach_port(port, device=device)
+
+    stop_flag = threading.Event()
+    thread = threading.Thread(
+        target=midi_control.process_xtouch_messages,
+        args=(stop_flag.is_set, None, None, mode),
+        name='midi-input', daemon=True
+    )
+    thread.start()
+
+    def stop():
+        stop_flag.set()
+        midi_control.wake_xtouch_thread()
+        started = time.monotonic()
+        thread.join(timeout=5.0)
+        assert not thread.is_alive()
+        return time.monotonic() - started
+
+    return engines, ports, stop
+
+@pytest.mark.parametrize('mode', [midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL])
+def test_messages_are_dispatched_in_arrival_order(midi_state, mode, wait_until):
+    (engine,), (port,), stop = start(mode)
+    script = fader_script(2000)
+    port.play(script)
+    assert wait_until(lambda: len(engine.dispatched) == len(script))
+    assert engine.dispatched == [msg for _, msg in script]
+    assert stop() < SHUTDOWN_LIMIT
+
+def test_each_device_keeps_its_own_order(midi_state, wait_until):
+    engines, ports, stop = start(midi_control.INPUT_MODE_CALLBACK, count=4)
+    script = fader_script(1000)
+    for port in ports:
+        port.play(script, wait=False)
+    assert wait_until(lambda: all(len(engine.dispatched) == len(script) for engine in engines))
+    for engine in engines:
+        assert engine.dispatched == [msg for _, msg in script]
+    assert stop() < SHUTDOWN_LIMIT
+
+@pytest.mark.parametrize('mode', [midi_control.INPUT_MODE_CALLBACK, midi_control.INPUT_MODE_POLL])
+def test_disconnect_during_traffic_is_bounded(midi_state, mode, wait_until):
+    (engine,), (port,), stop = start(mode)
+    port.play(fader_script(100000), wait=False)
+    assert wait_until(lambda: engine.dispatched)
+
+    started = time.monotonic()
+    assert midi_control.disconnect_xtouch()
+    assert time.monotonic() - started < SHUTDOWN_LIMIT
+    assert port.closed
+    assert port.reads_after_close == 0
+    assert midi_control.get_connection_status() is False
+    assert stop() < SHUTDOWN_LIMIT
+
+def test_idle_thread_stops_promptly(midi_state):
+    _, _, stop = start(midi_control.INPUT_MODE_CALLBACK)
+    time.sleep(0.05)
+    assert stop() < SHUTDOWN_LIMIT
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from comps.fakes import FakeSessionProvider
+from comps.session_volume import SessionVolumeController
+
+@pytest.fixture
+def provider():
+    return FakeSessionProvider()
+
+@pytest.fixture
+def controller(provider):
+    controller = SessionVolumeController(provider, refresh_interval=60.0, min_refresh_gap=0.0)
+    yield controller
+    controller.stop()
+
+def test_index_groups_sessions_by_lower_case_name(controller, provider):
+    first = provider.add_session('Spotify.exe')
+    second = provider.add_session('spotify.EXE')
+    chrome = provider.add_session('chrome.exe')
+    controller.refresh()
+
+    assert controller.get_sessions('SPOTIFY.exe') == (first, second)
+    assert controller.get_sessions('chrome.exe') == (chrome,)
+    assert controller.get_sessions('firefox.exe') == ()
+
+    assert controller.set_app_volume('Spotify.exe', 0.25)
+    assert first.level == second.level == 0.25
+    assert chrome.level == 1.0
+
+def test_refresh_drops_expired_and_finds_new_sessions(controller, provider):
+    old = provider.add_session('game.exe')
+    controller.refresh()
+    provider.expire_session(old)
+    new = provider.add_session('game.exe')
+    controller.refresh()
+    assert controller.get_sessions('game.exe') == (new,)
+
+def test_dead_session_is_evicted_on_write(controller, provider):
+    dead = provider.add_session('player.exe')
+    alive = provider.add_session('player.exe')
+    controller.refresh()
+    provider.expire_session(dead)
+
+    assert controller.set_app_volume('player.exe', 0.5)
+    assert controller.get_sessions('player.exe') == (alive,)
+    assert controller.evictions == 1
+
+    provider.remove_session(alive)
+    assert not controller.set_app_volume('player.exe', 0.5)
+    assert controller.get_sessions('player.exe') == ()
+    assert controller.evictions == 2
+
+def test_miss_wakes_the_refresh_thread(controller, provider, wait_until):
+    controller.start()
+    assert wait_until(lambda: controller.refresh_count == 1)
+
+    # Started after the index was built: the first write misses and asks for a refresh
+    volume = provider.add_session('late.exe')
+    assert not controller.set_app_volume('late.exe', 0.4)
+    assert wait_until(lambda: controller.get_sessions('late.exe') == (volume,))
+    assert controller.set_app_volume('late.exe', 0.4)
+    assert volume.level == 0.4
+    assert controller.refresh_count == 2
+
+def test_stop_ends_the_refresh_thread(controller, wait_until):
+    controller.start()
+    assert wait_until(lambda: controller.refresh_count == 1)
+    started = time.monotonic()
+    controller.stop()
+    assert time.monotonic() - started < 1.0
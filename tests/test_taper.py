@@ -0,0 +1,45 @@
+import pytest
+
+from comps.taper import MIDI_STEPS, compile_taper
+
+SPECS = [
+    None,
+    'linear',
+    'log',
+    {'curve': 'db', 'range_db': 40},
+    {'curve': 'breakpoints', 'points': [[0, 0], [64, 0.2], [127, 1]]},
+]
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_table_spans_silence_to_full_volume(spec):
+    table = compile_taper(spec)
+    assert len(table) == MIDI_STEPS
+    assert table[0] == 0.0
+    assert table[127] == 1.0
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_table_is_monotonic(spec):
+    table = compile_taper(spec)
+    assert all(low < high for low, high in zip(table, table[1:]))
+
+def test_db_steps_are_equal_in_db():
+    table = compile_taper({'curve': 'db', 'range_db': 60})
+    assert table[1] == pytest.approx(10 ** (-60 * 126 / 127 / 20))
+    assert table[64] / table[63] == pytest.approx(table[127] / table[126])
+
+def test_breakpoints_pass_through_their_points():
+    table = compile_taper({'curve': 'breakpoints', 'points': [[127, 1], [0, 0], [64, 0.2]]})
+    assert table[64] == pytest.approx(0.2)
+    assert table[32] == pytest.approx(0.1)
+
+def test_same_spec_shares_one_table():
+    assert compile_taper({'curve': 'db', 'range_db': 50}) is compile_taper({'range_db': 50, 'curve': 'db'})
+
+@pytest.mark.parametrize('spec', [
+    'cubic',
+    {'curve': 'breakpoints', 'points': [[0, 0]]},
+    {'curve': 'breakpoints', 'points': [[10, 0], [127, 1]]},
+])
+def test_invalid_specs_raise(spec):
+    with pytest.raises(ValueError):
+        compile_taper(spec)
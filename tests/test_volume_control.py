@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from comps.audio_backends.memory import MemoryEndpoint
+from comps.audio_backends.pulse import PulseEndpoint
+from comps.fakes import FakePulseServer
+from comps.volume_control import VolumeControl
+
+@pytest.fixture
+def endpoint():
+    return MemoryEndpoint(level=0.5)
+
+@pytest.fixture
+def volume(endpoint):
+    volume = VolumeControl(endpoint)
+    yield volume
+    volume.close()
+
+def test_own_writes_are_not_outside_changes(volume, endpoint):
+    changes = []
+    volume.listeners.append(lambda level, muted: changes.append((level, muted)))
+    for step in range(50):
+        volume.set_volume(step / 100.0)
+    volume.set_mute(True)
+    endpoint.wait_notified()
+
+    assert changes == []
+    assert volume.external_changes == 0
+    assert volume.get_volume() == 0.49
+    assert volume.get_mute() is True
+
+def test_outside_change_reaches_cache_and_listeners(volume, endpoint):
+    changes = []
+    volume.listeners.append(lambda level, muted: changes.append((level, muted)))
+    endpoint.external_change(level=0.8)
+    endpoint.wait_notified()
+
+    assert changes == [(0.8, False)]
+    assert volume.get_volume() == 0.8
+    assert volume.external_changes == 1
+
+def test_late_echo_does_not_undo_a_newer_write(volume, endpoint):
+    # The echo of 0.2 arrives after 0.3 was written; the cache must stay at 0.3
+    volume.set_volume(0.2)
+    volume.set_volume(0.3)
+    endpoint.wait_notified()
+    assert volume.get_volume() == 0.3
+
+def test_unchanged_level_is_not_written(volume, endpoint):
+    volume.set_volume(0.7)
+    volume.set_volume(0.7)
+    volume.set_mute(False)
+    assert endpoint.set_level_calls == 1
+    assert endpoint.set_mute_calls == 0
+    assert volume.writes_skipped == 1
+
+def test_without_notifications_every_get_reads_through():
+    endpoint = MemoryEndpoint(level=0.5, notifications=False)
+    volume = VolumeControl(endpoint)
+    endpoint.level = 0.25
+    assert volume.get_volume() == 0.25
+    volume.set_volume(0.25)
+    assert endpoint.set_level_calls == 1
+
+def test_pulse_echoes_are_recognised(wait_until):
+    server = FakePulseServer()
+    volume = VolumeControl(PulseEndpoint(client=server))
+    try:
+        for step in range(50):
+            volume.set_volume(step / 100.0 + 0.001)
+        server.external_change(level=0.9)
+        assert wait_until(lambda: volume.external_changes == 1)
+        assert abs(volume.get_volume() - 0.9) < 1e-4
+        time.sleep(0.05)
+        assert volume.external_changes == 1
+    finally:
+        volume.close()
@@ -0,0 +1,14 @@
+from comps.volume_osd import VolumeOSD
+
+def test_window_failure_disables_the_osd(monkeypatch):
+    attempts = []
+    def fail():
+        attempts.append(1)
+        raise RuntimeError("no display")
+    osd = VolumeOSD()
+    monkeypatch.setattr(osd, '_create_window', fail)
+
+    for level in (0.1, 0.2, 0.3):
+        osd.show_volume(level)
+    assert attempts == [1]
+    assert osd.failed and not osd.initialized
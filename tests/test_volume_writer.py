@@ -0,0 +1,103 @@
+import concurrent.futures
+import time
+
+import pytest
+
+from comps.async_runtime import AsyncVolumeWriter
+from comps.fakes import RecordingVolumeControl
+from comps.volume_writer import VolumeWriter
+
+RATE = 100  # Writes per second, so one ramp tick is 10 ms
+
+@pytest.fixture
+def backend():
+    return RecordingVolumeControl(initial_volume=0.0)
+
+@pytest.fixture
+def writer(backend):
+    writer = VolumeWriter(backend, max_writes_per_second=RATE)
+    writer.start()
+    yield writer
+    writer.stop()
+
+def levels(backend):
+    return [level for _, level in backend.writes]
+
+def test_ramp_reaches_its_target_in_steps(writer, backend, wait_until):
+    writer.submit(1.0, ramp_time=0.2)
+    assert wait_until(lambda: levels(backend) and levels(backend)[-1] == 1.0)
+    written = levels(backend)
+    steps = [high - low for low, high in zip([0.0] + written, written)]
+    # One tick's share of the ramp per write: 1/RATE s of a 0.2 s sweep
+    assert len(written) == pytest.approx(0.2 * RATE, abs=1)
+    assert all(0 < step <= 1.0 / (0.2 * RATE) + 1e-9 for step in steps)
+    assert writer.get_volume() == 1.0
+
+def test_new_target_cancels_a_ramp(writer, backend, wait_until):
+    writer.submit(1.0, ramp_time=1.0)
+    assert wait_until(lambda: levels(backend) and levels(backend)[-1] >= 0.1)
+    writer.submit(0.0, ramp_time=1.0)
+    assert wait_until(lambda: levels(backend)[-1] == 0.0)
+    written = levels(backend)
+    peak = written.index(max(written))
+    # Up until the new target arrived, then straight back down; 1.0 is never reached
+    assert max(written) < 0.5
+    assert written[:peak + 1] == sorted(written[:peak + 1])
+    assert written[peak:] == sorted(written[peak:], reverse=True)
+
+def test_value_without_ramp_jumps_and_ends_the_ramp(writer, backend, wait_until):
+    writer.submit(1.0, ramp_time=1.0)
+    assert wait_until(lambda: levels(backend))
+    writer.submit(0.3)
+    assert wait_until(lambda: levels(backend)[-1] == 0.3)
+    count = len(backend.writes)
+    time.sleep(0.1)
+    assert len(backend.writes) == count
+
+def test_stop_jumps_to_the_ramp_target(backend, wait_until):
+    writer = VolumeWriter(backend, max_writes_per_second=RATE)
+    writer.start()
+    writer.submit(1.0, ramp_time=10.0)
+    assert wait_until(lambda: levels(backend))
+    writer.stop()
+    assert levels(backend)[-1] == 1.0
+
+class RecordingSessions:
+    """Stands in for SessionVolumeController, every application has a session"""
+
+    def __init__(self):
+        self.writes = []
+
+    def set_app_volume(self, app, level):
+        self.writes.append((time.perf_counter(), app, level))
+        return True
+
+def test_every_write_counts_against_the_rate_limit(backend):
+    sessions = RecordingSessions()
+    writer = VolumeWriter(backend, max_writes_per_second=20, session_volume=sessions)
+    writer.start()
+    started = time.monotonic()
+    step = 0
+    while time.monotonic() - started < 0.5:
+        step += 1
+        level = (step % 100) / 100.0
+        writer.submit(level)
+        writer.set_app_volume('spotify.exe', level)
+        writer.set_app_volume('chrome.exe', level)
+        time.sleep(0.001)
+    writer.stop()
+    elapsed = time.monotonic() - started
+
+    # Three slots change all the time, but the budget is writes, not batches
+    assert len(backend.writes) + len(sessions.writes) <= elapsed * 20 + 3
+
+def test_async_toggle_mute_returns_the_new_state(backend):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        writer = AsyncVolumeWriter(backend, executor)
+        assert writer.toggle_mute() is True
+        assert writer.toggle_mute() is False
+        assert writer.toggle_mute() is True
+        # A mute changed elsewhere is where the next toggle starts from
+        writer.external_change(0.5, True)
+        assert writer.toggle_mute() is False
+    assert backend.muted is False
@@ -0,0 +1,63 @@
+"""Control a running X-Touch Mini volume controller over its control socket
+
+    python xtouchctl.py status
+    python xtouchctl.py disconnect
+    python xtouchctl.py metrics --json
+
+The controller listens when started with --headless or --control.
+"""
+import argparse
+import json
+import sys
+
+from comps.control_server import default_address, send_command
+
+COMMANDS = ('status', 'connect', 'disconnect', 'volume', 'metrics', 'profile', 'shutdown')
+
+def format_result(command, result):
+    """Return a short human readable form of a command result"""
+    if command == 'volume':
+        muted = " (muted)" if result['muted'] else ""
+        return f"Volume: {result['volume'] * 100:.0f}%{muted}"
+    if command in ('connect', 'disconnect'):
+        return f"Connected: {'yes' if result['connected'] else 'no'}"
+    if command == 'profile':
+        return '\n'.join(f"Wrote {path}" for path in result['written'])
+    if command == 'shutdown':
+        return "Shutting down"
+    if not isinstance(result, dict):
+        return str(result)
+    lines = []
+    for key, value in result.items():
+        if key == 'rss_bytes' and value is not None:
+            value = f"{value / (1024 * 1024):.1f} MB"
+        elif isinstance(value, dict):
+            value = json.dumps(value)
+        lines.append(f"{key}: {value}")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Control a running X-Touch Mini volume controller")
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('--address', default=None,
+                        help=f"Control socket or pipe of the instance (default {default_address()})")
+    parser.add_argument('--timeout', type=float, default=5.0, help="Seconds to wait for the reply")
+    parser.add_argument('--json', action='store_true', help="Print the raw result as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        result = send_command(args.command, address=args.address, timeout=args.timeout)
+    except (RuntimeError, TimeoutError) as e:
+        # Before OSError, of which TimeoutError is a subclass
+        print(f"{args.command} failed: {e}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"Could not reach the controller ({e}). Is it running with --headless or --control?",
+              file=sys.stderr)
+        return 2
+
+    print(json.dumps(result, indent=2) if args.json else format_result(args.command, result))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())